@@ -2,6 +2,7 @@ import streamlit as st
 import pandas as pd
 import os
 import matplotlib.pyplot as plt
+from storage import append_csv
 
 # File to store data
 DATA_FILE = "food_log.csv"
@@ -92,7 +93,8 @@ if st.button("Add Entry"):
         "Fats": [fats]
     })
     data = pd.concat([data, new_entry], ignore_index=True)
-    data.to_csv(DATA_FILE, index=False)
+    # Append just the new row instead of rewriting the whole file
+    append_csv(DATA_FILE, new_entry.to_dict("records"))
     st.success("Entry Added!")
 
 # Display Logged Data
@@ -2,6 +2,8 @@ import streamlit as st
 import pandas as pd
 import os
 import matplotlib.pyplot as plt
+from macro_engine import MacroEngine
+from storage import append_csv
 
 # Food Data
 food_data = {
@@ -55,22 +57,12 @@ food = st.selectbox("Select Food Item", list(food_data.keys()))
 quantity = st.number_input("Quantity", min_value=0.1, step=0.1)
 unit = food_data[food]["unit"]
 
-# Function to calculate macros
-def get_macros(food, quantity):
-    if food in food_data:
-        unit = food_data[food]["unit"]
-        protein_per_unit = food_data[food]["Protein"]
-        carbs_per_unit = food_data[food]["Carbs"]
-        fats_per_unit = food_data[food]["Fats"]
-        
-        if unit == "grams":
-            factor = quantity / 100  # Convert to per 100g
-        elif unit == "ml":
-            factor = quantity / 100  # Convert to per 100ml
-        else:
-            factor = quantity  # Per piece, no conversion needed
+# Function to calculate macros (shared engine, same unit rules as the main app)
+macro_engine = MacroEngine(food_data, nutrients=["Protein", "Carbs", "Fats"])
 
-        return protein_per_unit * factor, carbs_per_unit * factor, fats_per_unit * factor
+def get_macros(food, quantity):
+    if food in macro_engine:
+        return tuple(macro_engine.compute([food], [quantity])[0])
     return 0, 0, 0
 
 # Get macros
@@ -79,7 +71,8 @@ protein, carbs, fats = get_macros(food, quantity)
 if st.button("Add to Log"):
     new_entry = {"Date": pd.Timestamp.today().strftime('%Y-%m-%d'), "Food": food, "Quantity": quantity, "Unit": unit, "Protein": protein, "Carbs": carbs, "Fats": fats}
     data = pd.concat([data, pd.DataFrame([new_entry])], ignore_index=True)
-    data.to_csv("food_log.csv", index=False)
+    # Append just the new row instead of rewriting the whole file
+    append_csv("food_log.csv", [new_entry])
     st.success("Entry Added!")
 
 # Display the logged data
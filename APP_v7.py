@@ -2,6 +2,7 @@ import streamlit as st
 import pandas as pd
 import os
 import matplotlib.pyplot as plt
+from storage import append_csv
 
 # Load existing food data or use default
 def load_food_data():
@@ -81,13 +82,8 @@ if food in food_data:
             "Fats": fats
         }
 
-        if os.path.exists("food_log.csv"):
-            log_data = pd.read_csv("food_log.csv")
-            log_data = pd.concat([log_data, pd.DataFrame([new_entry])], ignore_index=True)
-        else:
-            log_data = pd.DataFrame([new_entry])
-
-        log_data.to_csv("food_log.csv", index=False)
+        # Append just the new row instead of reading and rewriting the whole file
+        append_csv("food_log.csv", [new_entry])
         st.success("Entry Added!")
 
 # Show log
@@ -2,9 +2,18 @@ import streamlit as st
 import pandas as pd
 import os
 import matplotlib.pyplot as plt
-import gspread
-from google.oauth2.service_account import Credentials
 from datetime import datetime
+from storage import LogWriteQueue, latest_log_id
+from log_mirror import get_log_mirror
+from write_behind import get_write_queue, show_pending_writes
+from daily_log import get_daily_index, frame_totals, with_pending
+from macro_engine import MacroEngine, is_weight_based
+from food_search import get_food_search
+from usage_model import get_usage_model
+from schema import coerce_food, format_day
+from snapshots import get_log_snapshot
+from row_ids import ID_COLUMN, assign_row_ids, new_row, sheet_values
+from page_data import PAGE_SHEETS, get_page_data
 import re
 
 # --- Helper function ---
@@ -15,23 +24,38 @@ def parse_numeric_input(raw_value: str) -> float:
     match = re.search(r"[-+]?\d*\.?\d+", raw_value)
     return float(match.group()) if match else 0.0
 
-# Google Sheets authentication
-scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-creds = Credentials.from_service_account_info(st.secrets["service_account"], scopes=scope)
-client = gspread.authorize(creds)
+# Sheets are read through the shared page cache, all at once (see page_data.py)
+page_data = get_page_data()
 
-# Open the Google Sheet
-SHEET_URL = "https://docs.google.com/spreadsheets/d/1mVbGbsThxK9L1mC2-2n_qlC2S0IoPM7zxQYT8DVBiAA/edit?gid=1560030794#gid=1560030794"
-spreadsheet = client.open_by_url(SHEET_URL)
-food_sheet = spreadsheet.worksheet("FoodDatabase")
-log_sheet = spreadsheet.worksheet("FoodLog")
+# Writes are queued locally and sent to Sheets by a background thread
+write_queue = get_write_queue()
+food_writer = write_queue.worksheet("FoodDatabase")
+log_writer = write_queue.worksheet("FoodLog")
+
+# Log rows added during this rerun go out together in one append
+log_queue = LogWriteQueue(log_writer)
+
+# Local copy of the FoodLog that only fetches rows added since the last sync
+log_mirror = get_log_mirror()
+page_data.load(PAGE_SHEETS["Log Your Food"], tasks=[log_mirror.sync])
 
 # Load existing food data from Google Sheets
 def load_food_data():
-    data = food_sheet.get_all_records()
-    return {row["Food"]: row for row in data} if data else {}
+    data = page_data.records("FoodDatabase")
+    foods = {row["Food"]: row for row in data} if data else {}
+    # Foods saved moments ago may still be waiting in the write queue
+    if data:
+        header = list(data[0])
+        for row in write_queue.pending_rows("FoodDatabase"):
+            foods.setdefault(row[0], dict(zip(header, row)))
+    assign_row_ids(write_queue, "FoodDatabase", sheet_values(data))
+    return foods
 
 food_data = load_food_data()
+food_header = list(next(iter(food_data.values()))) if food_data else ["Food", "Unit", "Protein", "Carbs", "Fats", "Calories", "Timestamp"]
+
+# Nutrient matrix of the food database; every macro calculation goes through it
+macro_engine = MacroEngine(food_data)
 
 st.markdown("<h1 style='text-align: center;'>You Are What You Eat</h1>", unsafe_allow_html=True)
 st.subheader("Log Your Food Man")
@@ -39,20 +63,22 @@ st.subheader("Log Your Food Man")
 # Default: today's date
 selected_date = datetime.today().date()
 
-def is_weight_based(unit):
-    return unit.lower() in ["gram", "grams", "g", "ml"]
-
 # Advanced options toggle
 with st.expander("🔧 Advanced Options"):
     selected_date = st.date_input("Select Date to Log", value=datetime.today().date())
-    log_date_str = selected_date.strftime('%d/%m/%Y')
+    log_date_str = format_day(selected_date)
 
     st.markdown("---")
     st.markdown("### 🔁 Delete Latest Log Entry")
     if st.button("Delete Latest Log Entry from Food Log"):
-        log_records = log_sheet.get_all_records()
-        if log_records:
-            log_sheet.delete_rows(len(log_records)+1)
+        log, pending = log_mirror.read(), write_queue.pending_rows("FoodLog")
+        if not log.empty or pending:
+            latest = latest_log_id(log, pending)
+            # By ID, so a row added in Sheets meanwhile isn't the one deleted; rows from before IDs by position
+            if latest:
+                log_writer.delete_ids([latest])
+            else:
+                log_writer.delete_last_row()
             st.success("Deleted the latest entry from the Food Log.")
         else:
             st.warning("Food Log is empty.")
@@ -60,71 +86,59 @@ with st.expander("🔧 Advanced Options"):
     st.markdown("---")
     st.markdown("### 📋 Latest 10 Entries View (with Refresh)")
     if st.button("🔄 Refresh Tables"):
-        st.session_state.log_data_full = pd.DataFrame(log_sheet.get_all_records())
-        st.session_state.food_data_full = pd.DataFrame(food_sheet.get_all_records())
+        page_data.invalidate("FoodDatabase")
+        log_mirror.sync(force=True)
+        st.session_state.food_data_full = coerce_food(pd.DataFrame(page_data.records("FoodDatabase")))
         st.success("Tables refreshed!")
 
-    if 'log_data_full' not in st.session_state:
-        st.session_state.log_data_full = pd.DataFrame(log_sheet.get_all_records())
     if 'food_data_full' not in st.session_state:
-        st.session_state.food_data_full = pd.DataFrame(food_sheet.get_all_records())
+        st.session_state.food_data_full = coerce_food(pd.DataFrame(page_data.records("FoodDatabase")))
 
     st.markdown("---")
-    st.markdown("### 🗑️ Delete Entries by Row Number")
+    st.markdown("### 🗑️ Delete Entries")
     delete_target = st.radio("Choose what to delete", ["Food Log Entry", "Food Database Entry"])
 
     if delete_target == "Food Log Entry":
-        df = st.session_state.log_data_full
-        st.dataframe(df.tail(10))
-        row_index_to_delete_raw = st.text_input("Enter DataFrame index to delete from Food Log")
-        row_index_to_delete = int(parse_numeric_input(row_index_to_delete_raw))
-        if st.button("Delete Row from Food Log"):
-            sheet_row_to_delete = row_index_to_delete + 2
-            log_sheet.delete_rows(sheet_row_to_delete)
-            st.success(f"Deleted DataFrame index {row_index_to_delete} (Sheet row {sheet_row_to_delete}) from Food Log")
+        latest = get_log_snapshot(log_mirror).view("latest 10", lambda log: log.tail(10))
+        st.dataframe(latest, hide_index=True)
+        entries = {row[ID_COLUMN]: f"{row['Date']} · {row['Food']} · {row['Quantity']:g} {row['Unit']}"
+                   for _, row in latest.iloc[::-1].iterrows() if row.get(ID_COLUMN)} if ID_COLUMN in latest else {}
+        picked = st.multiselect("Entries to delete from Food Log", list(entries), format_func=entries.get)
+        if st.button("Delete Selected from Food Log", disabled=not picked):
+            log_writer.delete_ids(picked)
+            st.success(f"Deleted {len(picked)} entr{'y' if len(picked) == 1 else 'ies'} from the Food Log.")
 
     elif delete_target == "Food Database Entry":
         df = st.session_state.food_data_full
-        st.dataframe(df)
-        row_index_to_delete_raw = st.text_input("Enter DataFrame index to delete from Food Database")
-        row_index_to_delete = int(parse_numeric_input(row_index_to_delete_raw))
-        if st.button("Delete Row from Food Database"):
-            sheet_row_to_delete = row_index_to_delete + 2
-            food_sheet.delete_rows(sheet_row_to_delete)
-            st.success(f"Deleted DataFrame index {row_index_to_delete} (Sheet row {sheet_row_to_delete}) from Food Database")
+        st.dataframe(df, hide_index=True)
+        foods = dict(zip(df[ID_COLUMN], df["Food"])) if ID_COLUMN in df else {}
+        foods.pop("", None)
+        picked = st.multiselect("Foods to delete from Food Database", list(foods), format_func=foods.get)
+        if st.button("Delete Selected from Food Database", disabled=not picked):
+            food_writer.delete_ids(picked)
+            st.success(f"Deleted {', '.join(foods[row_id] for row_id in picked)} from the Food Database.")
 
 with st.expander("⚡ Quick Add"):
-    frequent_food_names = ["Apple Cider Vinegar", "Turmeric Latte", "Lemon Juice", "Green Tea", "B12 Vitamin (10ug)", "Raw Garlic", "Magnesium B-Complex"]
+    usage_model = get_usage_model(log_mirror)
+    frequent_food_names = usage_model.suggest(selected_date, known=food_data)
     buttons_per_row = 4
     for i in range(0, len(frequent_food_names), buttons_per_row):
         cols = st.columns(buttons_per_row)
         for j, food_name in enumerate(frequent_food_names[i:i+buttons_per_row]):
             with cols[j]:
-                if st.button(food_name, key=f"quick_add_{food_name}"):
-                    if food_name in food_data:
-                        unit = food_data[food_name]["Unit"]
-                        default_qty = 100 if is_weight_based(unit) else 1
-                        factor = default_qty / 100 if is_weight_based(unit) else default_qty
-
-                        new_entry = {
-                            "Date": log_date_str,
-                            "Food": food_name,
-                            "Quantity": default_qty,
-                            "Unit": unit,
-                            "Protein": food_data[food_name]["Protein"] * factor,
-                            "Carbs": food_data[food_name]["Carbs"] * factor,
-                            "Fats": food_data[food_name]["Fats"] * factor,
-                            "Calories": food_data[food_name]["Calories"] * factor,
-                        }
-
-                        log_sheet.append_rows([list(new_entry.values())])
-                        st.success(f"{food_name} ({default_qty} {unit}) added to log!")
-                    else:
-                        st.warning(f"{food_name} not found in Food Database.")
+                unit = food_data[food_name]["Unit"]
+                default_qty = usage_model.typical_quantity(food_name) or (100 if is_weight_based(unit) else 1)
+                if st.button(f"{food_name} ({default_qty:g} {unit})", key=f"quick_add_{food_name}"):
+                    new_entry = macro_engine.log_entry(log_date_str, food_name, default_qty)
+                    log_queue.add(new_entry)
+                    st.success(f"{food_name} ({default_qty:g} {unit}) added to log!")
 
 # --- Food Selection ---
-food_options = ["Add New Food...", "Miscellaneous Entry..."] + list(food_data.keys())
-selection = st.selectbox("Select Food or Add New", options=food_options)
+# Searched on the server; the selectbox only gets the top matches
+food_search = get_food_search(food_data, log_mirror)
+food_query = st.text_input("Search Food", placeholder="Type a few letters, e.g. 'gr yog'")
+food_options = ["Add New Food...", "Miscellaneous Entry..."] + food_search.search(food_query)
+selection = st.selectbox("Select Food or Add New", options=food_options, index=2 if food_query and len(food_options) > 2 else 0)
 
 if selection == "Add New Food...":
     new_food = st.text_input("Enter new food name:")
@@ -154,7 +168,7 @@ if selection == "Miscellaneous Entry..." and food:
             "Fats": fats,
             "Calories": calories
         }
-        log_sheet.append_rows([list(log_entry.values())])
+        log_queue.add(log_entry)
         st.success(f"{food} added to log.")
 
 if food:
@@ -165,29 +179,9 @@ if selection != "Miscellaneous Entry...":
     quantity = parse_numeric_input(st.text_input(f"Quantity ({unit_display})", placeholder="e.g. 100 g"))
 
     if food in food_data:
-        unit = food_data[food]["Unit"]
-        factor = quantity / 100 if is_weight_based(unit) else quantity
-        protein = food_data[food]["Protein"] * factor
-        carbs = food_data[food]["Carbs"] * factor
-        fats = food_data[food]["Fats"] * factor
-        calories = food_data[food]["Calories"] * factor
-
         if st.button("Add to Log", key="add_to_log_main"):
-            new_entry = {
-                "Date": log_date_str,
-                "Food": food,
-                "Quantity": quantity,
-                "Unit": unit,
-                "Protein": protein,
-                "Carbs": carbs,
-                "Fats": fats,
-                "Calories": calories
-            }
-            existing_log = log_sheet.get_all_records()
-            log_data = pd.DataFrame(existing_log)
-            log_data = pd.concat([log_data, pd.DataFrame([new_entry])], ignore_index=True)
-            log_sheet.clear()
-            log_sheet.update([log_data.columns.values.tolist()] + log_data.values.tolist())
+            new_entry = macro_engine.log_entry(log_date_str, food, quantity)
+            log_queue.add(new_entry)
             st.success("Entry Added!")
 
     else:
@@ -203,11 +197,20 @@ if selection != "Miscellaneous Entry...":
         fats = parse_numeric_input(st.text_input("Fats (g)", placeholder="e.g. 10 g"))
         calories = parse_numeric_input(st.text_input("Calories", placeholder="e.g. 200"))
 
+        # Catch other spellings of a food that is already in the database
+        near_duplicates = food_search.near_duplicates(food) if food else []
+        save_anyway = True
+        if near_duplicates:
+            st.warning(f"Similar foods already exist: {', '.join(near_duplicates)}. Search for one of them above instead?")
+            save_anyway = st.checkbox("It's a different food, save it anyway")
+
         if st.button("Save New Food"):
             if not food:
                 st.error("Food name cannot be empty!")
             elif food in food_data:
                 st.warning(f"{food} already exists in the database.")
+            elif not save_anyway:
+                st.error("Not saved: pick the existing food, or tick the box if this really is a different food.")
             else:
                 timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                 new_entry = {
@@ -219,8 +222,8 @@ if selection != "Miscellaneous Entry...":
                     "Calories": calories,
                     "Timestamp": timestamp
                 }
-                df_new_food = pd.DataFrame([new_entry])
-                food_sheet.append_rows(df_new_food.values.tolist())
+                food_writer.append_rows([new_row(new_entry, food_header)])
+                food_search.add(food)
                 food_data[food] = {
                     "Unit": unit,
                     "Protein": protein,
@@ -228,40 +231,38 @@ if selection != "Miscellaneous Entry...":
                     "Fats": fats,
                     "Calories": calories
                 }
+                macro_engine.add_food(food, food_data[food])
                 st.success(f"{food} has been added to the database!")
 
-                unit = food_data[food]["Unit"]
-                factor = quantity / 100 if is_weight_based(unit) else quantity
-                logged_entry = {
-                    "Date": log_date_str,
-                    "Food": food,
-                    "Quantity": quantity,
-                    "Unit": unit,
-                    "Protein": protein * factor,
-                    "Carbs": carbs * factor,
-                    "Fats": fats * factor,
-                    "Calories": calories * factor
-                }
-                log_sheet.append_rows([list(logged_entry.values())])
+                logged_entry = macro_engine.log_entry(log_date_str, food, quantity)
+                log_queue.add(logged_entry)
                 st.success(f"{food} has also been logged with {quantity} {unit}!")
 
+# Queue every log row added during this rerun as one append
+log_queue.flush()
+show_pending_writes(write_queue)
+
 # --- Daily log display ---
-st.session_state.pop('log_data_today', None)
-st.session_state.pop('total_macros', None)
-st.session_state.pop('full_log_data', None)
 
-log_date_str = selected_date.strftime('%d/%m/%Y')
-log_data = pd.DataFrame(log_sheet.get_all_records())
-log_data = log_data[log_data["Date"] == log_date_str]
+log_date_str = format_day(selected_date)
+daily_index = get_daily_index(log_mirror)
+log_data = daily_index.day(selected_date)
+day_totals = daily_index.totals(selected_date)
+
+# Entries still waiting in the write queue show up at once
+pending_today = [row for row in write_queue.pending_rows("FoodLog") if row[:1] == [log_date_str]]
+if pending_today:
+    log_data = with_pending(log_data, pending_today)
+    day_totals = frame_totals(log_data)
 
 if not log_data.empty:
     st.subheader(f"Today's Log ({log_date_str})")
     st.dataframe(log_data)
 
-    total_protein = log_data["Protein"].sum()
-    total_carbs = log_data["Carbs"].sum()
-    total_fats = log_data["Fats"].sum()
-    total_calories = log_data["Calories"].sum()
+    total_protein = day_totals["Protein"]
+    total_carbs = day_totals["Carbs"]
+    total_fats = day_totals["Fats"]
+    total_calories = day_totals["Calories"]
 
     col1, col2, col3, col4 = st.columns(4)
     col1.metric("Protein (g)", f"{total_protein:.1f}")
@@ -280,19 +281,10 @@ if not log_data.empty:
         else:
             st.success(f"🎉 You've exceeded your protein goal by {difference:.1f}g!")
 
-    if 'log_data_today' not in st.session_state:
-        st.session_state['log_data_today'] = log_data
-    if 'total_macros' not in st.session_state:
-        st.session_state['total_macros'] = {
-            'protein': total_protein,
-            'carbs': total_carbs,
-            'fats': total_fats,
-            'calories': total_calories
-        }
 
     st.markdown("### 🥇 Top Foods by Macro Contribution Today")
     def show_top_foods(nutrient, label):
-        top = log_data.groupby("Food")[nutrient].sum().sort_values(ascending=False).head(3)
+        top = daily_index.top_foods(selected_date, nutrient)
         if not top.empty:
             st.markdown(f"**Top 3 {label} Foods:**")
             for idx, (food, amount) in enumerate(top.items(), start=1):
@@ -306,5 +298,4 @@ if not log_data.empty:
         show_top_foods("Carbs", "Carbs")
         show_top_foods("Calories", "Calorie")
 
-if 'full_log_data' not in st.session_state:
-    st.session_state['full_log_data'] = pd.DataFrame(log_sheet.get_all_records())
+page_data.warm()
@@ -2,6 +2,8 @@ import streamlit as st
 import pandas as pd
 import os
 import matplotlib.pyplot as plt
+from storage import append_csv
+from macro_engine import MacroEngine, unit_scale
 
 # Food Data
 food_data = {
@@ -66,13 +68,14 @@ if food == "Type a new food...":
 
 quantity = st.number_input("Quantity", min_value=0.1, step=0.1)
 
+# Shared macro engine, same unit rules as the main app
+macro_engine = MacroEngine(food_data, nutrients=["Protein", "Carbs", "Fats"])
+
 # Function to get or input macros
 def get_macros(food, quantity):
-    if food in food_data:
-        unit = food_data[food]["unit"]
-        protein_per_unit = food_data[food]["Protein"]
-        carbs_per_unit = food_data[food]["Carbs"]
-        fats_per_unit = food_data[food]["Fats"]
+    if food in macro_engine:
+        protein, carbs, fats = macro_engine.compute([food], [quantity])[0]
+        return protein, carbs, fats, macro_engine.unit(food)
     else:
         st.warning("New food detected! Please enter macros.")
         unit = st.selectbox("Unit", ["grams", "ml", "piece"])
@@ -83,9 +86,10 @@ def get_macros(food, quantity):
         if st.button("Save New Food"):
             food_data[food] = {"unit": unit, "Protein": protein_per_unit, "Carbs": carbs_per_unit, "Fats": fats_per_unit}
             save_food_data()
+            macro_engine.add_food(food, food_data[food])
             st.success(f"{food} added to database!")
 
-    factor = quantity if unit == "piece" else quantity / 100  # Normalize grams/ml
+    factor = quantity * unit_scale(unit)
     return protein_per_unit * factor, carbs_per_unit * factor, fats_per_unit * factor, unit
 
 if food:
@@ -94,13 +98,8 @@ if food:
     if st.button("Add to Log"):
         new_entry = {"Date": pd.Timestamp.today().strftime('%Y-%m-%d'), "Food": food, "Quantity": quantity, "Unit": unit, "Protein": protein, "Carbs": carbs, "Fats": fats}
         
-        if os.path.exists("food_log.csv"):
-            log_data = pd.read_csv("food_log.csv")
-            log_data = pd.concat([log_data, pd.DataFrame([new_entry])], ignore_index=True)
-        else:
-            log_data = pd.DataFrame([new_entry])
-        
-        log_data.to_csv("food_log.csv", index=False)
+        # Append just the new row instead of reading and rewriting the whole file
+        append_csv("food_log.csv", [new_entry])
         st.success("Entry Added!")
 
 # Display the logged data
@@ -2,9 +2,21 @@ import streamlit as st
 import pandas as pd
 import os
 import matplotlib.pyplot as plt
-import gspread
-from google.oauth2.service_account import Credentials
-from datetime import datetime
+from sheets import get_pool
+from datetime import datetime, timedelta
+from storage import LogWriteQueue, latest_log_id
+from log_mirror import get_log_mirror
+from daily_log import get_daily_index, frame_totals, with_pending
+from write_behind import get_write_queue, show_pending_writes
+from quota import show_api_usage
+from macro_engine import MacroEngine, is_weight_based
+from food_index import get_food_index, normalize_food_name
+from food_search import get_food_search
+from usage_model import get_usage_model
+from schema import coerce_food, format_day, sheet_records
+from snapshots import get_log_snapshot, show_memory_usage
+from row_ids import ID_COLUMN, assign_row_ids, new_row, sheet_values
+from page_data import PAGE_SHEETS, get_page_data
 
 
 
@@ -17,25 +29,50 @@ from datetime import datetime
 
 # food_data = load_food_data()
 
-# Google Sheets authentication
-scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-#creds = Credentials.from_service_account_file("service_account.json", scopes=scope)
-creds = Credentials.from_service_account_info(st.secrets["service_account"], scopes=scope)
-client = gspread.authorize(creds)
+# Sheets are read through the shared page cache, all at once (see page_data.py)
+page_data = get_page_data()
+
+# Writes are queued locally and sent to Sheets by a background thread
+write_queue = get_write_queue()
+food_writer = write_queue.worksheet("FoodDatabase")
+log_writer = write_queue.worksheet("FoodLog")
+
+# Log rows added during this rerun go out together in one append
+log_queue = LogWriteQueue(log_writer)
+
+# Local copy of the FoodLog that only fetches rows added since the last sync
+log_mirror = get_log_mirror()
+
+# The food database is fetched while the mirror syncs, not after it
+page_data.load(PAGE_SHEETS["Log Your Food"], tasks=[log_mirror.sync])
 
-# Open the Google Sheet
-SHEET_URL = "https://docs.google.com/spreadsheets/d/1mVbGbsThxK9L1mC2-2n_qlC2S0IoPM7zxQYT8DVBiAA/edit?gid=1560030794#gid=1560030794"
-spreadsheet = client.open_by_url(SHEET_URL)
-food_sheet = spreadsheet.worksheet("FoodDatabase")
-log_sheet = spreadsheet.worksheet("FoodLog")
+# Normalized-name index of the food database, kept across reruns
+food_index = get_food_index()
 
 # Load existing food data from Google Sheets
 def load_food_data():
-    data = food_sheet.get_all_records()
-    return {row["Food"]: row for row in data} if data else {}
+    data = page_data.records("FoodDatabase")
+    foods = {row["Food"]: row for row in data} if data else {}
+    names = [row["Food"] for row in data]
+    # Foods saved moments ago may still be waiting in the write queue
+    if data:
+        header = list(data[0])
+        for row in write_queue.pending_rows("FoodDatabase"):
+            foods.setdefault(row[0], dict(zip(header, row)))
+            names.append(row[0])
+    if food_index.ensure(names):
+        # The database changed under us; row IDs are looked up afresh before the next delete
+        write_queue.row_index("FoodDatabase").invalidate()
+    assign_row_ids(write_queue, "FoodDatabase", sheet_values(data))
+    return foods
 
 
 food_data = load_food_data()
+# Column order of the FoodDatabase worksheet, for writing new foods
+food_header = list(next(iter(food_data.values()))) if food_data else ["Food", "Unit", "Protein", "Carbs", "Fats", "Calories", "Timestamp"]
+
+# Nutrient matrix of the food database; every macro calculation on this page goes through it
+macro_engine = MacroEngine(food_data)
 
 # # Save function to update CSV
 # def save_food_data():
@@ -50,20 +87,22 @@ from datetime import datetime
 # Default: today's date
 selected_date = datetime.today().date()
 
-def is_weight_based(unit):
-    return unit.lower() in ["gram", "grams", "g", "ml"]
-
 # Advanced options toggle
 with st.expander("🔧 Advanced Options"):
     selected_date = st.date_input("Select Date to Log", value=datetime.today().date())
 
-    log_date_str = selected_date.strftime('%d/%m/%Y')
+    log_date_str = format_day(selected_date)
     st.markdown("---")
     st.markdown("### 🔁 Delete Latest Log Entry")
     if st.button("Delete Latest Log Entry from Food Log"):
-        log_records = log_sheet.get_all_records()
-        if log_records:
-            log_sheet.delete_rows(len(log_records)+1)  # Add 2: 1 for headers, 1 for 1-based index
+        log, pending = log_mirror.read(), write_queue.pending_rows("FoodLog")
+        if not log.empty or pending:
+            latest = latest_log_id(log, pending)
+            # By ID, so a row added in Sheets meanwhile isn't the one deleted; rows from before IDs by position
+            if latest:
+                log_writer.delete_ids([latest])
+            else:
+                log_writer.delete_last_row()
             st.success("Deleted the latest entry from the Food Log.")
         else:
             st.warning("Food Log is empty.")
@@ -72,8 +111,13 @@ with st.expander("🔧 Advanced Options"):
     # --- Frequently Used Food Buttons ---
     st.markdown("### ⚡ Quick Add")
 
-    # Define your frequent food list
-    frequent_food_names = ["Apple Cider Vinegar", "Turmeric Latte", "Lemon Juice", "Green Tea"]  # You define this list
+    # What you usually log at this point of the day, with the amount you usually have
+    usage_model = get_usage_model(log_mirror)
+    frequent_food_names = usage_model.suggest(selected_date, known=food_data)
+    if frequent_food_names:
+        st.caption(f"Your usual foods for: {usage_model.next_slot(selected_date)}")
+    else:
+        st.caption("Log a few foods and your most used ones will show up here.")
 
     # Set how many buttons per row
     buttons_per_row = 4
@@ -83,74 +127,60 @@ with st.expander("🔧 Advanced Options"):
         cols = st.columns(buttons_per_row)
         for j, food_name in enumerate(frequent_food_names[i:i+buttons_per_row]):
             with cols[j]:
-                if st.button(food_name):
-                    if food_name in food_data:
-                        unit = food_data[food_name]["Unit"]
-                        default_qty = 100 if is_weight_based(unit) else 1
-                        factor = default_qty / 100 if is_weight_based(unit) else default_qty
-
-                        new_entry = {
-                            "Date": log_date_str,
-                            "Food": food_name,
-                            "Quantity": default_qty,
-                            "Unit": unit,
-                            "Protein": food_data[food_name]["Protein"] * factor,
-                            "Carbs": food_data[food_name]["Carbs"] * factor,
-                            "Fats": food_data[food_name]["Fats"] * factor,
-                            "Calories": food_data[food_name]["Calories"] * factor,
-                        }
-
-                        log_sheet.append_rows([list(new_entry.values())])
-                        st.success(f"{food_name} ({default_qty} {unit}) added to log!")
-                    else:
-                        st.warning(f"{food_name} not found in Food Database.")
+                unit = food_data[food_name]["Unit"]
+                default_qty = usage_model.typical_quantity(food_name) or (100 if is_weight_based(unit) else 1)
+                if st.button(f"{food_name} ({default_qty:g} {unit})", key=f"quick_add_{food_name}"):
+                    new_entry = macro_engine.log_entry(log_date_str, food_name, default_qty)
+
+                    log_queue.add(new_entry)
+                    st.success(f"{food_name} ({default_qty:g} {unit}) added to log!")
 
 
         # ✅ NEW: Refresh button and session cache
     st.markdown("---")
     st.markdown("### 📋 Latest 10 Entries View (with Refresh)")
     if st.button("🔄 Refresh Tables"):
-        st.session_state.log_data_full = pd.DataFrame(log_sheet.get_all_records())
-        st.session_state.food_data_full = pd.DataFrame(food_sheet.get_all_records())
+        page_data.invalidate("FoodDatabase")
+        log_mirror.sync(force=True)
+        st.session_state.food_data_full = coerce_food(pd.DataFrame(page_data.records("FoodDatabase")))
         st.success("Tables refreshed!")
 
-    if 'log_data_full' not in st.session_state:
-        st.session_state.log_data_full = pd.DataFrame(log_sheet.get_all_records())
     if 'food_data_full' not in st.session_state:
-        st.session_state.food_data_full = pd.DataFrame(food_sheet.get_all_records())
+        st.session_state.food_data_full = coerce_food(pd.DataFrame(page_data.records("FoodDatabase")))
 
             
     st.markdown("---")
-    st.markdown("### 🗑️ Delete Entries by Row Number")
+    st.markdown("### 🗑️ Delete Entries")
     delete_target = st.radio("Choose what to delete", ["Food Log Entry", "Food Database Entry"])
 
+    # Rows are picked by their ID; the write queue finds where they are when it deletes them
     if delete_target == "Food Log Entry":
-        df = st.session_state.log_data_full
-        st.dataframe(df.tail(10))  # ✅ Display last 10 entries with index
-        row_index_to_delete = st.number_input(
-            "Enter the DataFrame index to delete from Food Log", 
-            min_value=int(df.index.min()), 
-            max_value=int(df.index.max()), 
-            step=1
-        )
-        if st.button("Delete Row from Food Log"):
-            sheet_row_to_delete = row_index_to_delete + 2  # +1 for header, +1 for 1-based indexing
-            log_sheet.delete_rows(sheet_row_to_delete)
-            st.success(f"Deleted DataFrame index {row_index_to_delete} (Sheet row {sheet_row_to_delete}) from Food Log")
+        # The shared log snapshot; its latest rows are a view built once per log version
+        log_snapshot = get_log_snapshot(log_mirror)
+        latest = log_snapshot.view("latest 10", lambda log: log.tail(10))
+        st.dataframe(latest, hide_index=True)
+        entries = {row[ID_COLUMN]: f"{row['Date']} · {row['Food']} · {row['Quantity']:g} {row['Unit']}"
+                   for _, row in latest.iloc[::-1].iterrows() if row.get(ID_COLUMN)} if ID_COLUMN in latest else {}
+        picked = st.multiselect("Entries to delete from Food Log", list(entries), format_func=entries.get)
+        if st.button("Delete Selected from Food Log", disabled=not picked):
+            log_writer.delete_ids(picked)
+            st.success(f"Deleted {len(picked)} entr{'y' if len(picked) == 1 else 'ies'} from the Food Log.")
+        if not entries:
+            st.caption("Entries get an ID once they have synced; try again in a moment.")
 
     elif delete_target == "Food Database Entry":
         df = st.session_state.food_data_full
-        st.dataframe(df)
-        row_index_to_delete = st.number_input(
-            "Enter the DataFrame index to delete from Food Database", 
-            min_value=int(df.index.min()), 
-            max_value=int(df.index.max()), 
-            step=1
-        )
-        if st.button("Delete Row from Food Database"):
-            sheet_row_to_delete = row_index_to_delete + 2
-            food_sheet.delete_rows(sheet_row_to_delete)
-            st.success(f"Deleted DataFrame index {row_index_to_delete} (Sheet row {sheet_row_to_delete}) from Food Database")
+        st.dataframe(df, hide_index=True)
+        foods = dict(zip(df[ID_COLUMN], df["Food"])) if ID_COLUMN in df else {}
+        foods.pop("", None)
+        picked = st.multiselect("Foods to delete from Food Database", list(foods), format_func=foods.get)
+        if st.button("Delete Selected from Food Database", disabled=not picked):
+            food_writer.delete_ids(picked)
+            for row_id in picked:
+                food_index.remove(foods[row_id])
+            st.success(f"Deleted {', '.join(foods[row_id] for row_id in picked)} from the Food Database.")
+        if not foods:
+            st.caption("Foods get an ID once they have synced; try again in a moment.")
 
 
 
@@ -158,36 +188,92 @@ def save_food_data():
     df = pd.DataFrame.from_dict(food_data, orient="index").reset_index()
     df.rename(columns={"index": "Food"}, inplace=True)  
 
-    # Ensure no duplicate "Food" entries in df
-    if df["Food"].duplicated().any():
+    # Ensure no duplicate "Food" entries in df (ignoring case and spacing)
+    if df["Food"].map(normalize_food_name).duplicated().any():
         st.error("Duplicate food entries found in the database. Please resolve duplicates before saving.")
         return  # Stop execution if duplicates are found
 
-    existing_foods = {row["Food"] for row in food_sheet.get_all_records()}
-
-    new_rows = df[~df["Food"].isin(existing_foods)].values.tolist()
+    new_rows = df[~df["Food"].map(food_index.__contains__)].values.tolist()
     
     if new_rows:
-        food_sheet.append_rows(new_rows)  # Append only new foods
+        food_writer.append_rows(new_rows)  # Append only new foods
+        for row in new_rows:
+            food_index.add(row[0])
 
-existing_foods = [row["Food"] for row in food_sheet.get_all_records()]
-duplicates = set([food for food in existing_foods if existing_foods.count(food) > 1])
+# Duplicates are tracked by the index as foods are added, so this is a lookup
+duplicates = food_index.duplicates()
 
 if duplicates:
-    st.error(f"Duplicate foods in Google Sheets: {duplicates}. Please remove them.")
+    st.error(f"Duplicate foods in Google Sheets: {', '.join(' / '.join(names) for names in duplicates.values())}. Please remove them.")
+
+
+# --- Meal Entry: several foods computed together and written in one append ---
+with st.expander("🍽️ Log a Meal"):
+    st.markdown("### 🥣 Several Foods at Once")
+    meal_lines = st.data_editor(
+        pd.DataFrame({"Food": pd.Series(dtype="object"), "Quantity": pd.Series(dtype="float")}),
+        num_rows="dynamic",
+        use_container_width=True,
+        hide_index=True,
+        key="meal_editor",
+        column_config={
+            "Food": st.column_config.SelectboxColumn("Food", options=list(food_data.keys()), required=True),
+            "Quantity": st.column_config.NumberColumn("Quantity", min_value=0.0, step=1.0, required=True),
+        },
+    )
+    meal_lines = meal_lines.dropna()
+    meal_lines = meal_lines[meal_lines["Food"].isin(food_data.keys()) & (meal_lines["Quantity"] > 0)]
+
+    if not meal_lines.empty:
+        meal_macros = macro_engine.compute(meal_lines["Food"].tolist(), meal_lines["Quantity"].tolist()).sum(axis=0)
+        st.caption(" | ".join(f"{name}: {value:.1f}" for name, value in zip(macro_engine.nutrients, meal_macros)))
+
+    if st.button("Add Meal to Log"):
+        if meal_lines.empty:
+            st.warning("Add at least one food with a quantity.")
+        else:
+            meal_entries = macro_engine.log_entries(log_date_str, meal_lines["Food"].tolist(), meal_lines["Quantity"].tolist())
+            for entry in meal_entries:
+                log_queue.add(entry)
+            st.success(f"Meal with {len(meal_entries)} items added to log!")
 
+    st.markdown("---")
+    st.markdown("### 🔁 Copy a Meal from Another Day")
+    copy_from = st.date_input("Copy from", value=selected_date - timedelta(days=1))
+    copy_rows = get_daily_index(log_mirror).day(copy_from)
+
+    if copy_rows.empty:
+        st.info(f"Nothing logged on {format_day(copy_from)}.")
+    else:
+        copy_records = sheet_records(copy_rows)
+        picked = st.multiselect(
+            "Entries to copy",
+            options=list(range(len(copy_records))),
+            default=list(range(len(copy_records))),
+            format_func=lambda i: f"{copy_records[i]['Food']} ({copy_records[i]['Quantity']:g} {copy_records[i]['Unit']})",
+        )
+        if st.button(f"Copy {len(picked)} Entries to {log_date_str}"):
+            for i in picked:
+                log_queue.add({**copy_records[i], "Date": log_date_str})
+            st.success(f"Copied {len(picked)} entries to {log_date_str}!")
 
 
-# Step 1: Create list of existing foods + "Add New Food..."
-food_options = ["Add New Food..."] + list(food_data.keys())
+# Step 1: Search the food database on the server; the selectbox only gets the top matches,
+# ranked by how often and how recently each food was logged
+food_search = get_food_search(food_data, log_mirror)
+food_query = st.text_input("Search Food", placeholder="Type a few letters, e.g. 'gr yog'")
+food_options = ["Add New Food..."] + food_search.search(food_query)
 
-# Step 2: Select box with existing foods
-selection = st.selectbox("Select Food or Add New", options=food_options)
+# Step 2: Select box with the matching foods
+selection = st.selectbox("Select Food or Add New", options=food_options, index=1 if food_query and len(food_options) > 1 else 0)
 
 # Step 3: If "Add New Food..." is chosen, show text input for new entry
 if selection == "Add New Food...":
     new_food = st.text_input("Enter new food name:")
     food = new_food if new_food else None  # Ensure user actually types something
+    # A name that only differs in case or spacing refers to the food already in the database
+    if food and food_index.find(food) in food_data:
+        food = food_index.find(food)
 else:
     food = selection  # Selected from existing foods
 
@@ -201,18 +287,9 @@ unit_display = food_data[food]["Unit"] if food in food_data else ""
 # Display quantity input along with the unit
 quantity = st.number_input(f"Quantity ({unit_display})", min_value=1, step=1)
 
-def is_weight_based(unit):
-    return unit.lower() in ["gram", "grams", "g", "ml"]
-
 # Step 4: Handle food selection or new entry
 if food in food_data:
     unit = food_data[food]["Unit"]  # Get the unit for this food item
-    # Existing food - Compute macros
-    factor = quantity / 100 if is_weight_based(unit) else quantity
-    protein = food_data[food]["Protein"] * factor
-    carbs = food_data[food]["Carbs"] * factor
-    fats = food_data[food]["Fats"] * factor
-    calories = food_data[food]["Calories"]*factor
 else:
     # New food - Ask for macros
     st.warning("Food not found. Enter macros below to save it.")
@@ -236,15 +313,22 @@ else:
     fats = st.number_input("Fats (g)", min_value=0.0, format="%.1f")
     calories = st.number_input("Calories", min_value=0.0, format="%.1f")
 
-    
+    # Catch other spellings of a food that is already in the database
+    near_duplicates = food_search.near_duplicates(food) if food else []
+    save_anyway = True
+    if near_duplicates:
+        st.warning(f"Similar foods already exist: {', '.join(near_duplicates)}. Search for one of them above instead?")
+        save_anyway = st.checkbox("It's a different food, save it anyway")
 
     # Step 5: Save new food
     if st.button("Save New Food"):
         # Ensure the food name is not empty
         if not food:
             st.error("Food name cannot be empty!")
-        elif food in food_data:
-            st.warning(f"{food} already exists in the database.")
+        elif food in food_index:
+            st.warning(f"{food} already exists in the database as {food_index.find(food)}.")
+        elif not save_anyway:
+            st.error("Not saved: pick the existing food, or tick the box if this really is a different food.")
         else:
             # Append new food entry
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -257,34 +341,23 @@ else:
                 "Calories": calories,
                 "Timestamp": timestamp  # Add timestamp
             }
+
+            # Save new food to Google Sheets, in the database's column order and with its own ID
+            food_writer.append_rows([new_row(new_entry, food_header)])
+            food_index.add(food)
+            food_search.add(food)
             
-            # Convert food_data to DataFrame before saving
-            df_new_food = pd.DataFrame([new_entry])  # Convert single entry to DataFrame
-            
-            # Save new food to Google Sheets
-            food_sheet.append_rows(df_new_food.values.tolist())
-            
-            # Update local food_data dictionary
+            # Update local food_data dictionary and the macro engine
             food_data[food] = {"Unit": unit, "Protein": protein, "Carbs": carbs, "Fats": fats, "Calories": calories}
+            macro_engine.add_food(food, food_data[food])
             
             st.success(f"{food} has been added to the database!")
 
 # ---- Automatically log the newly added food ----
-            unit = food_data[food]["Unit"]  # Get the unit for this food item
-            factor = quantity / 100 if is_weight_based(unit) else quantity
-            logged_entry = {
-                "Date": log_date_str,
-                "Food": food,
-                "Quantity": quantity,
-                "Unit": unit,
-                "Protein": protein * factor,
-                "Carbs": carbs * factor,
-                "Fats": fats * factor,
-                "Calories": calories * factor
-            }
+            logged_entry = macro_engine.log_entry(log_date_str, food, quantity)
     
             # Append the logged entry to Google Sheets
-            log_sheet.append_rows([list(logged_entry.values())])
+            log_queue.add(logged_entry)
             
             st.success(f"{food} has also been logged with {quantity} {unit}!")
 
@@ -293,47 +366,35 @@ else:
 
 # Compute macros if food exists
 if food in food_data:
-    unit = food_data[food]["Unit"]  # Get the unit for this food item
-    factor = quantity / 100 if is_weight_based(unit) else quantity
-    protein = food_data[food]["Protein"] * factor
-    carbs = food_data[food]["Carbs"] * factor
-    fats = food_data[food]["Fats"] * factor
-    calories = food_data[food]["Calories"] * factor
-
     if st.button("Add to Log"):
-        new_entry = {
-            "Date": log_date_str,
-            "Food": food,
-            "Quantity": quantity,
-            "Unit": food_data[food]["Unit"],
-            "Protein": protein,
-            "Carbs": carbs,
-            "Fats": fats,
-            "Calories": calories
-        }
-
-        existing_log = log_sheet.get_all_records()
-        log_data = pd.DataFrame(existing_log)
-        log_data = pd.concat([log_data, pd.DataFrame([new_entry])], ignore_index=True)
-
-        log_sheet.clear()
-        log_sheet.update([log_data.columns.values.tolist()] + log_data.values.tolist())
+        new_entry = macro_engine.log_entry(log_date_str, food, quantity)
+        log_queue.add(new_entry)
 
         st.success("Entry Added!")
 
 
-st.session_state.pop('log_data_today', None)
-st.session_state.pop('total_macros', None)
-st.session_state.pop('full_log_data', None)
+# Queue every log row added during this rerun as one append; the mirror is
+# refreshed when the write queue reports it has reached the sheet
+log_queue.flush()
+show_pending_writes(write_queue)
+show_api_usage(get_pool().scheduler)
+show_memory_usage(get_log_snapshot(log_mirror))
+
 
 # Show log
 #log_data = pd.DataFrame(log_sheet.get_all_records())
 #if not log_data.empty:
 #    st.dataframe(log_data.tail(10))
 
-# Filter today's data
-log_data = pd.DataFrame(log_sheet.get_all_records())
-log_data = log_data[log_data["Date"] == log_date_str]
+# Look up the selected day's rows and totals in the per-day index
+daily_index = get_daily_index(log_mirror)
+log_data = daily_index.day(selected_date)
+day_totals = daily_index.totals(selected_date)
+
+pending_today = [row for row in write_queue.pending_rows("FoodLog") if row[:1] == [log_date_str]]
+if pending_today:
+    log_data = with_pending(log_data, pending_today)
+    day_totals = frame_totals(log_data)
 
 
 if not log_data.empty:
@@ -341,10 +402,10 @@ if not log_data.empty:
     st.dataframe(log_data)
 
     # Show totals
-    total_protein = log_data["Protein"].sum()
-    total_carbs = log_data["Carbs"].sum()
-    total_fats = log_data["Fats"].sum()
-    total_calories = log_data["Calories"].sum()
+    total_protein = day_totals["Protein"]
+    total_carbs = day_totals["Carbs"]
+    total_fats = day_totals["Fats"]
+    total_calories = day_totals["Calories"]
     # Show totals in columns
     col1, col2, col3, col4 = st.columns(4)
     col1.metric("Protein (g)", f"{total_protein:.1f}")
@@ -366,21 +427,13 @@ if not log_data.empty:
             st.success(f"🎉 You've exceeded your protein goal by {difference:.1f}g!")
 
 
-    if 'log_data_today' not in st.session_state:
-        st.session_state['log_data_today'] = log_data
-
-    if 'total_macros' not in st.session_state:
-        st.session_state['total_macros'] = {
-            'protein': total_protein,
-            'carbs': total_carbs,
-            'fats': total_fats,
-            'calories': total_calories
-        }
-
     st.markdown("### 🥇 Top Foods by Macro Contribution Today")
 
     def show_top_foods(nutrient, label, color):
-        top = log_data.groupby("Food")[nutrient].sum().sort_values(ascending=False).head(3)
+        if pending_today:
+            top = log_data.groupby("Food", observed=True)[nutrient].sum().sort_values(ascending=False).head(3)
+        else:
+            top = daily_index.top_foods(selected_date, nutrient)
         if not top.empty:
             st.markdown(f"**Top 3 {label} Foods:**")
             for idx, (food, amount) in enumerate(top.items(), start=1):
@@ -395,9 +448,5 @@ if not log_data.empty:
         show_top_foods("Carbs", "Carbs", "green")
         show_top_foods("Calories", "Calorie", "red")
 
-
-
-if 'full_log_data' not in st.session_state:
-    st.session_state['full_log_data'] = pd.DataFrame(log_sheet.get_all_records())
-
-
+# The page is drawn; load what the other pages need while the user reads it
+page_data.warm()
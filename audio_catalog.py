@@ -0,0 +1,304 @@
+"""Catalog of the audio clips in static/audio_clips.
+
+Clips are played from Streamlit's static file route (enableStaticServing in
+.streamlit/config.toml). It streams them from disk and answers range requests,
+so the browser can seek and the app never reads a clip into memory. The catalog
+lists each clip's size, duration and bitrate. These are read from the MP3 frame
+header (or the WAV header) without decoding anything. It is built once per
+process and scanned again only when the folder's mtime changes.
+
+File names carry the clip's place in a series, e.g.
+"10 - 3. Just like the Parts of a Butchered Cow - The Four Elements - 26_34.mp3"
+is clip 3 of series 10, "The Four Elements", taken from 26:34 into the source
+talk. parse_clip_name() reads these fields. The catalog keeps each series'
+clips in order, so playing a series or finding the next clip is a dict lookup.
+The catalog is saved to .cache/audio_catalog.json. A rescan reads headers only
+for files whose size or mtime changed.
+"""
+import json
+import os
+import re
+import struct
+import threading
+from collections import Counter
+from urllib.parse import quote
+
+import streamlit as st
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+AUDIO_DIR = os.path.join(HERE, "static", "audio_clips")
+STATIC_URL = "/app/static/audio_clips/"
+EXTENSIONS = (".mp3", ".wav")
+CATALOG_PATH = os.path.join(HERE, ".cache", "audio_catalog.json")
+
+# Bump when the saved fields change, so an older catalog is rebuilt
+CATALOG_VERSION = 1
+
+# Bytes read after any ID3 tag to find the first MPEG frame
+HEADER_BYTES = 16 * 1024
+
+# kbit/s by bitrate index, for MPEG-1 Layer III and MPEG-2/2.5 Layer III
+_MP3_BITRATES = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_MP3_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+
+def _id3_size(head):
+    """Length of the ID3v2 tag at the start of a file, 0 if there is none."""
+    if len(head) < 10 or head[:3] != b"ID3":
+        return 0
+    size = (head[6] & 0x7F) << 21 | (head[7] & 0x7F) << 14 | (head[8] & 0x7F) << 7 | head[9] & 0x7F
+    return 10 + size + (10 if head[5] & 0x10 else 0)  # footer
+
+
+def mp3_info(path):
+    """(duration in seconds, bitrate in kbit/s) of an MP3 file from its first frame header, or (None, None)."""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        start = _id3_size(f.read(10))
+        f.seek(start)
+        data = f.read(HEADER_BYTES)
+        f.seek(max(size - 128, 0))
+        id3v1 = 128 if f.read(3) == b"TAG" else 0
+    for i in range(len(data) - 4):
+        if data[i] != 0xFF or data[i + 1] & 0xE0 != 0xE0:
+            continue
+        version = data[i + 1] >> 3 & 0x03  # 3: MPEG-1, 2: MPEG-2, 0: MPEG-2.5
+        layer = data[i + 1] >> 1 & 0x03  # 1: Layer III
+        bitrate_index = data[i + 2] >> 4
+        rate_index = data[i + 2] >> 2 & 0x03
+        if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+            continue
+        bitrate = _MP3_BITRATES[1 if version == 3 else 2][bitrate_index]
+        sample_rate = _MP3_SAMPLE_RATES[version][rate_index]
+        samples_per_frame = 1152 if version == 3 else 576
+        mono = data[i + 3] >> 6 == 3
+        # A Xing/Info header in the first frame gives the frame count of VBR files
+        side_info = (17 if mono else 32) if version == 3 else (9 if mono else 17)
+        xing = i + 4 + side_info
+        if data[xing:xing + 4] in (b"Xing", b"Info") and len(data) >= xing + 12:
+            flags = struct.unpack(">I", data[xing + 4:xing + 8])[0]
+            if flags & 1:
+                frames = struct.unpack(">I", data[xing + 8:xing + 12])[0]
+                duration = frames * samples_per_frame / sample_rate
+                audio_bytes = size - start - i - id3v1
+                return duration, round(audio_bytes * 8 / duration / 1000) if duration else bitrate
+        # Constant bitrate: the rest of the file at the first frame's bitrate
+        return (size - start - i - id3v1) * 8 / (bitrate * 1000), bitrate
+    return None, None
+
+
+def wav_info(path):
+    """(duration in seconds, bitrate in kbit/s) of a PCM WAV file from its RIFF header, or (None, None)."""
+    with open(path, "rb") as f:
+        head = f.read(HEADER_BYTES)
+    if head[:4] != b"RIFF" or head[8:12] != b"WAVE":
+        return None, None
+    byte_rate, offset = None, 12
+    while offset + 8 <= len(head):
+        chunk, length = head[offset:offset + 4], struct.unpack("<I", head[offset + 4:offset + 8])[0]
+        if chunk == b"fmt ":
+            byte_rate = struct.unpack("<I", head[offset + 16:offset + 20])[0]
+        elif chunk == b"data" and byte_rate:
+            return length / byte_rate, round(byte_rate * 8 / 1000)
+        offset += 8 + length + (length & 1)
+    return None, None
+
+
+def clip_info(path):
+    try:
+        return mp3_info(path) if path.lower().endswith(".mp3") else wav_info(path)
+    except (OSError, struct.error):
+        return None, None
+
+
+# --- File names ---
+_CLIP_NAME = re.compile(r"^(\d+)\s*-\s*(\d+)\.\s*(.*)$")
+# The source timestamp is usually " - MM_SS" but sometimes follows a space or a bare "-"
+_SOURCE_TIME = re.compile(r"[\s-]*\b(\d{1,3})_(\d{2})$")
+
+
+def parse_clip_name(file):
+    """Series number, clip number, title, series name and source offset (seconds) encoded in a clip's file name.
+
+    Fields the name doesn't have are None (the title falls back to the whole name).
+    """
+    stem = os.path.splitext(file)[0]
+    fields = {"series": None, "number": None, "title": stem.strip(), "series_name": None, "source_seconds": None}
+    match = _CLIP_NAME.match(stem)
+    if not match:
+        return fields
+    fields["series"], fields["number"] = int(match.group(1)), int(match.group(2))
+    rest = match.group(3)
+    source = _SOURCE_TIME.search(rest)
+    if source:
+        fields["source_seconds"] = int(source.group(1)) * 60 + int(source.group(2))
+        rest = rest[:source.start()]
+    parts = [" ".join(part.split()) for part in rest.split(" - ")]
+    if len(parts) > 1:
+        fields["title"], fields["series_name"] = " - ".join(parts[:-1]), parts[-1]
+    else:
+        fields["title"] = parts[0]
+    return fields
+
+
+def _series_name(names):
+    """The spelling most clips of a series use ("Concentration And Contemplation" vs "... and ...")."""
+    counts = Counter(name for name in names if name)
+    if not counts:
+        return None
+    by_key = Counter()
+    for name, count in counts.items():
+        by_key[name.casefold()] += count
+    key = by_key.most_common(1)[0][0]
+    return max((name for name in counts if name.casefold() == key), key=counts.get)
+
+
+def clip_url(clip):
+    """Static URL of a clip, for st.audio."""
+    return STATIC_URL + quote(clip["file"])
+
+
+def clip_format(clip):
+    return "audio/mpeg" if clip["file"].lower().endswith(".mp3") else "audio/wav"
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return "?"
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+class AudioCatalog:
+    def __init__(self, directory=AUDIO_DIR, path=CATALOG_PATH):
+        self.directory = directory
+        self.path = path
+        self.clips = []  # one dict per clip (see _scan_clip), in series and clip order
+        self.series = {}  # series number -> its clips in clip order
+        self.series_names = {}  # series number -> name
+        self.revision = None  # the folder's mtime at the last scan
+        self._by_file = {}  # file name -> clip
+        self._position = {}  # file name -> position in its series
+        self._lock = threading.Lock()
+        self._load()
+
+    # --- Saved catalog ---
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        if saved.get("version") == CATALOG_VERSION and saved.get("directory") == self.directory:
+            # Not trusted as current: refresh() still checks every file against it
+            self._index(saved["clips"])
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        saved = {"version": CATALOG_VERSION, "directory": self.directory, "clips": self.clips}
+        with open(self.path + ".tmp", "w") as f:
+            json.dump(saved, f)
+        os.replace(self.path + ".tmp", self.path)
+
+    # --- Scanning ---
+    def _scan_clip(self, name, stat):
+        duration, bitrate = clip_info(os.path.join(self.directory, name))
+        clip = {"file": name, "size": stat.st_size, "mtime": stat.st_mtime_ns, "duration": duration, "bitrate": bitrate}
+        clip.update(parse_clip_name(name))
+        return clip
+
+    def refresh(self):
+        """Rescans the folder if files were added, removed or replaced since the last scan.
+
+        Only new or changed files (by size and mtime) have their headers read. Returns True if anything changed.
+        """
+        try:
+            revision = os.stat(self.directory).st_mtime_ns
+        except OSError:
+            revision = None
+        with self._lock:
+            if revision is not None and revision == self.revision:
+                return False
+            clips, changed = [], False
+            for entry in os.scandir(self.directory) if revision is not None else []:
+                if not entry.name.lower().endswith(EXTENSIONS) or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                clip = self._by_file.get(entry.name)
+                if clip is None or clip["size"] != stat.st_size or clip["mtime"] != stat.st_mtime_ns:
+                    clip, changed = self._scan_clip(entry.name, stat), True
+                clips.append(clip)
+            changed = changed or len(clips) != len(self.clips)
+            if changed:
+                self._index(clips)
+                self._save()
+            self.revision = revision
+            return changed
+
+    def _index(self, clips):
+        def order(clip):
+            # Numbered clips by series and clip number, then anything else by name
+            return (clip["series"] is None, clip["series"] or 0, clip["number"] or 0, clip["file"])
+
+        self.clips = sorted(clips, key=order)
+        self._by_file = {clip["file"]: clip for clip in self.clips}
+        self.series, self._position = {}, {}
+        for clip in self.clips:
+            if clip["series"] is not None:
+                playlist = self.series.setdefault(clip["series"], [])
+                self._position[clip["file"]] = len(playlist)
+                playlist.append(clip)
+        self.series_names = {
+            number: _series_name(clip["series_name"] for clip in playlist) or f"Series {number}"
+            for number, playlist in self.series.items()
+        }
+
+    # --- Lookups ---
+    def clip(self, file):
+        return self._by_file.get(file)
+
+    def playlist(self, series):
+        """The clips of `series` in play order."""
+        return self.series.get(series, [])
+
+    def position(self, clip):
+        """Position of `clip` in its series' playlist, or None."""
+        return self._position.get(clip["file"])
+
+    def next_clip(self, clip):
+        """The clip after `clip` in its series, or None at the end."""
+        position = self.position(clip)
+        playlist = self.playlist(clip["series"])
+        return playlist[position + 1] if position is not None and position + 1 < len(playlist) else None
+
+    def series_duration(self, series):
+        return sum(clip["duration"] or 0 for clip in self.playlist(series))
+
+    def __len__(self):
+        return len(self.clips)
+
+
+@st.cache_resource(show_spinner=False)
+def get_audio_catalog():
+    catalog = AudioCatalog()
+    catalog.refresh()
+    return catalog
+
+
+def clip_label(clip):
+    """"3. Title (1:05)" for lists of a series' clips."""
+    number = f"{clip['number']}. " if clip["number"] is not None else ""
+    return f"{number}{clip['title']} ({format_duration(clip['duration'])})"
+
+
+def play_clip(clip):
+    """An audio player for `clip`, streamed from the static route rather than read into the page."""
+    if st.get_option("server.enableStaticServing"):
+        st.audio(clip_url(clip), format=clip_format(clip))
+    else:
+        # Without static serving Streamlit reads the file itself; still nothing is kept per session
+        st.audio(os.path.join(AUDIO_DIR, clip["file"]), format=clip_format(clip))
@@ -0,0 +1,309 @@
+"""Minimal changesets for worksheet edits made in the data editors.
+
+Instead of clearing a worksheet and writing it back whole, the editor's result is
+compared with the rows as they were loaded. Only changed cells are updated,
+removed rows are deleted and new rows are appended, all in one
+spreadsheets.batchUpdate call. The sheet is never briefly empty.
+
+Sheets has no revision number for cell values. The changeset therefore records
+what it expects to find instead: the sheet's row count and a checksum of every
+row it touches. If another device changed those rows first, the changeset is
+rejected rather than applied on top. check_revision() reads just those rows and
+the last one in a single batch_get. The page runs it before it reports a save,
+and the write queue runs it again right before applying.
+
+date_changeset() is the migration for older FoodLog rows: it rewrites every Date
+cell that isn't in schema.DATE_FORMAT yet.
+"""
+import functools
+import hashlib
+import math
+
+import pandas as pd
+
+from schema import canonical_date_strict, sheet_value
+from quota import read_fresh
+from sheets import column_letter, sheets_backend
+
+
+class ChangesetConflict(Exception):
+    """The worksheet changed after the rows being edited were loaded."""
+
+
+def cell_key(value):
+    """Comparable form of a cell, so 100, 100.0 and "100" from different readers are equal.
+
+    Numbers are compared to float32 precision (7 significant digits), the precision the log is typed with.
+    Dates are compared in their canonical form, since the log frames are normalized to it at ingest.
+    """
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    return _text_key(str(value).strip())
+
+
+@functools.lru_cache(maxsize=65536)
+def _text_key(text):
+    try:
+        return f"{float(text):.7g}"
+    except ValueError:
+        pass
+    return canonical_date_strict(text) if text[:1].isdigit() else text
+
+
+def row_checksum(values):
+    keys = [cell_key(v) for v in values]
+    while keys and keys[-1] == "":
+        keys.pop()
+    return hashlib.md5("\x1f".join(keys).encode("utf-8")).hexdigest()
+
+
+def editor_rows(base, row_numbers, state, drop=()):
+    """Applies a data_editor's state to `base`, leaving out the rows at positions in `drop`.
+
+    `row_numbers` gives the sheet row of each row of `base` (None for rows not in
+    the sheet yet). Returns [(sheet row or None, values)] in display order.
+    """
+    columns = list(base.columns)
+    state = state or {}
+    deleted = set(state.get("deleted_rows", [])) | set(drop)
+    edited = state.get("edited_rows", {})
+    rows = []
+    for i, (number, values) in enumerate(zip(row_numbers, base.itertuples(index=False, name=None))):
+        if i in deleted:
+            continue
+        values = list(values)
+        for column, value in edited.get(i, edited.get(str(i), {})).items():
+            if column in columns:
+                values[columns.index(column)] = value
+        rows.append((number, values))
+    for added in state.get("added_rows", []):
+        rows.append((None, [added.get(column, "") for column in columns]))
+    return rows
+
+
+def changeset(original, rows):
+    """Changes turning `original` ({sheet row: values}, the whole sheet as loaded) into `rows`.
+
+    Rows left entirely blank are not appended.
+    """
+    updates, appends, kept = [], [], set()
+    for number, values in rows:
+        if number is None:
+            if any(cell_key(v) for v in values):
+                appends.append([sheet_value(v) for v in values])
+            continue
+        kept.add(number)
+        for col, (old, new) in enumerate(zip(original[number], values), start=1):
+            if cell_key(old) != cell_key(new):
+                updates.append([number, col, sheet_value(new)])
+    deletes = sorted(set(original) - kept)
+    touched = {number for number, _, _ in updates} | set(deletes)
+    return {
+        "rows": len(original) + 1,  # header included
+        "expect": {str(number): row_checksum(original[number]) for number in sorted(touched)},
+        "updates": updates,
+        "deletes": deletes,
+        "appends": appends,
+    }
+
+
+def date_changeset(values, column="Date"):
+    """Changes rewriting the `column` cells of a sheet's values (header first) that aren't canonical dates yet.
+
+    Built directly rather than through changeset(), whose cell_key() treats both spellings of a date as equal.
+    """
+    col = values[0].index(column) if values and column in values[0] else None
+    updates = []
+    for number, row in enumerate(values[1:], start=2):
+        if col is not None and col < len(row):
+            text = canonical_date_strict(row[col].strip())
+            if text != row[col]:
+                updates.append([number, col + 1, text])
+    return {
+        "rows": len(values),
+        "expect": {str(number): row_checksum(values[number - 1]) for number, _, _ in updates},
+        "updates": updates,
+        "deletes": [],
+        "appends": [],
+    }
+
+
+def saved_rows(rows):
+    """The sheet's data rows once a changeset built from `rows` has been applied."""
+    kept = [values for number, values in rows if number is not None]
+    return kept + [values for number, values in rows if number is None and any(cell_key(v) for v in values)]
+
+
+def is_empty(changes):
+    return not (changes["updates"] or changes["deletes"] or changes["appends"])
+
+
+def summary(changes):
+    return f"{len(changes['updates'])} cell(s) changed, {len(changes['deletes'])} row(s) deleted, {len(changes['appends'])} row(s) added"
+
+
+def _update_runs(updates):
+    """Updates as (row, col, [values]) runs of consecutive rows in one column, one range write each."""
+    runs = []
+    for row, col, value in sorted(updates, key=lambda u: (u[1], u[0])):
+        if runs and runs[-1][1] == col and runs[-1][0] + len(runs[-1][2]) == row:
+            runs[-1][2].append(value)
+        else:
+            runs.append((row, col, [value]))
+    return runs
+
+
+def _delete_runs(rows):
+    """Contiguous (first, last) runs of `rows`, bottom-most first so earlier deletes don't shift later ones."""
+    runs = []
+    for row in sorted(rows, reverse=True):
+        if runs and runs[-1][0] == row + 1:
+            runs[-1][0] = row
+        else:
+            runs.append([row, row])
+    return runs
+
+
+def _cell_data(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return {"userEnteredValue": {"stringValue": str(value)}}
+    return {"userEnteredValue": {"numberValue": value}}
+
+
+def batch_requests(sheet_id, changes):
+    """spreadsheets.batchUpdate requests for `changes`: cell updates, then deletes, then appends."""
+    requests = [
+        {"updateCells": {
+            "start": {"sheetId": sheet_id, "rowIndex": row - 1, "columnIndex": col - 1},
+            "rows": [{"values": [_cell_data(value)]} for value in values],
+            "fields": "userEnteredValue",
+        }}
+        for row, col, values in _update_runs(changes["updates"])
+    ]
+    requests += [
+        {"deleteDimension": {"range": {"sheetId": sheet_id, "dimension": "ROWS", "startIndex": first - 1, "endIndex": last}}}
+        for first, last in _delete_runs(changes["deletes"])
+    ]
+    if changes["appends"]:
+        requests.append({"appendCells": {
+            "sheetId": sheet_id,
+            "rows": [{"values": [_cell_data(value) for value in row]} for row in changes["appends"]],
+            "fields": "userEnteredValue",
+        }})
+    return requests
+
+
+def check_revision(ws, changes):
+    """Raises ChangesetConflict unless `ws` still has the rows the changeset was built from.
+
+    Only the touched rows and the last row (with the one after it, which must be blank) are read.
+    """
+    runs = _delete_runs(int(number) for number in changes["expect"])
+    last = changes["rows"]
+    results = read_fresh(ws, "batch_get", [f"{first}:{end}" for first, end in runs] + [f"{last}:{last + 1}"])
+    tail = [list(row) for row in results[-1]]
+    if not tail or not any(cell_key(v) for v in tail[0]) or any(cell_key(v) for row in tail[1:] for v in row):
+        raise ChangesetConflict(f"rows were added or removed elsewhere (expected {last} rows)")
+    for (first, end), values in zip(runs, results):
+        values = [list(row) for row in values]
+        for number in range(first, end + 1):
+            row = values[number - first] if number - first < len(values) else []
+            if row_checksum(row) != changes["expect"][str(number)]:
+                raise ChangesetConflict(f"row {number} was changed elsewhere")
+
+
+def _apply(ws, changes):
+    if sheets_backend() == "google":
+        ws.spreadsheet_batch_update({"requests": batch_requests(ws.id, changes)})
+        return
+    # Local backends have no batchUpdate; the same edits one call at a time
+    for row, col, values in _update_runs(changes["updates"]):
+        ws.update(f"{column_letter(col)}{row}", [[value] for value in values])
+    for first, last in _delete_runs(changes["deletes"]):
+        ws.delete_rows(first, last)
+    if changes["appends"]:
+        ws.append_rows(changes["appends"])
+
+
+def apply_changeset(ws, changes):
+    """Checks `ws` still matches what the changeset was built from, then applies it."""
+    check_revision(ws, changes)
+    _apply(ws, changes)
+
+
+def delete_sheet_rows(ws, rows):
+    """Deletes the 1-based sheet `rows` of `ws` in one call (one per contiguous run on local backends), unchecked."""
+    _apply(ws, {"updates": [], "deletes": sorted(set(rows)), "appends": []})
+
+
+class PagedEdits:
+    """Edits to a large table made one page at a time in a data_editor.
+
+    Only the rows on screen are materialized. When the page changes, the editor's
+    state is folded into per-row edits keyed by sheet row, so all pages end up in
+    one changeset on save.
+    """
+
+    def __init__(self, base, version=None):
+        self.base = base  # rows in sheet order; not copied
+        self.version = version  # log version `base` was taken at, if it is the shared snapshot
+        self.edits = {}  # sheet row -> values
+        self.deleted = set()  # sheet rows
+        self.added = []  # values of new rows
+
+    def __len__(self):
+        return len(self.edits) + len(self.deleted) + len(self.added)
+
+    def _values(self, number):
+        if number in self.edits:
+            return list(self.edits[number])
+        return list(self.base.iloc[number - 2])
+
+    def window(self, positions):
+        """Frame for the base rows at `positions` (skipping deleted ones) followed by the new rows, and the sheet row of each."""
+        numbers = [int(p) + 2 for p in positions if int(p) + 2 not in self.deleted] + [None] * len(self.added)
+        values = [self._values(n) for n in numbers if n is not None] + [list(v) for v in self.added]
+        return pd.DataFrame(values, columns=self.base.columns), numbers
+
+    def fold(self, numbers, state, drop=()):
+        """Records a data_editor's state for a window returned by window(); `drop` lists positions to delete too."""
+        state = state or {}
+        columns = list(self.base.columns)
+        deleted = set(state.get("deleted_rows", [])) | set(drop)
+        edited = state.get("edited_rows", {})
+        added = []
+        new_index = 0
+        for i, number in enumerate(numbers):
+            values = self._values(number) if number is not None else list(self.added[new_index])
+            if number is None:
+                new_index += 1
+            if i in deleted:
+                if number is not None:
+                    self.deleted.add(number)
+                    self.edits.pop(number, None)
+                continue
+            changes = edited.get(i, edited.get(str(i), {}))
+            for column, value in changes.items():
+                if column in columns:
+                    values[columns.index(column)] = value
+            if number is None:
+                added.append(values)
+            elif changes:
+                self.edits[number] = values
+        added += [[row.get(column, "") for column in columns] for row in state.get("added_rows", [])]
+        self.added = added
+
+    def add_blank(self):
+        self.added.append([""] * len(self.base.columns))
+
+    def original(self):
+        return {i + 2: list(row) for i, row in enumerate(self.base.itertuples(index=False, name=None))}
+
+    def rows(self):
+        """Every row after the edits, as editor_rows() returns them."""
+        rows = [
+            (number, list(self.edits.get(number, values)))
+            for number, values in enumerate(self.base.itertuples(index=False, name=None), start=2)
+            if number not in self.deleted
+        ]
+        return rows + [(None, list(values)) for values in self.added]
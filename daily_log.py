@@ -0,0 +1,126 @@
+"""Per-day view of the food log.
+
+The log is split into one partition per day, with the macro totals and top foods
+of each day cached. Looking up a date is then a dict lookup instead of a string
+comparison over the whole log. The index follows the FoodLog mirror's change
+journal. New rows are added to their day incrementally, and removed rows (rare)
+rebuild the index.
+"""
+import bisect
+import threading
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from schema import NO_DAY, day_numbers
+
+MACROS = ["Protein", "Carbs", "Fats", "Calories"]
+
+
+def parse_log_dates(dates):
+    """Parses the Date column to datetime.date, parsing each distinct string only once."""
+    ordinals = day_numbers(dates)
+    # Few distinct days, so convert each once rather than once per row
+    unique, inverse = np.unique(ordinals, return_inverse=True)
+    days = np.array([date.fromordinal(o) if o != NO_DAY else None for o in unique], dtype=object)
+    return pd.Series(days[inverse.ravel()], index=dates.index)
+
+
+def frame_totals(frame):
+    return {m: float(pd.to_numeric(frame[m], errors="coerce").sum()) if m in frame else 0.0 for m in MACROS}
+
+
+def with_pending(part, rows):
+    """A day's rows plus log rows still waiting in the write queue, so new entries show up at once."""
+    pending = pd.DataFrame([row[:len(part.columns)] for row in rows], columns=part.columns)
+    for col in MACROS + ["Quantity"]:
+        if col in pending:
+            pending[col] = pd.to_numeric(pending[col], errors="coerce")
+    return pd.concat([part, pending], ignore_index=True) if not part.empty else pending
+
+
+class DailyLogIndex:
+    def __init__(self):
+        self.version = None
+        self.columns = []
+        self.days = []  # sorted
+        self._partitions = {}
+        self._totals = {}
+        self._top_foods = {}
+        self._lock = threading.RLock()
+
+    def update(self, mirror):
+        """Catches up with the mirror: appends new rows, or rebuilds when rows were removed."""
+        with self._lock:
+            frame, version, changes = mirror.catch_up(self.version)
+            if changes is None or any(kind == "remove" for kind, _ in changes):
+                self._rebuild(frame)
+            else:
+                for _, rows in changes:
+                    self._add_rows(rows)
+            self.version = version
+
+    def _rebuild(self, frame):
+        self.columns = list(frame.columns)
+        self.days = []
+        self._partitions = {}
+        self._totals = {}
+        self._top_foods = {}
+        self._add_rows(frame)
+
+    def _add_rows(self, rows):
+        if rows.empty:
+            return
+        days = parse_log_dates(rows["Date"])
+        for day, part in rows.groupby(days, sort=False):
+            if day in self._partitions:
+                self._partitions[day] = pd.concat([self._partitions[day], part])
+            else:
+                self._partitions[day] = part
+                bisect.insort(self.days, day)
+            self._totals.pop(day, None)
+            for key in [k for k in self._top_foods if k[0] == day]:
+                del self._top_foods[key]
+
+    # --- Lookups ---
+    def day(self, day):
+        """Rows logged on `day`, in the order they were logged. Do not modify the result."""
+        with self._lock:
+            return self._partitions.get(day, pd.DataFrame(columns=self.columns))
+
+    def range(self, start, end):
+        """Rows logged from `start` to `end` (inclusive), in date order."""
+        with self._lock:
+            lo = bisect.bisect_left(self.days, start)
+            hi = bisect.bisect_right(self.days, end)
+            parts = [self._partitions[day] for day in self.days[lo:hi]]
+            return pd.concat(parts) if parts else pd.DataFrame(columns=self.columns)
+
+    def totals(self, day):
+        with self._lock:
+            if day not in self._totals:
+                part = self.day(day)
+                self._totals[day] = frame_totals(part)
+            return self._totals[day]
+
+    def top_foods(self, day, nutrient, n=3):
+        with self._lock:
+            key = (day, nutrient, n)
+            if key not in self._top_foods:
+                part = self.day(day)
+                self._top_foods[key] = part.groupby("Food", observed=True)[nutrient].sum().sort_values(ascending=False).head(n)
+            return self._top_foods[key]
+
+
+@st.cache_resource(show_spinner=False)
+def _daily_index():
+    return DailyLogIndex()
+
+
+def get_daily_index(mirror):
+    """Returns the shared per-day index, synced with the FoodLog mirror."""
+    index = _daily_index()
+    index.update(mirror)
+    return index
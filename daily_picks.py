@@ -0,0 +1,79 @@
+"""Picks of the day for the Quotes and Cognitive Biases pages.
+
+Each kind of pick (quote, mantra, bias, audio clip) has a deck: its rows in an
+order shuffled once per day. The first card is the pick of the day and "show
+another" walks on through the deck, so nothing repeats until everything has been
+shown. Decks are built once per process for each day and sheet revision, and
+every session reads the same one. A page view is then a list index instead of
+reading, filtering and sampling the sheet.
+"""
+import random
+import threading
+from datetime import date
+
+import streamlit as st
+
+
+class Deck:
+    def __init__(self, kind, day, rows):
+        self.kind = kind
+        self.day = day
+        self.rows = rows
+        # Seeded by kind and day, so every session and restart deals the same order
+        self.order = list(range(len(rows)))
+        random.Random(f"{kind}:{day.toordinal()}").shuffle(self.order)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, position):
+        return self.rows[self.order[position % len(self.rows)]]
+
+
+class DailyPicks:
+    def __init__(self):
+        self._decks = {}  # (kind, revision) -> Deck, for the current day only
+        self._day = None
+        self._lock = threading.Lock()
+
+    def deck(self, kind, revision, build, day=None):
+        """Today's deck of `kind`, dealt from build() (the rows to pick from) once per sheet `revision`."""
+        day = day or date.today()
+        with self._lock:
+            if day != self._day:
+                self._decks.clear()
+                self._day = day
+            deck = self._decks.get((kind, revision)) if revision is not None else None
+        if deck is None:
+            deck = Deck(kind, day, list(build()))
+            if revision is not None:
+                with self._lock:
+                    if day == self._day:
+                        # Older revisions of this kind won't be asked for again
+                        for key in [k for k in self._decks if k[0] == kind]:
+                            del self._decks[key]
+                        self._decks[(kind, revision)] = deck
+        return deck
+
+
+@st.cache_resource(show_spinner=False)
+def get_daily_picks():
+    return DailyPicks()
+
+
+# --- This session's place in each deck ---
+def _cursor(deck):
+    key = f"{deck.kind}_pick"
+    if st.session_state.get(key, {}).get("day") != deck.day:
+        st.session_state[key] = {"day": deck.day, "position": 0}
+    return st.session_state[key]
+
+
+def current_pick(deck):
+    """The row this session is showing from `deck` (the pick of the day until "show another"), or None if empty."""
+    return deck[_cursor(deck)["position"]] if len(deck) else None
+
+
+def next_pick(deck):
+    """Moves this session on to the next card in `deck`."""
+    _cursor(deck)["position"] += 1
@@ -0,0 +1,96 @@
+"""Downloads of the food database and food log, built only when asked for.
+
+Exports are encoded chunk by chunk. The log is read from the mirror's Parquet file
+one record batch at a time and the date filter is applied per batch, so the only
+thing that grows with the log is the output itself (which Streamlit has to hold to
+serve it; pick gzip or Parquet to keep that small). Hand the export_* functions to
+st.download_button through a lambda and they run only when the button is clicked.
+"""
+import gzip
+import io
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from schema import day_numbers
+
+FORMATS = {
+    "CSV": (".csv", "text/csv"),
+    "CSV (gzip)": (".csv.gz", "application/gzip"),
+    "Parquet": (".parquet", "application/vnd.apache.parquet"),
+}
+
+CHUNK_ROWS = 50_000
+
+
+def file_name(stem, fmt):
+    return stem + FORMATS[fmt][0]
+
+
+def mime_type(fmt):
+    return FORMATS[fmt][1]
+
+
+class _ChunkWriter:
+    """Writes pandas chunks to `out` as CSV (plain or gzip) or Parquet."""
+
+    def __init__(self, out, fmt):
+        self.fmt = fmt
+        self.rows = 0
+        self._out = out
+        self._gzip = gzip.GzipFile(fileobj=out, mode="wb") if fmt == "CSV (gzip)" else None
+        self._parquet = None
+
+    def write(self, chunk):
+        if self.fmt == "Parquet":
+            table = chunk if isinstance(chunk, pa.Table) else pa.Table.from_pandas(chunk, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self._out, table.schema)
+            self._parquet.write_table(table)
+        else:
+            if isinstance(chunk, pa.Table):
+                chunk = chunk.to_pandas()
+            text = chunk.to_csv(index=False, header=self.rows == 0).encode("utf-8")
+            (self._gzip or self._out).write(text)
+        self.rows += len(chunk)
+
+    def close(self, columns):
+        if self.fmt == "Parquet" and self._parquet is None:
+            # Nothing matched: still hand back a valid, empty file
+            self.write(pa.table({column: pa.array([], pa.string()) for column in columns}))
+        elif self.rows == 0:
+            (self._gzip or self._out).write((",".join(columns) + "\n").encode("utf-8"))
+        if self._parquet is not None:
+            self._parquet.close()
+        if self._gzip is not None:
+            self._gzip.close()
+
+
+def export_frame(frame, fmt):
+    """Returns `frame` encoded as `fmt`."""
+    out = io.BytesIO()
+    writer = _ChunkWriter(out, fmt)
+    for start in range(0, len(frame), CHUNK_ROWS):
+        writer.write(frame.iloc[start:start + CHUNK_ROWS])
+    writer.close(list(frame.columns))
+    return out.getvalue()
+
+
+def export_log(mirror, fmt, start=None, end=None):
+    """Returns the FoodLog encoded as `fmt`, optionally limited to dates from `start` to `end`."""
+    source, columns = mirror.open_saved()
+    out = io.BytesIO()
+    writer = _ChunkWriter(out, fmt)
+    if source is not None:
+        for batch in source.iter_batches(batch_size=CHUNK_ROWS):
+            table = pa.Table.from_batches([batch])
+            if start is not None or end is not None:
+                days = day_numbers(batch.column("Date").to_pandas())
+                keep = days >= (start.toordinal() if start is not None else 1)
+                if end is not None:
+                    keep &= days <= end.toordinal()
+                table = table.filter(pa.array(keep))
+            if table.num_rows:
+                writer.write(table)
+    writer.close(columns)
+    return out.getvalue()
@@ -0,0 +1,179 @@
+"""In-memory stand-in for the parts of gspread the app uses, so pages run offline.
+
+Enable it with SHEETS_BACKEND=fake. The FoodDatabase and FoodLog worksheets are
+seeded from the sample CSVs in the repo; everything lives in process memory.
+"""
+import csv
+import os
+import re
+import threading
+
+from sheets import numericise, parse_a1_range, update_args
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+SEED_HEADERS = {
+    "FoodDatabase": ["Food", "Unit", "Protein", "Carbs", "Fats", "Calories", "Timestamp"],
+    "FoodLog": ["Date", "Food", "Quantity", "Unit", "Protein", "Carbs", "Fats", "Calories"],
+    "Quotes": ["Date", "Source Type", "Source", "Details1", "Details2", "Quote"],
+    "Bias": ["Date", "Phenomenon", "Area", "Bias", "Definition", "Localised Examples"],
+}
+
+# Placeholder rows so the Quotes and Cognitive Biases pages have something to show offline
+SAMPLE_QUOTES = [
+    ["01/01/2025", "Book", "Sample Source", "Impermanence", "", "This too shall pass."],
+    ["01/01/2025", "Talk", "Sample Source", "Mantras", "", "Short moments, many times."],
+]
+SAMPLE_BIASES = [
+    ["01/01/2025", "Memory", "Judgement", "Hindsight Bias",
+     "Seeing past events as having been predictable.", "I knew it all along."],
+]
+
+
+class FakeWorksheet:
+    def __init__(self, title, values=None):
+        self.title = title
+        self.id = abs(hash(title)) % 10**9
+        self._values = [list(map(str, row)) for row in (values or [])]
+        self._lock = threading.Lock()
+
+    # --- Reads ---
+    @property
+    def row_count(self):
+        return len(self._values)
+
+    @property
+    def col_count(self):
+        return max((len(row) for row in self._values), default=0)
+
+    def get_all_values(self):
+        with self._lock:
+            return [list(row) for row in self._values]
+
+    def get_all_records(self):
+        values = self.get_all_values()
+        if not values:
+            return []
+        header, rows = values[0], values[1:]
+        return [
+            {key: numericise(row[i]) if i < len(row) else "" for i, key in enumerate(header)}
+            for row in rows
+        ]
+
+    def get(self, range_name):
+        row0, col0, row1, col1 = parse_a1_range(range_name)
+        with self._lock:
+            rows = self._values[row0 - 1:row1]
+            return [row[col0 - 1:col1] for row in rows]
+
+    get_values = get
+
+    def batch_get(self, ranges, **kwargs):
+        return [self.get(range_name) for range_name in ranges]
+
+    def row_values(self, row):
+        with self._lock:
+            return list(self._values[row - 1]) if row <= len(self._values) else []
+
+    def col_values(self, col):
+        with self._lock:
+            values = [row[col - 1] if col <= len(row) else "" for row in self._values]
+        while values and values[-1] == "":
+            values.pop()
+        return values
+
+    # --- Writes ---
+    def append_rows(self, values, **kwargs):
+        with self._lock:
+            self._values.extend([list(map(str, row)) for row in values])
+
+    def append_row(self, values, **kwargs):
+        self.append_rows([values], **kwargs)
+
+    def delete_rows(self, start_index, end_index=None):
+        end_index = end_index or start_index
+        with self._lock:
+            del self._values[start_index - 1:end_index]
+
+    def clear(self):
+        with self._lock:
+            self._values = []
+
+    def update(self, *args, **kwargs):
+        # Accepts both update(values, range_name) and the older update(range_name, values)
+        values, range_name = update_args(args, kwargs)
+        row0, col0, _, _ = parse_a1_range(range_name)
+        with self._lock:
+            for r, row in enumerate(values):
+                target = row0 - 1 + r
+                while len(self._values) <= target:
+                    self._values.append([])
+                line = self._values[target]
+                while len(line) < col0 - 1 + len(row):
+                    line.append("")
+                line[col0 - 1:col0 - 1 + len(row)] = [str(v) for v in row]
+
+
+class FakeSpreadsheet:
+    def __init__(self, key, worksheets):
+        self.id = key
+        self._worksheets = {ws.title: ws for ws in worksheets}
+
+    def worksheet(self, title):
+        if title not in self._worksheets:
+            raise KeyError(f"Worksheet {title!r} not found")
+        return self._worksheets[title]
+
+    def worksheets(self):
+        return list(self._worksheets.values())
+
+    def add_worksheet(self, title, rows=0, cols=0):
+        self._worksheets[title] = FakeWorksheet(title)
+        return self._worksheets[title]
+
+
+class FakeClient:
+    def __init__(self, seed_dir=HERE):
+        self.seed_dir = seed_dir
+        self._spreadsheets = {}
+        self._lock = threading.Lock()
+
+    def open_by_key(self, key):
+        with self._lock:
+            if key not in self._spreadsheets:
+                self._spreadsheets[key] = FakeSpreadsheet(key, seed_worksheets(self.seed_dir))
+            return self._spreadsheets[key]
+
+    def open_by_url(self, url):
+        return self.open_by_key(re.search(r"/d/([\w-]+)", url).group(1))
+
+
+def _read_csv(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, newline="") as f:
+        return list(csv.reader(f))
+
+
+def seed_worksheets(seed_dir=HERE):
+    """Builds the worksheets the app expects, filled from the sample CSVs where they exist."""
+    food_rows = _read_csv(os.path.join(seed_dir, "food_database.csv"))[1:]
+    log_rows = _read_csv(os.path.join(seed_dir, "food_log.csv"))[1:]
+
+    # The sample CSVs predate the Calories column, so derive it from the macros
+    def with_calories(row, first_macro):
+        protein, carbs, fats = (float(x) for x in row[first_macro:first_macro + 3])
+        return row + [round(protein * 4 + carbs * 4 + fats * 9, 1)]
+
+    foods = [with_calories(row, 2) + [""] for row in food_rows]
+    log = []
+    for row in log_rows:
+        year, month, day = row[0].split("-")
+        log.append(with_calories([f"{day}/{month}/{year}"] + row[1:], 4))
+
+    return [
+        FakeWorksheet("FoodDatabase", [SEED_HEADERS["FoodDatabase"]] + foods),
+        FakeWorksheet("FoodLog", [SEED_HEADERS["FoodLog"]] + log),
+        FakeWorksheet("Quotes", [SEED_HEADERS["Quotes"]] + SAMPLE_QUOTES),
+        FakeWorksheet("Bias", [SEED_HEADERS["Bias"]] + SAMPLE_BIASES),
+    ]
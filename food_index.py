@@ -0,0 +1,96 @@
+"""Hashed index of the food database by normalized name.
+
+Names are compared case- and whitespace-folded, so "Apple Cider Vinegar" and
+"apple  cider vinegar" are the same food. The index is built once per process,
+updated by the app's own inserts and deletes, and rebuilt only when the sheet's
+row count shows someone else changed it. Duplicate checks and upserts are then
+dict lookups instead of scans of the whole database.
+"""
+import threading
+
+import streamlit as st
+
+
+def normalize_food_name(name):
+    return " ".join(str(name).split()).casefold()
+
+
+class FoodIndex:
+    def __init__(self):
+        self.names = None  # food names in sheet order; sheet row n is names[n - 2]
+        self._by_key = {}  # normalized name -> names stored under it
+        self._duplicates = set()
+        self._lock = threading.RLock()
+
+    def build(self, names):
+        with self._lock:
+            self.names = []
+            self._by_key = {}
+            self._duplicates = set()
+            for name in names:
+                self.add(name)
+
+    def ensure(self, names):
+        """Rebuilds from `names` (the database's food names in sheet order) if the index has drifted. Returns True if it did."""
+        with self._lock:
+            if self.names is None or len(self.names) != len(names):
+                self.build(names)
+                return True
+            return False
+
+    def invalidate(self):
+        with self._lock:
+            self.names = None
+
+    # --- Updates ---
+    def add(self, name):
+        with self._lock:
+            key = normalize_food_name(name)
+            self.names.append(name)
+            self._by_key.setdefault(key, []).append(name)
+            if len(self._by_key[key]) > 1:
+                self._duplicates.add(key)
+
+    def remove(self, name):
+        """Drops one stored food called `name`."""
+        with self._lock:
+            if self.names is None or name not in self.names:
+                return
+            self.remove_row(self.names.index(name) + 2)
+
+    def remove_row(self, sheet_row):
+        """Drops the food at 1-based `sheet_row` (row 1 is the header)."""
+        with self._lock:
+            if self.names is None or not 2 <= sheet_row < len(self.names) + 2:
+                return
+            name = self.names.pop(sheet_row - 2)
+            key = normalize_food_name(name)
+            stored = self._by_key[key]
+            stored.remove(name)
+            if not stored:
+                del self._by_key[key]
+            if len(stored) < 2:
+                self._duplicates.discard(key)
+
+    # --- Lookups ---
+    def find(self, name):
+        """The stored name that `name` matches, or None."""
+        with self._lock:
+            stored = self._by_key.get(normalize_food_name(name))
+            return stored[0] if stored else None
+
+    def __contains__(self, name):
+        return self.find(name) is not None
+
+    def __len__(self):
+        return len(self.names or [])
+
+    def duplicates(self):
+        """{normalized name: [stored names]} for names stored more than once."""
+        with self._lock:
+            return {key: list(self._by_key[key]) for key in sorted(self._duplicates)}
+
+
+@st.cache_resource(show_spinner=False)
+def get_food_index():
+    return FoodIndex()
@@ -0,0 +1,352 @@
+"""Server-side search over food names and aliases.
+
+Every word of every name (and alias) goes into a prefix trie whose nodes list
+the foods below them, so "brown ri" is answered by intersecting two trie nodes.
+Misspelt words are matched to known words by trigram similarity. Results are ranked by how often
+and how recently each food was logged: each log row adds 2 ** (age / half-life)
+to its food's score. Newer rows therefore count more, and logging a food never
+changes the order of the others. That lets every trie node cache its top
+matches and patch them in place as the log grows.
+
+    python food_search.py --bench    # timings against 50k generated foods
+"""
+import heapq
+import re
+import threading
+from datetime import date
+
+import streamlit as st
+
+from daily_log import parse_log_dates
+from food_index import normalize_food_name
+
+# Results shown in the food selector
+TOP_K = 20
+
+# Usage counts half as much for every HALF_LIFE_DAYS it is older than the newest use
+HALF_LIFE_DAYS = 30
+EPOCH = date(2020, 1, 1).toordinal()
+
+# Trie nodes with more foods than this answer from their cached top matches
+CACHED_NODE_SIZE = 256
+
+# Trigram (Jaccard) similarity needed for a fuzzy match / a near-duplicate warning
+MIN_SIMILARITY = 0.3
+NEAR_DUPLICATE_SIMILARITY = 0.5
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def split_words(text):
+    # "White Quinoa+Brown Rice" -> white, quinoa, brown, rice
+    return re.findall(r"[^\W_]+", text)
+
+
+def usage_weight(day):
+    return 2.0 ** ((day.toordinal() - EPOCH) / HALF_LIFE_DAYS)
+
+
+def food_aliases(row):
+    """Aliases from an optional comma-separated "Aliases" column of the food database."""
+    return [alias.strip() for alias in str(row.get("Aliases", "") or "").split(",") if alias.strip()]
+
+
+class _Node:
+    __slots__ = ("children", "ids", "top")
+
+    def __init__(self):
+        self.children = {}
+        self.ids = []  # foods with a word starting here, ascending
+        self.top = None  # (epoch, best ids by score) once computed
+
+
+class FoodSearchIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.names = []
+        self.positions = {}  # name -> id
+        self.scores = []
+        self.version = None  # log mirror version the scores are caught up with
+        self._terms = []  # id -> normalized name and aliases
+        self._words = []  # id -> distinct words of its terms
+        self._gram_counts = []  # id -> [trigram count per term]
+        self._postings = {}  # trigram -> ids
+        self._word_grams = {}  # word -> number of trigrams
+        self._word_postings = {}  # trigram -> words
+        self._root = _Node()
+        self._epoch = 0  # bumped to drop every cached top list
+
+    # --- Building ---
+    def add(self, name, aliases=()):
+        with self._lock:
+            if name in self.positions:
+                return
+            food_id = len(self.names)
+            self.positions[name] = food_id
+            self.names.append(name)
+            self.scores.append(0.0)
+            terms = [normalize_food_name(term) for term in [name, *aliases] if normalize_food_name(term)]
+            words = sorted({word for term in terms for word in split_words(term)})
+            self._terms.append(terms)
+            self._words.append(words)
+            self._gram_counts.append([len(trigrams(term)) for term in terms])
+
+            self._append(self._root, food_id)
+            for word in words:
+                if word not in self._word_grams:
+                    self._word_grams[word] = len(trigrams(word))
+                    for gram in trigrams(word):
+                        self._word_postings.setdefault(gram, []).append(word)
+                node = self._root
+                for ch in word:
+                    node = node.children.setdefault(ch, _Node())
+                    self._append(node, food_id)
+            for gram in set().union(*(trigrams(term) for term in terms)) if terms else ():
+                postings = self._postings.setdefault(gram, [])
+                postings.append(food_id)
+
+    @staticmethod
+    def _append(node, food_id):
+        if not node.ids or node.ids[-1] != food_id:
+            node.ids.append(food_id)
+            node.top = None
+
+    def build(self, food_data):
+        with self._lock:
+            self._reset()
+            for name, row in food_data.items():
+                self.add(name, food_aliases(row))
+
+    def ensure(self, food_data):
+        """Rebuilds when the food database no longer matches the index (the app's own inserts call add())."""
+        with self._lock:
+            if len(food_data) != len(self.names):
+                self.build(food_data)
+
+    # --- Usage ---
+    def update_usage(self, mirror):
+        """Catches the scores up with the FoodLog mirror's change journal."""
+        with self._lock:
+            frame, version, changes = mirror.catch_up(self.version)
+            if changes is None:
+                self.scores = [0.0] * len(self.names)
+                self._epoch += 1
+                changes = [("add", frame)]
+            for kind, rows in changes:
+                self._apply_rows(rows, 1.0 if kind == "add" else -1.0)
+            self.version = version
+
+    def _apply_rows(self, rows, sign):
+        if rows.empty or "Food" not in rows:
+            return
+        days = parse_log_dates(rows["Date"])
+        weights = days.map(lambda d: usage_weight(d) if d is not None else 0.0)
+        for food, weight in weights.groupby(rows["Food"], observed=True).sum().items():
+            self.use(food, sign * weight)
+
+    def use(self, name, weight):
+        with self._lock:
+            food_id = self.positions.get(name)
+            if food_id is None or not weight:
+                return
+            self.scores[food_id] += weight
+            if weight < 0:
+                # A food moving down can let one from outside a cached top list in
+                self._epoch += 1
+                return
+            for node in self._nodes_of(food_id):
+                if node.top is not None and node.top[0] == self._epoch:
+                    self._promote(node.top[1], food_id)
+
+    def _nodes_of(self, food_id):
+        yield self._root
+        seen = set()
+        for word in self._words[food_id]:
+            node = self._root
+            for ch in word:
+                node = node.children[ch]
+                if id(node) not in seen:
+                    seen.add(id(node))
+                    yield node
+
+    def _promote(self, top, food_id):
+        if food_id not in top:
+            if len(top) >= CACHED_NODE_SIZE and self.scores[food_id] <= self.scores[top[-1]]:
+                return
+            top.append(food_id)
+        top.sort(key=self._rank)
+        del top[CACHED_NODE_SIZE:]
+
+    def _rank(self, food_id):
+        return (-self.scores[food_id], len(self.names[food_id]), self.names[food_id])
+
+    # --- Queries ---
+    def _node(self, prefix):
+        node = self._root
+        for ch in prefix:
+            node = node.children.get(ch)
+            if node is None:
+                return None
+        return node
+
+    def _top(self, node):
+        if node.top is None or node.top[0] != self._epoch:
+            node.top = (self._epoch, heapq.nsmallest(CACHED_NODE_SIZE, node.ids, key=self._rank))
+        return node.top[1]
+
+    def _matches_words(self, food_id, tokens):
+        words = self._words[food_id]
+        return all(any(word.startswith(token) for word in words) for token in tokens)
+
+    def _prefix_matches(self, tokens, nodes, k):
+        node = min(nodes, key=lambda n: len(n.ids))
+        if len(node.ids) > CACHED_NODE_SIZE:
+            results = [i for i in self._top(node) if len(tokens) == 1 or self._matches_words(i, tokens)][:k]
+            if len(results) == k:
+                return results
+        if len(nodes) == 1:
+            matching = node.ids
+        else:
+            matching = set(node.ids).intersection(*(n.ids for n in nodes if n is not node))
+        return heapq.nsmallest(k, matching, key=self._rank)
+
+    def _fuzzy_words(self, token, n=3):
+        """Known words that `token` may be a misspelling of, best first."""
+        grams = trigrams(token)
+        counts = {}
+        for gram in grams:
+            for word in self._word_postings.get(gram, ()):
+                counts[word] = counts.get(word, 0) + 1
+        scored = [
+            (shared / (len(grams) + self._word_grams[word] - shared), word)
+            for word, shared in counts.items()
+        ]
+        return [word for similarity, word in heapq.nlargest(n, scored) if similarity >= MIN_SIMILARITY]
+
+    def search(self, query, k=TOP_K):
+        """Top `k` food names for `query`: word-prefix matches first, then matches allowing for typos."""
+        with self._lock:
+            tokens = split_words(normalize_food_name(query))
+            if not tokens:
+                return [self.names[i] for i in self._top(self._root)[:k]]
+
+            nodes = [self._node(token) for token in tokens]
+            results = self._prefix_matches(tokens, nodes, k) if all(nodes) else []
+
+            if len(results) < k:
+                # Let each word of the query also stand for known words it looks like
+                groups = []
+                for token, node in zip(tokens, nodes):
+                    ids = set(node.ids) if node is not None else set()
+                    for word in self._fuzzy_words(token):
+                        ids.update(self._node(word).ids)
+                    groups.append(ids)
+                fuzzy = set.intersection(*groups).difference(results)
+                results += heapq.nsmallest(k - len(results), fuzzy, key=self._rank)
+            return [self.names[i] for i in results]
+
+    def _similar(self, text, threshold):
+        """(id, similarity) of foods whose name or an alias shares enough trigrams with `text`, best first."""
+        grams = trigrams(text)
+        counts = {}
+        for gram in grams:
+            for food_id in self._postings.get(gram, ()):
+                counts[food_id] = counts.get(food_id, 0) + 1
+        similar = []
+        for food_id, shared in counts.items():
+            # Shared trigrams are counted over all terms, so this is an upper bound per term
+            best = max(
+                min(shared, size) / (len(grams) + size - min(shared, size))
+                for size in self._gram_counts[food_id]
+            )
+            if best >= threshold:
+                similar.append((food_id, best))
+        similar.sort(key=lambda item: (-item[1],) + self._rank(item[0]))
+        return similar
+
+    def near_duplicates(self, name, threshold=NEAR_DUPLICATE_SIMILARITY, k=5):
+        """Existing foods whose name looks like another spelling of `name`."""
+        with self._lock:
+            text = normalize_food_name(name)
+            if not text:
+                return []
+            grams = trigrams(text)
+            found = []
+            for food_id, _ in self._similar(text, threshold):
+                exact = max(
+                    len(grams & trigrams(term)) / len(grams | trigrams(term)) for term in self._terms[food_id]
+                )
+                if exact >= threshold:
+                    found.append(self.names[food_id])
+                if len(found) == k:
+                    break
+            return found
+
+
+@st.cache_resource(show_spinner=False)
+def _food_search():
+    return FoodSearchIndex()
+
+
+def get_food_search(food_data, mirror):
+    """Returns the shared search index, in step with the food database and the log."""
+    index = _food_search()
+    index.ensure(food_data)
+    index.update_usage(mirror)
+    return index
+
+
+def _bench(count=50_000, queries=2_000):
+    import random
+    import time
+
+    rng = random.Random(0)
+    # A few very common words plus a long tail, like real food names
+    common = ["chicken", "breast", "brown", "rice", "white", "quinoa", "mixed", "veggies", "greek", "yogurt",
+              "oat", "milk", "almond", "butter", "peanut", "apple", "cider", "vinegar", "green", "tea"]
+    letters = "abcdefghiklmnoprstuvy"
+    tail = ["".join(rng.choice(letters) for _ in range(rng.randint(4, 9))) for _ in range(3_000)]
+    words = common + tail
+    weights = [50] * len(common) + [1 / (rank + 1) ** 0.5 * 20 for rank in range(len(tail))]
+    names = {}
+    while len(names) < count:
+        names[" ".join(rng.choices(words, weights, k=rng.randint(1, 4))).title()] = {}
+    index = FoodSearchIndex()
+    start = time.perf_counter()
+    index.build(names)
+    print(f"build: {len(index.names)} foods in {time.perf_counter() - start:.2f}s")
+
+    today = date.today()
+    for name in rng.sample(list(names), 5_000):
+        index.use(name, usage_weight(today) * rng.random())
+
+    samples = {
+        "empty": [""] * queries,
+        "1 char": [rng.choice(words)[:1] for _ in range(queries)],
+        "prefix": [rng.choice(words)[:rng.randint(2, 5)] for _ in range(queries)],
+        "2 words": [f"{rng.choice(words)} {rng.choice(words)[:3]}" for _ in range(queries)],
+        "typo": [f"{rng.choice(words)[:-1]}x {rng.choice(words)[:2]}" for _ in range(queries)],
+    }
+    for label, batch in samples.items():
+        start = time.perf_counter()
+        for query in batch:
+            index.search(query)
+        print(f"search {label:8}: {(time.perf_counter() - start) / len(batch) * 1000:.3f} ms/query")
+
+    start = time.perf_counter()
+    for query in samples["typo"][:200]:
+        index.near_duplicates(query)
+    print(f"near_duplicates : {(time.perf_counter() - start) / 200 * 1000:.3f} ms/query")
+
+
+if __name__ == "__main__":
+    import sys
+
+    if "--bench" in sys.argv:
+        _bench()
@@ -0,0 +1,369 @@
+"""File-backed storage behind the same worksheet interface as gspread.
+
+Every page talks to worksheets through sheets.py, so a backend is just a client
+whose worksheets support the gspread calls the app makes. Besides Google Sheets
+(default) and the in-memory fake, two local backends are available:
+
+    SHEETS_BACKEND=csv     one CSV file per worksheet; appends only add lines
+    SHEETS_BACKEND=sqlite  one table per worksheet, indexed on Date and Food
+
+Both keep their files in LOCAL_DATA_DIR (default ./data) and are seeded with the
+same sample data as the fake backend the first time a worksheet is opened.
+"""
+import csv
+import os
+import sqlite3
+import threading
+
+from fake_sheets import SEED_HEADERS, FakeWorksheet, seed_worksheets
+from sheets import numericise, parse_a1_range, update_args
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.environ.get("LOCAL_DATA_DIR", os.path.join(HERE, "data"))
+
+# Columns that get an index in the SQLite backend, wherever a worksheet has them
+INDEXED_COLUMNS = ["Date", "Food"]
+
+
+def _seed_values(title):
+    for ws in seed_worksheets():
+        if ws.title == title:
+            return ws.get_all_values()
+    return None
+
+
+def _str(value):
+    return "" if value is None else str(value)
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+# --- CSV ---
+class CsvWorksheet(FakeWorksheet):
+    """Keeps the rows in memory like the fake backend and writes every change through to a CSV file."""
+
+    def __init__(self, title, path):
+        self.path = path
+        with open(path, newline="", encoding="utf-8") as f:
+            values = list(csv.reader(f))
+        super().__init__(title, values)
+
+    def _save(self):
+        with open(self.path + ".tmp", "w", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerows(self._values)
+        os.replace(self.path + ".tmp", self.path)
+
+    def append_rows(self, values, **kwargs):
+        super().append_rows(values, **kwargs)
+        # Only the new lines are written; the rest of the file is left alone
+        with self._lock, open(self.path, "a", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerows([list(map(_str, row)) for row in values])
+
+    def delete_rows(self, start_index, end_index=None):
+        super().delete_rows(start_index, end_index)
+        with self._lock:
+            self._save()
+
+    def clear(self):
+        super().clear()
+        with self._lock:
+            self._save()
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        with self._lock:
+            self._save()
+
+
+class CsvSpreadsheet:
+    def __init__(self, key, directory):
+        self.id = key
+        self.directory = directory
+        self._worksheets = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, title):
+        return os.path.join(self.directory, f"{title}.csv")
+
+    def _create(self, title, values):
+        with open(self._path(title), "w", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerows(values)
+
+    def worksheet(self, title):
+        with self._lock:
+            if title not in self._worksheets:
+                if not os.path.exists(self._path(title)):
+                    values = _seed_values(title)
+                    if values is None:
+                        raise KeyError(f"Worksheet {title!r} not found")
+                    self._create(title, values)
+                self._worksheets[title] = CsvWorksheet(title, self._path(title))
+            return self._worksheets[title]
+
+    def worksheets(self):
+        titles = {name[:-4] for name in os.listdir(self.directory) if name.endswith(".csv")}
+        titles.update(SEED_HEADERS)
+        return [self.worksheet(title) for title in sorted(titles)]
+
+    def add_worksheet(self, title, rows=0, cols=0):
+        with self._lock:
+            self._create(title, [])
+            self._worksheets.pop(title, None)
+        return self.worksheet(title)
+
+
+class CsvClient:
+    def __init__(self, data_dir=DATA_DIR):
+        self.data_dir = data_dir
+        self._spreadsheets = {}
+        self._lock = threading.Lock()
+
+    def open_by_key(self, key):
+        with self._lock:
+            if key not in self._spreadsheets:
+                self._spreadsheets[key] = CsvSpreadsheet(key, os.path.join(self.data_dir, key))
+            return self._spreadsheets[key]
+
+
+# --- SQLite ---
+class SqliteWorksheet:
+    """A worksheet stored as a table. Row 1 (the header) is the column list; `_row` keeps the sheet order."""
+
+    def __init__(self, title, conn, lock):
+        self.title = title
+        self.id = abs(hash(title)) % 10**9
+        self._conn = conn
+        self._lock = lock
+        self._table = '"' + title.replace('"', '""') + '"'
+
+    def _header(self):
+        info = self._conn.execute(f"PRAGMA table_info({self._table})").fetchall()
+        return [col[1] for col in info if col[1] != "_row"]
+
+    def _create(self, header):
+        columns = ", ".join('"' + name.replace('"', '""') + '" TEXT' for name in header)
+        self._conn.execute(f"DROP TABLE IF EXISTS {self._table}")
+        self._conn.execute(f"CREATE TABLE {self._table} (_row INTEGER PRIMARY KEY AUTOINCREMENT, {columns})")
+        self._create_indexes(header)
+
+    def _create_indexes(self, header):
+        for name in INDEXED_COLUMNS:
+            if name in header:
+                index = '"' + f"idx_{self.title}_{name}".replace('"', '""') + '"'
+                self._conn.execute(f'CREATE INDEX IF NOT EXISTS {index} ON {self._table} ("{name}")')
+
+    def _insert(self, header, rows):
+        width = len(header)
+        rows = [[_str(v) for v in (list(row) + [""] * width)[:width]] for row in rows]
+        placeholders = ", ".join("?" * width)
+        columns = ", ".join('"' + name.replace('"', '""') + '"' for name in header)
+        self._conn.executemany(f"INSERT INTO {self._table} ({columns}) VALUES ({placeholders})", rows)
+
+    def _select(self, limit=-1, offset=0):
+        header = self._header()
+        if not header:
+            return []
+        columns = ", ".join('"' + name.replace('"', '""') + '"' for name in header)
+        cursor = self._conn.execute(
+            f"SELECT {columns} FROM {self._table} ORDER BY _row LIMIT ? OFFSET ?", (limit, offset)
+        )
+        return [[_str(v) for v in row] for row in cursor]
+
+    def _rewrite(self, values):
+        if not values or not values[0]:
+            # No header, no columns: a blank sheet, as after clear()
+            self._conn.execute(f"DROP TABLE IF EXISTS {self._table}")
+            return
+        self._create(values[0])
+        self._insert(values[0], values[1:])
+
+    # --- Reads ---
+    @property
+    def row_count(self):
+        with self._lock:
+            if not self._header():
+                return 0
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self._table}").fetchone()[0] + 1
+
+    @property
+    def col_count(self):
+        with self._lock:
+            return len(self._header())
+
+    def get_all_values(self):
+        with self._lock:
+            header = self._header()
+            return [header] + self._select() if header else []
+
+    def get_all_records(self):
+        values = self.get_all_values()
+        if not values:
+            return []
+        header, rows = values[0], values[1:]
+        return [{key: numericise(row[i]) for i, key in enumerate(header)} for row in rows]
+
+    def get(self, range_name):
+        row0, col0, row1, col1 = parse_a1_range(range_name)
+        with self._lock:
+            header = self._header()
+            if not header:
+                return []
+            rows = [header] if row0 == 1 else []
+            # Sheet row n (n >= 2) is data row n - 2; only the requested slice is read
+            start = max(row0 - 2, 0)
+            limit = -1 if row1 is None else max(row1 - 1 - start, 0)
+            rows += self._select(limit, start)
+        return [row[col0 - 1:col1] for row in rows]
+
+    get_values = get
+
+    def batch_get(self, ranges, **kwargs):
+        return [self.get(range_name) for range_name in ranges]
+
+    def row_values(self, row):
+        values = self.get(f"{row}:{row}")
+        return values[0] if values else []
+
+    def col_values(self, col):
+        values = [row[col - 1] if col <= len(row) else "" for row in self.get_all_values()]
+        while values and values[-1] == "":
+            values.pop()
+        return values
+
+    # --- Writes ---
+    def append_rows(self, values, **kwargs):
+        values = [list(row) for row in values]
+        with self._lock, self._conn:
+            header = self._header()
+            if not header and values:
+                # Like a blank sheet: the first row appended becomes the header
+                header = [_str(v) for v in values.pop(0)]
+                self._create(header)
+            self._insert(header, values)
+
+    def append_row(self, values, **kwargs):
+        self.append_rows([values], **kwargs)
+
+    def delete_rows(self, start_index, end_index=None):
+        end_index = end_index or start_index
+        with self._lock, self._conn:
+            if start_index == 1:
+                # Deleting the header goes through the generic path
+                values = self.get_all_values()
+                del values[start_index - 1:end_index]
+                self._rewrite(values)
+                return
+            self._conn.execute(
+                f"DELETE FROM {self._table} WHERE _row IN "
+                f"(SELECT _row FROM {self._table} ORDER BY _row LIMIT ? OFFSET ?)",
+                (end_index - start_index + 1, start_index - 2),
+            )
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute(f"DROP TABLE IF EXISTS {self._table}")
+
+    def _rename_columns(self, header, names):
+        """Turns the columns `header` into `names` (renamed in place, new ones added); False if that can't be done."""
+        renamed = [(old, new) for old, new in zip(header, names) if old != new]
+        if "" in names or len(set(names)) < len(names) or any(new in header for _, new in renamed):
+            return False
+        for old, new in renamed:
+            self._conn.execute(f"ALTER TABLE {self._table} RENAME COLUMN {_quote(old)} TO {_quote(new)}")
+        for name in names[len(header):]:
+            self._conn.execute(f"ALTER TABLE {self._table} ADD COLUMN {_quote(name)} TEXT")
+        self._create_indexes(names)
+        return True
+
+    def update(self, *args, **kwargs):
+        values, range_name = update_args(args, kwargs)
+        row0, col0, _, _ = parse_a1_range(range_name)
+        values = [[_str(v) for v in row] for row in values]
+        with self._lock, self._conn:
+            header = self._header()
+            width = max((col0 - 1 + len(row) for row in values), default=0)
+            if row0 == 1 and values and header:
+                names = header + [""] * (width - len(header))
+                names[col0 - 1:col0 - 1 + len(values[0])] = values[0]
+                if self._rename_columns(header, names):
+                    header, row0, values = names, 2, values[1:]
+            if not header or width > len(header) or row0 == 1:
+                # A blank sheet, or cells outside the named columns: rebuilt in one go
+                scratch = FakeWorksheet(self.title, self.get_all_values())
+                scratch.update(values, range_name)
+                self._rewrite(scratch.get_all_values())
+                return
+            # Each sheet row is updated in place, addressed by its position like delete_rows does
+            count = self._conn.execute(f"SELECT COUNT(*) FROM {self._table}").fetchone()[0]
+            for number, row in enumerate(values, start=row0):
+                if not row:
+                    continue
+                if number - 2 >= count:
+                    # Past the last row: blank rows up to it, then the row itself
+                    self._insert(header, [[]] * (number - 2 - count) + [[""] * (col0 - 1) + row])
+                    count = number - 1
+                    continue
+                columns = header[col0 - 1:col0 - 1 + len(row)]
+                assignments = ", ".join(f"{_quote(name)} = ?" for name in columns)
+                self._conn.execute(
+                    f"UPDATE {self._table} SET {assignments} WHERE _row = "
+                    f"(SELECT _row FROM {self._table} ORDER BY _row LIMIT 1 OFFSET ?)",
+                    row + [number - 2],
+                )
+
+
+class SqliteSpreadsheet:
+    def __init__(self, key, path):
+        self.id = key
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._lock = threading.RLock()
+        self._worksheets = {}
+
+    def _titles(self):
+        rows = self._conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+        ).fetchall()
+        return {row[0] for row in rows}
+
+    def worksheet(self, title):
+        with self._lock:
+            if title not in self._worksheets:
+                ws = SqliteWorksheet(title, self._conn, self._lock)
+                if title not in self._titles():
+                    values = _seed_values(title)
+                    if values is None:
+                        raise KeyError(f"Worksheet {title!r} not found")
+                    with self._conn:
+                        ws._rewrite(values)
+                self._worksheets[title] = ws
+            return self._worksheets[title]
+
+    def worksheets(self):
+        with self._lock:
+            titles = self._titles() | set(SEED_HEADERS)
+            return [self.worksheet(title) for title in sorted(titles)]
+
+    def add_worksheet(self, title, rows=0, cols=0):
+        with self._lock, self._conn:
+            ws = SqliteWorksheet(title, self._conn, self._lock)
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS {ws._table} (_row INTEGER PRIMARY KEY AUTOINCREMENT)")
+            self._worksheets[title] = ws
+            return ws
+
+
+class SqliteClient:
+    def __init__(self, data_dir=DATA_DIR):
+        self.data_dir = data_dir
+        self._spreadsheets = {}
+        self._lock = threading.Lock()
+
+    def open_by_key(self, key):
+        with self._lock:
+            if key not in self._spreadsheets:
+                self._spreadsheets[key] = SqliteSpreadsheet(key, os.path.join(self.data_dir, f"{key}.db"))
+            return self._spreadsheets[key]
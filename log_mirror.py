@@ -0,0 +1,250 @@
+"""Local Parquet mirror of the FoodLog worksheet.
+
+The mirror remembers how many rows it has synced and a checksum of the last one.
+A sync re-reads that last row plus anything after it in one range read, so a page
+load costs roughly the number of new rows. If the last row no longer matches
+(a row was deleted or edited) the whole log is downloaded again.
+
+Every change is recorded in a short journal of added and removed rows, so derived
+tables (daily index, rollups) can catch up incrementally via catch_up().
+"""
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+import pyarrow.parquet as pq
+import streamlit as st
+
+from changesets import row_checksum
+from schema import coerce_log, concat_log
+from row_ids import assign_row_ids
+from sheets import column_letter, get_worksheet
+from write_behind import get_write_queue
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(HERE, ".cache")
+
+# Edits in the middle of the log don't move the last row, so re-download the
+# whole log at least this often even if the tail check passes
+FULL_RESYNC_SECONDS = 6 * 60 * 60
+
+# Reruns within this many seconds of a sync reuse it instead of hitting the API again
+SYNC_INTERVAL_SECONDS = 5
+
+# How many changes derived tables can fall behind before they have to rebuild
+JOURNAL_SIZE = 256
+
+
+def _unmatched_rows(frame, keys, other_counts):
+    """Rows of `frame` left over after pairing each with an identical row counted in `other_counts`."""
+    rank = keys.groupby(keys).cumcount()
+    matched = keys.map(other_counts).fillna(0)
+    return frame[rank.to_numpy() >= matched.to_numpy()]
+
+
+def frame_delta(old, new):
+    """Returns (removed, added) rows between two versions of the log, or None if the columns differ."""
+    if list(old.columns) != list(new.columns):
+        return None
+    old_keys = pd.util.hash_pandas_object(old, index=False)
+    new_keys = pd.util.hash_pandas_object(new, index=False)
+    removed = _unmatched_rows(old, old_keys, new_keys.value_counts())
+    added = _unmatched_rows(new, new_keys, old_keys.value_counts())
+    return removed, added
+
+
+class FoodLogMirror:
+    def __init__(self, sheet, name="FoodLog", cache_dir=CACHE_DIR, on_reload=None):
+        self.sheet = sheet
+        self.on_reload = on_reload  # called with the sheet's values after each full download
+        self.data_path = os.path.join(cache_dir, f"{name}.parquet")
+        self.meta_path = os.path.join(cache_dir, f"{name}.json")
+        self.frame = None
+        self.header = []
+        self.row_count = 0
+        self.tail_checksum = None
+        self.generation = 0
+        self.revision = 0
+        self.full_synced_at = 0.0
+        self.synced_at = 0.0
+        self._journal = []  # (revision, "add" | "remove", rows)
+        self._lock = threading.RLock()
+        self._load_local()
+
+    @property
+    def version(self):
+        """Changes whenever the mirrored data changes; use it as a cache key."""
+        return (self.generation, self.revision)
+
+    def _record(self, kind, rows):
+        if rows.empty:
+            return
+        self.revision += 1
+        self._journal.append((self.revision, kind, rows))
+        del self._journal[:-JOURNAL_SIZE]
+
+    # --- Local file ---
+    def _load_local(self):
+        if not (os.path.exists(self.data_path) and os.path.exists(self.meta_path)):
+            return
+        try:
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+            frame = pd.read_parquet(self.data_path)
+        except (OSError, ValueError):
+            return
+        if len(frame) != meta["row_count"]:
+            return
+        # Caches written before the schema existed are typed here
+        self.frame = coerce_log(frame)
+        self.header = meta["header"]
+        self.row_count = meta["row_count"]
+        self.tail_checksum = meta["tail_checksum"]
+        self.generation = meta.get("generation", 0)
+        self.revision = meta.get("revision", 0)
+        self.full_synced_at = meta.get("full_synced_at", 0.0)
+
+    def _save_local(self):
+        os.makedirs(os.path.dirname(self.data_path), exist_ok=True)
+        meta = {
+            "header": self.header,
+            "row_count": self.row_count,
+            "tail_checksum": self.tail_checksum,
+            "generation": self.generation,
+            "revision": self.revision,
+            "full_synced_at": self.full_synced_at,
+        }
+        self.frame.to_parquet(self.data_path + ".tmp", index=False)
+        os.replace(self.data_path + ".tmp", self.data_path)
+        with open(self.meta_path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(self.meta_path + ".tmp", self.meta_path)
+
+    # --- Sync ---
+    def _to_frame(self, rows):
+        width = len(self.header)
+        rows = [(list(row) + [""] * width)[:width] for row in rows]
+        return coerce_log(pd.DataFrame(rows, columns=self.header))
+
+    def full_reload(self):
+        with self._lock:
+            values = self.sheet.get_all_values()
+            old_frame = self.frame
+            self.header = values[0] if values else []
+            rows = values[1:]
+            self.frame = self._to_frame(rows)
+            self.row_count = len(rows)
+            self.tail_checksum = row_checksum(rows[-1]) if rows else None
+
+            # Journal what changed so derived tables don't have to start over
+            delta = frame_delta(old_frame, self.frame) if old_frame is not None else None
+            if delta is None:
+                self.generation += 1
+                self.revision = 0
+                self._journal = []
+            else:
+                removed, added = delta
+                self._record("remove", removed)
+                self._record("add", added)
+
+            self.full_synced_at = self.synced_at = time.time()
+            self._save_local()
+            if self.on_reload is not None:
+                self.on_reload(values)
+            return self.row_count
+
+    def sync(self, force=False):
+        """Brings the mirror up to date and returns the number of rows fetched."""
+        with self._lock:
+            now = time.time()
+            if not force and self.frame is not None and now - self.synced_at < SYNC_INTERVAL_SECONDS:
+                return 0
+            stale = now - self.full_synced_at > FULL_RESYNC_SECONDS
+            if self.frame is None or self.row_count == 0 or stale:
+                return self.full_reload()
+            self.synced_at = now
+
+            # Re-read the last synced row together with anything after it (header is row 1)
+            last_row = self.row_count + 1
+            values = self.sheet.get(f"A{last_row}:{column_letter(len(self.header))}")
+            if not values or row_checksum(values[0]) != self.tail_checksum:
+                return self.full_reload()
+
+            new_rows = values[1:]
+            if new_rows:
+                self.frame = concat_log(self.frame, self._to_frame(new_rows))
+                self._record("add", self.frame.iloc[self.row_count:])
+                self.row_count += len(new_rows)
+                self.tail_checksum = row_checksum(new_rows[-1])
+                self._save_local()
+            return len(new_rows)
+
+    def expire(self):
+        """Makes the next sync hit the sheet (after the app appended rows itself)."""
+        with self._lock:
+            self.synced_at = 0.0
+
+    def invalidate(self):
+        """Forces the next sync to download the whole log (after edits made by the app itself)."""
+        with self._lock:
+            self.synced_at = 0.0
+            self.full_synced_at = 0.0
+
+    def written(self, ops):
+        """Called by the write queue once the app's own writes have reached the sheet."""
+        if all(op == "append_rows" for op in ops):
+            self.expire()
+        else:
+            self.invalidate()
+
+    def read(self):
+        """Syncs and returns the log frame. Callers must not modify it in place."""
+        return self.snapshot()[0]
+
+    def snapshot(self):
+        """Syncs and returns (frame, version) taken together."""
+        with self._lock:
+            self.sync()
+            return self.frame, self.version
+
+    def open_saved(self):
+        """Syncs and returns (ParquetFile of the saved log or None if it is empty, header), taken together.
+
+        The file is opened under the lock, so a later sync replacing it doesn't affect the handle.
+        """
+        with self._lock:
+            self.sync()
+            return (pq.ParquetFile(self.data_path) if self.row_count else None), list(self.header)
+
+    def catch_up(self, version):
+        """Syncs and returns (frame, version, changes) for a reader last updated at `version`.
+
+        `changes` is a list of ("add" | "remove", rows) to apply in order, or None when
+        the reader is too far behind (or the columns changed) and has to rebuild from `frame`.
+        """
+        with self._lock:
+            self.sync()
+            changes = None
+            if version is not None and version[0] == self.generation:
+                since = version[1]
+                if since == self.revision:
+                    changes = []
+                elif self._journal and self._journal[0][0] <= since + 1:
+                    changes = [(kind, rows) for rev, kind, rows in self._journal if rev > since]
+            return self.frame, self.version, changes
+
+
+@st.cache_resource(show_spinner=False)
+def get_log_mirror():
+    queue = get_write_queue()
+
+    def reloaded(values):
+        # Someone else may have moved rows, so IDs are looked up afresh before the next delete
+        queue.row_index("FoodLog").invalidate()
+        assign_row_ids(queue, "FoodLog", values)
+
+    mirror = FoodLogMirror(get_worksheet("FoodLog"), on_reload=reloaded)
+    queue.subscribe("FoodLog", mirror.written)
+    return mirror
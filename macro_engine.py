@@ -0,0 +1,100 @@
+"""Vectorized macro computation over the food database.
+
+The database is held as a NumPy nutrient matrix (one row per food) plus a scale
+vector: 0.01 for foods measured per 100 g/ml, 1 for foods measured per unit.
+Macros for any batch of (food, quantity) pairs are then one fancy-indexed
+multiply, and every page shares the same unit rules.
+"""
+import numpy as np
+
+MACROS = ["Protein", "Carbs", "Fats", "Calories"]
+WEIGHT_UNITS = ["gram", "grams", "g", "ml"]
+
+# The sheet and food_database.csv say "Unit"; the older scripts' built-in tables say "unit"
+UNIT_KEYS = ("Unit", "unit")
+
+
+def is_weight_based(unit):
+    return str(unit).lower() in WEIGHT_UNITS
+
+
+def unit_scale(unit):
+    """Multiplier from quantity to 'number of reference amounts' (per 100 g/ml, or per unit)."""
+    return 0.01 if is_weight_based(unit) else 1.0
+
+
+def food_unit(row, keys=UNIT_KEYS):
+    """The unit of a food row. A row without a unit column is an error, not a food measured per unit."""
+    for key in keys:
+        if key in row:
+            return row[key]
+    raise KeyError(f"food row has no unit column (expected one of {', '.join(keys)})")
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class MacroEngine:
+    def __init__(self, food_data, nutrients=MACROS, unit_keys=UNIT_KEYS):
+        self.nutrients = list(nutrients)
+        self.unit_keys = tuple(unit_keys)
+        self.names = list(food_data)
+        self.positions = {name: i for i, name in enumerate(self.names)}
+        self.units = [food_unit(food_data[name], self.unit_keys) for name in self.names]
+        self.matrix = np.array(
+            [[_number(food_data[name].get(n)) for n in self.nutrients] for name in self.names],
+            dtype=float,
+        ).reshape(len(self.names), len(self.nutrients))
+        self.scale = np.array([unit_scale(unit) for unit in self.units], dtype=float)
+
+    def __contains__(self, food):
+        return food in self.positions
+
+    def __len__(self):
+        return len(self.names)
+
+    def unit(self, food):
+        return self.units[self.positions[food]]
+
+    def add_food(self, food, row):
+        """Adds or replaces one food without rebuilding the matrix from the database."""
+        values = np.array([_number(row.get(n)) for n in self.nutrients], dtype=float)
+        unit = food_unit(row, self.unit_keys)
+        if food in self.positions:
+            i = self.positions[food]
+            self.matrix[i] = values
+            self.units[i] = unit
+            self.scale[i] = unit_scale(unit)
+            return
+        self.positions[food] = len(self.names)
+        self.names.append(food)
+        self.units.append(unit)
+        self.matrix = np.vstack([self.matrix, values])
+        self.scale = np.append(self.scale, unit_scale(unit))
+
+    def compute(self, foods, quantities):
+        """Macros for a batch of (food, quantity) pairs as an array of shape (len(foods), len(nutrients))."""
+        idx = np.fromiter((self.positions[f] for f in foods), dtype=np.intp, count=len(foods))
+        factors = np.asarray(quantities, dtype=float) * self.scale[idx]
+        return self.matrix[idx] * factors[:, None]
+
+    def macros(self, food, quantity):
+        """Macros for a single food as a {nutrient: value} dict."""
+        return dict(zip(self.nutrients, self.compute([food], [quantity])[0].tolist()))
+
+    def log_entries(self, date, foods, quantities):
+        """FoodLog entries (Date, Food, Quantity, Unit, macros...) for a batch of foods."""
+        values = self.compute(foods, quantities).tolist()
+        entries = []
+        for food, quantity, row in zip(foods, quantities, values):
+            entry = {"Date": date, "Food": food, "Quantity": quantity, "Unit": self.unit(food)}
+            entry.update(zip(self.nutrients, row))
+            entries.append(entry)
+        return entries
+
+    def log_entry(self, date, food, quantity):
+        return self.log_entries(date, [food], [quantity])[0]
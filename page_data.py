@@ -0,0 +1,155 @@
+"""Concurrent loading of the worksheets each page needs, shared by every page and session.
+
+Pages used to open and read their worksheets one after another, so a cold page
+view cost the sum of every read. Now a page asks for all of its sheets at once.
+With Google they come back in one values_batch_get call. Local backends read
+them in parallel on a thread pool, and other slow work the page has (the log
+mirror's sync) runs alongside. A cold view then takes about as long as the
+slowest single read.
+
+Results are kept process-wide for CACHE_SECONDS and dropped as soon as anything
+writes to that sheet. Once a page has drawn, warm() loads the sheets the other
+pages need in the background, so switching pages finds them ready.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from sheets import get_pool, numericise, sheets_backend
+
+# Worksheets each page reads directly (the FoodLog comes through the log mirror)
+PAGE_SHEETS = {
+    "Log Your Food": ["FoodDatabase"],
+    "Downloads & Edits": ["FoodDatabase"],
+    "Quotes": ["Quotes"],
+    "Cognitive Biases": ["Bias"],
+    "My Recipes": ["FoodDatabase", "Recipes"],
+}
+
+# Other devices' changes show up within this long; the app's own writes at once
+CACHE_SECONDS = 60
+
+MAX_WORKERS = 8
+
+
+def records(values):
+    """get_all_records() for values already read: a dict per row keyed by the header, numbers converted."""
+    if not values:
+        return []
+    header = values[0]
+    return [{key: numericise(row[i]) if i < len(row) else "" for i, key in enumerate(header)} for row in values[1:]]
+
+
+class PageData:
+    def __init__(self, pool, cache_seconds=CACHE_SECONDS):
+        self.pool = pool
+        self.cache_seconds = cache_seconds
+        self._values = {}  # worksheet name -> (values, fetched at, revision)
+        self._writes = {}  # worksheet name -> writes seen, so a read that overlapped a write isn't kept
+        self._executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="page-data")
+        # Warming waits on the pool above, so it runs on its own thread
+        self._background = ThreadPoolExecutor(max_workers=1, thread_name_prefix="page-data-warm")
+        self._lock = threading.Lock()
+        pool.scheduler.subscribe(self._written)
+
+    def _written(self, scope):
+        name = scope[-1] if isinstance(scope, tuple) else scope
+        self.invalidate(name)
+
+    def invalidate(self, name):
+        with self._lock:
+            self._values.pop(name, None)
+            self._writes[name] = self._writes.get(name, 0) + 1
+
+    def _missing(self, names):
+        now = time.monotonic()
+        with self._lock:
+            return [n for n in dict.fromkeys(names) if n not in self._values or now - self._values[n][1] > self.cache_seconds]
+
+    # --- Fetching ---
+    def _fetch_one(self, name):
+        return self.pool.worksheet(name).get_all_values()
+
+    def _fetch(self, names):
+        """{name: values} for `names`, in one batch call with Google and in parallel otherwise."""
+        if sheets_backend() == "google" and names:
+            try:
+                spreadsheet = self.pool.spreadsheet()
+                response = self.pool.scheduler.read(None, lambda: spreadsheet.values_batch_get([f"'{n}'" for n in names]))
+                return {name: _padded(r.get("values", [])) for name, r in zip(names, response["valueRanges"])}
+            except Exception:
+                pass  # e.g. one of the tabs doesn't exist yet; read them one by one so the others still load
+        futures = {name: self._executor.submit(self._fetch_one, name) for name in names}
+        return {name: future.result() for name, future in futures.items()}
+
+    def _store(self, fetched, writes):
+        now = time.monotonic()
+        with self._lock:
+            for name, values in fetched.items():
+                if self._writes.get(name, 0) == writes.get(name, 0):
+                    self._values[name] = (values, now, hash(tuple(map(tuple, values))))
+
+    def load(self, names, tasks=()):
+        """Makes sure `names` are loaded, fetching what's missing while `tasks` (callables) run alongside.
+
+        Returns the tasks' results in order.
+        """
+        missing = self._missing(names)
+        with self._lock:
+            writes = {name: self._writes.get(name, 0) for name in missing}
+        futures = [self._executor.submit(task) for task in tasks]
+        if missing:
+            self._store(self._fetch(missing), writes)
+        return [future.result() for future in futures]
+
+    def values(self, name):
+        """The sheet's values (header first), from the shared cache if they are recent enough."""
+        self.load([name])
+        with self._lock:
+            cached = self._values.get(name)
+        # Stored only if no write overlapped the read; read again rather than serve a stale copy
+        return [list(row) for row in cached[0]] if cached else self._fetch_one(name)
+
+    def records(self, name):
+        return records(self.values(name))
+
+    def revision(self, name):
+        """Changes whenever the sheet's content does (within the process); use it as a cache key."""
+        self.load([name])
+        with self._lock:
+            cached = self._values.get(name)
+        return cached[2] if cached else None
+
+    def warm(self, pages=None):
+        """Loads the sheets of `pages` (default: all) in the background if they aren't cached."""
+        names = [n for page in (pages or PAGE_SHEETS) for n in PAGE_SHEETS[page]]
+        missing = self._missing(names)
+        if missing:
+            self._background.submit(self._warm, missing)
+
+    def _warm(self, names):
+        names = self._missing(names)
+        with self._lock:
+            writes = {name: self._writes.get(name, 0) for name in names}
+        try:
+            self._store(self._fetch(names), writes)
+        except Exception:
+            # One bad tab shouldn't keep the rest cold; a page that needs it reads it and reports the error
+            for name in names:
+                try:
+                    self._store({name: self._fetch_one(name)}, writes)
+                except Exception:
+                    pass
+
+
+def _padded(rows):
+    # values_batch_get trims trailing blank cells; get_all_values pads every row to the same width
+    width = max((len(row) for row in rows), default=0)
+    return [list(row) + [""] * (width - len(row)) for row in rows]
+
+
+@st.cache_resource(show_spinner=False)
+def get_page_data():
+    return PageData(get_pool())
@@ -3,26 +3,19 @@ import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
+from log_mirror import get_log_mirror
+from daily_log import get_daily_index
+from rollups import get_macro_rollup
 
 # --- Load Food Log ---
-if 'log_data_full' not in st.session_state:
+# Daily/weekly/monthly totals are maintained incrementally as the log changes
+log_mirror = get_log_mirror()
+rollup = get_macro_rollup(log_mirror)
+
+if rollup.first_day() is None:
     st.error("No Food Log data found. Please log some food first.")
     st.stop()
 
-food_log = st.session_state.log_data_full.copy()
-food_log['Date'] = pd.to_datetime(food_log['Date'], dayfirst=True)
-
-# Compute calories if not present
-if 'Calories' not in food_log.columns:
-    food_log['Calories'] = (
-        food_log['Protein'] * 4 +
-        food_log['Carbs'] * 4 +
-        food_log['Fats'] * 9
-    )
-
-# --- Aggregate Daily Totals ---
-daily_macros = food_log.groupby('Date')[['Protein', 'Carbs', 'Fats', 'Calories']].sum().reset_index()
-
 # --- Sidebar Settings ---
 st.sidebar.header("📊 Dashboard Settings")
 
@@ -33,6 +26,9 @@ time_range = st.sidebar.selectbox("Select Range:", ["Week", "Month", "Quarter",
 # Then Macro Selector
 macro = st.sidebar.selectbox("Select Macro:", ['Protein', 'Carbs', 'Fats', 'Calories', 'All Macros'])
 
+# Resolution of the trend chart
+group_by = st.sidebar.selectbox("Group By:", ["Day", "Week", "Month", "Quarter", "Year"])
+
 # Default threshold values
 default_thresholds = {
     'Protein': (100, 150),
@@ -48,7 +44,7 @@ if macro not in ['All Macros', 'Calories']:
     max_thresh = st.sidebar.number_input("Max Threshold", value=macro_max)
 
 # --- Time Range Filtering ---
-today = datetime.today()
+today = datetime.today().date()
 if time_range == "Week":
     start_date = today - timedelta(days=6)
 elif time_range == "Month":
@@ -59,14 +55,21 @@ elif time_range == "Quarter":
 elif time_range == "Year":
     start_date = today.replace(month=1, day=1)
 else:  # All
-    start_date = daily_macros['Date'].min()
+    start_date = rollup.first_day()
 
 end_date = today
-mask = (food_log['Date'] >= start_date) & (food_log['Date'] <= end_date)
-filtered_log = food_log[mask]
 
-# Daily summary for plotting
-filtered_macros = filtered_log.groupby('Date')[['Protein', 'Carbs', 'Fats', 'Calories']].sum().reset_index()
+# Daily totals for the summary stats
+filtered_macros = rollup.table("Day", start_date, end_date)
+
+# Plot at the chosen resolution, as the average per logged day so the threshold band still applies
+if group_by == "Day":
+    plot_macros = filtered_macros
+else:
+    period_totals = rollup.table(group_by, start_date, end_date)
+    plot_macros = period_totals[['Date']].join(
+        period_totals[['Protein', 'Carbs', 'Fats', 'Calories']].div(period_totals['Days'], axis=0)
+    )
 
 # --- Main Display ---
 st.title("📈 Macro Intake Trends")
@@ -79,8 +82,8 @@ if macro == "All Macros":
     colors = {'Protein': 'blue', 'Carbs': 'orange', 'Fats': 'green'}
     for m in ['Protein', 'Carbs', 'Fats']:
         fig.add_trace(go.Scatter(
-            x=filtered_macros['Date'],
-            y=filtered_macros[m],
+            x=plot_macros['Date'],
+            y=plot_macros[m],
             mode='lines+markers',
             name=m,
             line=dict(color=colors[m])
@@ -88,8 +91,8 @@ if macro == "All Macros":
 else:
     color_map = {'Protein': 'blue', 'Carbs': 'orange', 'Fats': 'green', 'Calories': 'red'}
     fig.add_trace(go.Scatter(
-        x=filtered_macros['Date'],
-        y=filtered_macros[macro],
+        x=plot_macros['Date'],
+        y=plot_macros[macro],
         mode='lines+markers',
         name=macro,
         line=dict(color=color_map.get(macro, 'blue'))
@@ -99,8 +102,8 @@ else:
     if macro != "Calories":
         fig.add_shape(
             type="rect",
-            x0=filtered_macros['Date'].min(),
-            x1=filtered_macros['Date'].max(),
+            x0=plot_macros['Date'].min(),
+            x1=plot_macros['Date'].max(),
             y0=min_thresh,
             y1=max_thresh,
             fillcolor="green",
@@ -153,8 +156,9 @@ else:
     if macro in ['Protein', 'Carbs', 'Fats', 'Calories']:
         st.subheader(f"🍽️ Top 3 {macro} Sources")
 
+        filtered_log = get_daily_index(log_mirror).range(start_date, end_date)
         top_foods = (
-            filtered_log.groupby('Food')[macro]
+            filtered_log.groupby('Food', observed=True)[macro]
             .sum()
             .sort_values(ascending=False)
             .head(3)
@@ -3,6 +3,9 @@ import os
 from datetime import date, datetime, timedelta
 import pandas as pd
 import streamlit as st
+from log_mirror import get_log_mirror
+from daily_log import get_daily_index
+from rollups import get_macro_rollup
 
 st.write("Loaded secret keys:", list(st.secrets.keys()))
 
@@ -16,16 +19,17 @@ client = OpenAI(
 
 # Assuming 'df' is your food log DataFrame for the past 7–30 days
 # --- Load Food Log ---
-if 'log_data_full' not in st.session_state:
+# Daily totals come from the shared rollup and rows from the per-day index,
+# both kept up to date incrementally as the log changes
+log_mirror = get_log_mirror()
+rollup = get_macro_rollup(log_mirror)
+daily_index = get_daily_index(log_mirror)
+
+if rollup.first_day() is None:
     st.error("No Food Log data found. Please log some food first.")
     st.stop()
 
-food_log = st.session_state.log_data_full.copy()
-food_log['Date'] = pd.to_datetime(food_log['Date'], dayfirst=True, errors='coerce')
-food_log = food_log.dropna(subset=['Date'])
-food_log = food_log.sort_values(by="Date", ascending=False)
-
-summary_text = food_log.groupby('Date')[['Protein', 'Carbs', 'Fats', 'Calories']].sum().reset_index().to_string(index=False)
+summary_text = rollup.table("Day")[['Date', 'Protein', 'Carbs', 'Fats', 'Calories']].to_string(index=False)
 prompt = f"""
 You are a macro tracking expert. Analyze the following food intake log and provide:
 1. A summary of the user's overall macro intake.
@@ -69,8 +73,7 @@ else:
     end_date = st.date_input("End Date", today)
 
 # --- Filter Food Log by Date Range ---
-mask = (food_log['Date'].dt.date >= start_date) & (food_log['Date'].dt.date <= end_date)
-filtered_log = food_log[mask]
+filtered_log = daily_index.range(start_date, end_date).iloc[::-1]  # newest first
 
 if filtered_log.empty:
     st.warning("No data in selected timeframe.")
@@ -81,7 +84,7 @@ display_cols = ['Date', 'Food', 'Quantity', 'Protein', 'Carbs', 'Fats', 'Calorie
 food_log_str = filtered_log[display_cols].to_string(index=False)
 
 # --- Daily Macro Summary ---
-daily_summary = filtered_log.groupby('Date')[['Protein', 'Carbs', 'Fats', 'Calories']].sum().reset_index()
+daily_summary = rollup.table("Day", start_date, end_date)[['Date', 'Protein', 'Carbs', 'Fats', 'Calories']]
 summary_str = daily_summary.to_string(index=False)
 
 
@@ -1,139 +1,366 @@
+import math
 import streamlit as st
 import pandas as pd
-import gspread
-from google.oauth2.service_account import Credentials
-
-# --- Auth ---
-scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-creds = Credentials.from_service_account_info(st.secrets["service_account"], scopes=scope)
-client = gspread.authorize(creds)
+import numpy as np
+from datetime import datetime, timedelta
+from sheets import get_worksheet
+from log_mirror import get_log_mirror
+from schema import day_numbers
+from write_behind import get_write_queue, show_pending_writes
+from food_index import get_food_index, normalize_food_name
+from snapshots import get_log_snapshot, show_memory_usage
+from changesets import (ChangesetConflict, PagedEdits, changeset, check_revision, date_changeset, editor_rows, is_empty,
+                        saved_rows, summary)
+from page_data import PAGE_SHEETS, get_page_data
+from quota import read_fresh
+from row_ids import ID_COLUMN, id_position, with_new_ids
+from exports import FORMATS, export_frame, export_log, file_name, mime_type
 
 # --- Sheets ---
-SHEET_URL = "https://docs.google.com/spreadsheets/d/1mVbGbsThxK9L1mC2-2n_qlC2S0IoPM7zxQYT8DVBiAA/edit#gid=1560030794"
-spreadsheet = client.open_by_url(SHEET_URL)
-food_sheet = spreadsheet.worksheet("FoodDatabase")
-log_sheet = spreadsheet.worksheet("FoodLog")
+food_sheet = get_worksheet("FoodDatabase")
+log_sheet = get_worksheet("FoodLog")
+
+# Saves are queued locally and sent to Sheets by a background thread
+write_queue = get_write_queue()
+show_pending_writes(write_queue)
 
 # --- Load Data ---
-@st.cache_data(ttl=60, show_spinner=False)
-def load_data():
-    food = pd.DataFrame(food_sheet.get_all_records())
-    log = pd.DataFrame(log_sheet.get_all_records())
-    return food, log
+# The food database comes from the shared page cache, fetched while the log mirror syncs
+page_data = get_page_data()
+# The log comes from the local mirror, which only fetches rows added since the last sync
+log_mirror = get_log_mirror()
+page_data.load(PAGE_SHEETS["Downloads & Edits"], tasks=[log_mirror.sync])
+food_data = pd.DataFrame(page_data.records("FoodDatabase"))
+# One read-only copy of the log shared by every page and session
+log_snapshot = get_log_snapshot(log_mirror)
+log_data = log_snapshot.read()
 
-food_data, log_data = load_data()
+show_memory_usage(log_snapshot)
 
 st.title("📥 Download, Edit & Manage Data")
 
 # --- Download Buttons ---
+# Files are built only when a button is clicked, in chunks straight from the local mirror
 st.subheader("⬇️ Download Sheets")
+export_format = st.radio("Format", list(FORMATS), horizontal=True)
+limit_dates = st.checkbox("Only export log entries between two dates")
+if limit_dates:
+    today = datetime.today().date()
+    date_range = st.date_input("Log dates", value=(today - timedelta(days=30), today))
+    export_start, export_end = date_range if len(date_range) == 2 else (date_range[0], date_range[0])
+else:
+    export_start = export_end = None
+
 col1, col2 = st.columns(2)
 
 with col1:
     if not food_data.empty:
         st.download_button(
-            label="Download Food Database as CSV",
-            data=food_data.to_csv(index=False).encode('utf-8'),
-            file_name='food_database.csv',
-            mime='text/csv'
+            label=f"Download Food Database as {export_format}",
+            data=lambda: export_frame(food_data, export_format),
+            file_name=file_name("food_database", export_format),
+            mime=mime_type(export_format),
+            on_click="ignore",
         )
 
 with col2:
     if not log_data.empty:
         st.download_button(
-            label="Download Food Log as CSV",
-            data=log_data.to_csv(index=False).encode('utf-8'),
-            file_name='food_log.csv',
-            mime='text/csv'
+            label=f"Download Food Log as {export_format}",
+            data=lambda: export_log(log_mirror, export_format, export_start, export_end),
+            file_name=file_name("food_log", export_format),
+            mime=mime_type(export_format),
+            on_click="ignore",
         )
 
+# --- Editing state ---
+# Each editor keeps the table it shows, the sheet row of each of its rows (None for
+# rows added here) and the rows as loaded, so saving sends only what changed
+def start_editing(name, frame):
+    numbers = list(range(2, len(frame) + 2))
+    st.session_state[f"{name}_original"] = dict(zip(numbers, (list(row) for row in frame.itertuples(index=False, name=None))))
+    keep_editing(name, frame, numbers)
+
+
+def keep_editing(name, frame, numbers):
+    st.session_state[f"{name}_state"] = frame.reset_index(drop=True)
+    st.session_state[f"{name}_rows"] = numbers
+    # A fresh editor key, since the old editor's edits are now part of the table
+    st.session_state[f"{name}_editor"] = st.session_state.get(f"{name}_editor", 0) + 1
+
+
+def editor_key(name):
+    return f"edit_{name}_{st.session_state[f'{name}_editor']}"
+
+
+def current_rows(name, drop=()):
+    return editor_rows(st.session_state[f"{name}_state"], st.session_state[f"{name}_rows"],
+                       st.session_state.get(editor_key(name)), drop)
+
+
+def bake_edits(name, drop=(), extra_rows=0):
+    """Folds the editor's edits into the table, leaving out rows at positions in `drop` and adding blank rows."""
+    columns = st.session_state[f"{name}_state"].columns
+    rows = current_rows(name, drop) + [(None, [""] * len(columns))] * extra_rows
+    keep_editing(name, pd.DataFrame([values for _, values in rows], columns=columns), [number for number, _ in rows])
+
+
+def delete_selected_rows(name):
+    # Rows with edits in the editor count as selected
+    selected = [int(i) for i in st.session_state.get(editor_key(name), {}).get("edited_rows", {})]
+    bake_edits(name, drop=selected)
+
+
 # --- Save function ---
-def save_to_sheet(sheet, df, name="Sheet"):
+def queue_changes(sheet, changes, label):
+    """Queues `changes` and returns the write's id, or None if there was nothing to save or the sheet had moved on."""
+    if is_empty(changes):
+        st.info(f"No changes to save in the {label}.")
+        return None
     try:
-        sheet.clear()
-        sheet.update([df.columns.values.tolist()] + df.values.tolist())
-        st.success(f"{name} updated successfully!")
+        # With nothing of ours still on its way to the sheet, it must look as the changeset expects right now
+        if not any(op["sheet"] == sheet.title for op in write_queue.pending()):
+            check_revision(sheet, changes)
+        # Checked again and applied in one batch update by the write queue
+        op_id = write_queue.worksheet(sheet.title).apply_changes(changes)
+    except ChangesetConflict as e:
+        st.error(f"{label} not saved: {e}. Your edits are still in the table; Revert loads the current sheet.")
+        return None
     except Exception as e:
-        st.error(f"Failed to update {name}: {e}")
+        st.error(f"Failed to update {label}: {e}")
+        return None
+    st.success(f"{label} saved ({summary(changes)}), syncing to Google Sheets.")
+    return op_id
+
+
+# The queue checks a save again before applying it. Until it has, the edits the
+# save came from are kept, so a conflict found then gives them back to the editor
+def keep_unsaved(name, op_id, edits):
+    st.session_state[f"{name}_saving"] = (op_id, edits)
+
+
+def check_saving(name, restore, label, applied=None):
+    """Settles the last save of `name`: restore(edits) on a conflict, applied(edits) once it is in the sheet.
+
+    applied() returns False if the page can't show the saved data yet, to be asked again next rerun.
+    """
+    saving = st.session_state.get(f"{name}_saving")
+    if saving is None:
+        return
+    op_id, edits = saving
+    message = write_queue.conflict(op_id)
+    if message:
+        write_queue.dismiss_conflict(op_id)
+        del st.session_state[f"{name}_saving"]
+        restore(edits)
+        st.error(f"{label} changes were not saved: {message}. Your edits are back in the table; "
+                 "Revert loads the current sheet.")
+    elif not write_queue.is_pending(op_id) and (applied is None or applied(edits) is not False):
+        del st.session_state[f"{name}_saving"]
+
+
+def save_to_sheet(sheet, name, label):
+    rows = with_new_ids(current_rows(name), id_position(st.session_state[f"{name}_state"].columns))
+    original = st.session_state[f"{name}_original"]
+    op_id = queue_changes(sheet, changeset(original, rows), label)
+    if op_id is None:
+        return False
+    columns = st.session_state[f"{name}_state"].columns
+    keep_unsaved(name, op_id, (original, pd.DataFrame([values for _, values in rows], columns=columns),
+                               [number for number, _ in rows]))
+    start_editing(name, pd.DataFrame(saved_rows(rows), columns=columns))
+    return True
+
+
+def restore_table(name):
+    def restore(edits):
+        original, frame, numbers = edits
+        st.session_state[f"{name}_original"] = original
+        keep_editing(name, frame, numbers)
+    return restore
 
 # ============================
 # 🔧 Food Database Editor
 # ============================
 st.subheader("🍽️ Edit Food Database")
 
+check_saving("food_data", restore_table("food_data"), "Food Database")
 if "food_data_state" not in st.session_state:
-    st.session_state["food_data_state"] = food_data.copy()
+    start_editing("food_data", food_data)
 
 # Add new empty row
 if st.button("➕ Add Row to Food Database"):
-    new_row = pd.DataFrame([[""] * len(food_data.columns)], columns=food_data.columns)
-    st.session_state["food_data_state"] = pd.concat([st.session_state["food_data_state"], new_row], ignore_index=True)
+    bake_edits("food_data", extra_rows=1)
 
 # Editable table with selectable rows
-edited_food_data = st.data_editor(
+st.data_editor(
     st.session_state["food_data_state"],
     use_container_width=True,
     num_rows="dynamic",
-    key="edit_food",
-    hide_index=True
+    key=editor_key("food_data"),
+    hide_index=True,
+    column_config={ID_COLUMN: None},  # IDs are assigned on save, not edited
 )
 
 # Delete selected rows
 if st.button("🗑️ Delete Selected Rows (Food Database)"):
-    selected_rows = st.session_state["edit_food"]["edited_rows"]
-    remaining_data = edited_food_data.drop(index=list(selected_rows.keys())).reset_index(drop=True)
-    st.session_state["food_data_state"] = remaining_data
-    st.experimental_rerun()
+    delete_selected_rows("food_data")
+    st.rerun()
 
 # Save and Revert buttons
 col_save_food, col_revert_food = st.columns(2)
 with col_save_food:
     if st.button("✅ Save Changes to Food Database"):
-        save_to_sheet(food_sheet, st.session_state["food_data_state"], "Food Database")
+        if save_to_sheet(food_sheet, "food_data", "Food Database"):
+            get_food_index().invalidate()
 
 with col_revert_food:
     if st.button("🔄 Revert Food Database"):
-        st.cache_data.clear()
+        page_data.invalidate("FoodDatabase")
         del st.session_state["food_data_state"]
-        st.experimental_rerun()
+        st.session_state.pop("food_data_saving", None)
+        st.rerun()
 
 # ============================
 # 📒 Food Log Editor
 # ============================
 st.subheader("🧾 Edit Food Log")
 
-if "log_data_state" not in st.session_state:
-    st.session_state["log_data_state"] = log_data.copy()
+# Only one page of the log goes to the browser. Edits are folded into log_edits
+# whenever the page changes and saved together as one changeset
+
+
+def restore_log_edits(edits):
+    st.session_state["log_edits"] = edits
+    st.session_state["log_editor"] += 1
+
+
+def log_saved(edits):
+    # Back to editing the shared snapshot once the mirror has picked the save up
+    snapshot = get_log_snapshot(log_mirror)
+    if snapshot.version == edits.version:
+        return False
+    st.session_state["log_edits"] = PagedEdits(snapshot.read(), snapshot.version)
+    st.session_state["log_editor"] += 1
+    return True
+
+
+# While a save is on its way, the table keeps showing its edits over the snapshot they were made on
+check_saving("log", restore_log_edits, "Food Log", log_saved)
+log_saving = "log_saving" in st.session_state
+if "log_edits" not in st.session_state:
+    st.session_state["log_edits"] = PagedEdits(log_data, log_snapshot.version)
+    st.session_state["log_editor"] = 0
+log_edits = st.session_state["log_edits"]
+
+
+def log_editor_key():
+    return f"edit_log_{st.session_state['log_editor']}"
+
+
+def fold_log_page(drop=()):
+    log_edits.fold(st.session_state.get("log_window", []), st.session_state.get(log_editor_key()), drop)
+    # A fresh editor, since its edits are now part of log_edits
+    st.session_state["log_editor"] += 1
+
+
+def change_log_filter():
+    fold_log_page()
+    st.session_state["log_page"] = 1
+
+
+def add_log_row():
+    fold_log_page()
+    log_edits.add_blank()
+
+
+def delete_selected_log_rows():
+    # Rows with edits in the editor count as selected
+    selected = [int(i) for i in st.session_state.get(log_editor_key(), {}).get("edited_rows", {})]
+    fold_log_page(drop=selected)
+
+
+col_dates, col_food, col_size = st.columns([2, 2, 1])
+with col_dates:
+    log_dates = st.date_input("Dates", value=(), key="log_dates", on_change=change_log_filter)
+with col_food:
+    food_filter = st.text_input("Food contains", key="log_food", on_change=change_log_filter)
+with col_size:
+    page_size = st.selectbox("Rows per page", [50, 100, 250], key="log_page_size", on_change=change_log_filter)
+
+# Filtering runs here on the server; only the matching page is materialized
+base = log_edits.base
+
+
+def log_column(name, build):
+    # Columns derived from the shared snapshot are built once per log version for all sessions
+    if log_edits.version == log_snapshot.version:
+        return log_snapshot.view(name, build)
+    return build(base)
+
+
+mask = np.ones(len(base), dtype=bool)
+if len(log_dates) == 2:
+    days = log_column("day numbers", lambda log: day_numbers(log["Date"]))
+    mask &= (days >= log_dates[0].toordinal()) & (days <= log_dates[1].toordinal())
+if food_filter.strip():
+    names = log_column("normalized food names", lambda log: log["Food"].map(normalize_food_name))
+    mask &= names.str.contains(normalize_food_name(food_filter), regex=False).to_numpy(dtype=bool)
+positions = np.flatnonzero(mask)
+
+pages = max(1, math.ceil(len(positions) / page_size))
+if st.session_state.get("log_page", 1) > pages:
+    st.session_state["log_page"] = pages
+page = st.number_input("Page", min_value=1, max_value=pages, step=1, key="log_page", on_change=fold_log_page)
+window, st.session_state["log_window"] = log_edits.window(positions[(page - 1) * page_size:page * page_size])
+st.caption(f"{len(positions)} matching rows, page {page} of {pages}"
+           + (f" · {len(log_edits)} unsaved row change(s) from earlier pages" if len(log_edits) else ""))
+
+if log_saving:
+    st.info("Saving your changes to Google Sheets; the log can be edited again once they are in.")
 
 # Add new empty row
-if st.button("➕ Add Row to Food Log"):
-    new_row = pd.DataFrame([[""] * len(log_data.columns)], columns=log_data.columns)
-    st.session_state["log_data_state"] = pd.concat([st.session_state["log_data_state"], new_row], ignore_index=True)
+st.button("➕ Add Row to Food Log", on_click=add_log_row, disabled=log_saving)
 
 # Editable table with selectable rows
-edited_log_data = st.data_editor(
-    st.session_state["log_data_state"],
+st.data_editor(
+    window,
     use_container_width=True,
     num_rows="dynamic",
-    key="edit_log",
-    hide_index=True
+    key=log_editor_key(),
+    hide_index=True,
+    column_config={ID_COLUMN: None},
+    disabled=log_saving,
 )
 
 # Delete selected rows
-if st.button("🗑️ Delete Selected Rows (Food Log)"):
-    selected_rows = st.session_state["edit_log"]["edited_rows"]
-    remaining_data = edited_log_data.drop(index=list(selected_rows.keys())).reset_index(drop=True)
-    st.session_state["log_data_state"] = remaining_data
-    st.experimental_rerun()
+st.button("🗑️ Delete Selected Rows (Food Log)", on_click=delete_selected_log_rows, disabled=log_saving)
 
 # Save and Revert buttons
 col_save_log, col_revert_log = st.columns(2)
 with col_save_log:
-    if st.button("✅ Save Changes to Food Log"):
-        save_to_sheet(log_sheet, st.session_state["log_data_state"], "Food Log")
+    if st.button("✅ Save Changes to Food Log", disabled=log_saving):
+        fold_log_page()
+        rows = with_new_ids(log_edits.rows(), id_position(base.columns))
+        op_id = queue_changes(log_sheet, changeset(log_edits.original(), rows), "Food Log")
+        if op_id is not None:
+            # Only the edits are kept; log_saved() swaps in the snapshot once the sheet has them
+            keep_unsaved("log", op_id, log_edits)
+            st.rerun()
 
 with col_revert_log:
     if st.button("🔄 Revert Food Log"):
-        st.cache_data.clear()
-        del st.session_state["log_data_state"]
-        st.experimental_rerun()
+        del st.session_state["log_edits"]
+        st.session_state.pop("log_saving", None)
+        st.rerun()
+
+# Older rows may have dates in other formats; rewrite them to the app's own so the sheet reads the same everywhere
+with st.expander("📅 Normalize Food Log dates"):
+    st.caption("Rewrites every Date cell to DD/MM/YYYY, the format the app logs in. Only the cells that differ are written.")
+    if st.button("Normalize Dates"):
+        # The raw cells, under the read budget: the mirror and snapshot hold dates already normalized
+        if queue_changes(log_sheet, date_changeset(read_fresh(log_sheet, "get_all_values")), "Food Log dates") is not None:
+            del st.session_state["log_edits"]
+
+# Load what the other pages need in the background
+page_data.warm()
@@ -1,11 +1,8 @@
 import streamlit as st
-import pandas as pd
-import random
-from datetime import date
-import gspread
-from google.oauth2.service_account import Credentials
+from page_data import get_page_data
+from daily_picks import current_pick, get_daily_picks, next_pick
+from audio_catalog import clip_label, format_duration, get_audio_catalog, play_clip
 from datetime import datetime
-import os
 
 # Calculate the difference
 birth_datetime = datetime(1981, 3, 8, 9, 20, 0)  # 8 March 1981, 09:20:00
@@ -25,36 +22,25 @@ st.markdown("### 🌟 Relax and  make the most out of your time! Nothing is as s
 st.markdown("---")
 
 
-# Google Sheets authentication
-scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-creds = Credentials.from_service_account_info(st.secrets["service_account"], scopes=scope)
-client = gspread.authorize(creds)
+# Read through the shared page cache (see page_data.py)
+page_data = get_page_data()
 
-# Open the sheet
-SHEET_URL = "https://docs.google.com/spreadsheets/d/1mVbGbsThxK9L1mC2-2n_qlC2S0IoPM7zxQYT8DVBiAA/edit#gid=2056045424"
-spreadsheet = client.open_by_url(SHEET_URL)
-quotes_sheet = spreadsheet.worksheet("Quotes")
+# Today's picks are dealt once per day and sheet revision and shared by every session
+daily_picks = get_daily_picks()
+quotes_revision = page_data.revision("Quotes")
 
-# Load data
-data = pd.DataFrame(quotes_sheet.get_all_records())
 
-# Function to get a deterministic daily random row
-def get_daily_random_row(df, seed_date):
-    if df.empty:
-        return None
-    random.seed(seed_date.toordinal())
-    return df.sample(n=1, random_state=random.randint(0, 100000)).iloc[0]
+def is_mantra(row):
+    return str(row.get("Details1", "")).lower() == "mantras"
 
-# --- Quotes Section ---
-st.subheader("📜 Today's Quote")
 
-quotes_df = data[data["Details1"].str.lower() != "mantras"]
+quote_deck = daily_picks.deck("quote", quotes_revision, lambda: [r for r in page_data.records("Quotes") if not is_mantra(r)])
+mantra_deck = daily_picks.deck("mantra", quotes_revision, lambda: [r for r in page_data.records("Quotes") if is_mantra(r)])
 
-# Check if we already have a random quote in session state
-if 'quote_random' not in st.session_state:
-    st.session_state['quote_random'] = get_daily_random_row(quotes_df, date.today())
+# --- Quotes Section ---
+st.subheader("📜 Today's Quote")
 
-q = st.session_state['quote_random']
+q = current_pick(quote_deck)
 
 # Display the current quote
 st.markdown(f"**Date:** {q['Date']}")
@@ -63,22 +49,16 @@ st.markdown(f"**Source:** {q['Source']}")
 st.markdown(f"**Details:** {q['Details1']}{', ' + q['Details2'] if q['Details2'] else ''}")
 st.write(f"_{q['Quote']}_")
 
-# Button to get a new random quote
+# Next card in today's shuffled deck; nothing repeats until every quote has been shown
 if st.button("Display Another Quote"):
-    st.session_state['quote_random'] = quotes_df.sample(n=1).iloc[0]
+    next_pick(quote_deck)
     st.rerun()
 
 
 # --- Mantras Section ---
 st.subheader("🧘‍♂️ Today's Mantra")
 
-mantras_df = data[data["Details1"].str.lower() == "mantras"]
-
-# Check if we already have a random mantra in session state
-if 'mantra_random' not in st.session_state:
-    st.session_state['mantra_random'] = get_daily_random_row(mantras_df, date.today())
-
-m = st.session_state['mantra_random']
+m = current_pick(mantra_deck)
 
 # Display the current mantra
 st.markdown(f"**Date:** {m['Date']}")
@@ -89,7 +69,7 @@ st.write(f"_{m['Quote']}_")
 
 # Button to get a new random mantra
 if st.button("Display Another Mantra"):
-    st.session_state['mantra_random'] = mantras_df.sample(n=1).iloc[0]
+    next_pick(mantra_deck)
     st.rerun()
 
 
@@ -97,34 +77,67 @@ if st.button("Display Another Mantra"):
 # --- Daily Random Audio Clip Section ---
 st.subheader("🎧 Today's Audio")
 
-# Path to audio files in the deployed app
-audio_dir = "audio_clips"
-
-# List all audio files
-audio_files = [f for f in os.listdir(audio_dir) if f.endswith(('.mp3', '.wav'))]
-
-if audio_files:
-    if 'audio_random' not in st.session_state:
-        # Deterministically pick one per day by default
-        random.seed(date.today().toordinal())
-        st.session_state['audio_random'] = random.choice(audio_files)
+# Clips stream from the static route; the catalog (sizes, durations) is indexed once per process
+audio_catalog = get_audio_catalog()
+audio_catalog.refresh()
+audio_deck = daily_picks.deck("audio", audio_catalog.revision, lambda: audio_catalog.clips)
 
+if len(audio_deck):
     # Display audio player
-    audio_today = st.session_state['audio_random']
-    audio_path = os.path.join(audio_dir, audio_today)
-    
-    with open(audio_path, "rb") as audio_file:
-        audio_bytes = audio_file.read()
-        st.audio(audio_bytes, format="audio/mp3" if audio_today.endswith(".mp3") else "audio/wav")
-        st.caption(f"Now playing: {audio_today}")
+    clip = current_pick(audio_deck)
+    play_clip(clip)
+    st.caption(f"Now playing: {clip['file']} ({format_duration(clip['duration'])})")
 
+    col1, col2 = st.columns(2)
     # Button to get a new random audio file
-    if st.button("Play Another Audio Clip"):
-        st.session_state['audio_random'] = random.choice(audio_files)
+    if col1.button("Play Another Audio Clip"):
+        next_pick(audio_deck)
+        st.rerun()
+    # Carry on through the series this clip comes from, in order
+    if clip["series"] is not None and col2.button("Continue This Series"):
+        st.session_state["audio_playlist"] = {"series": clip["series"], "position": audio_catalog.position(clip) + 1}
         st.rerun()
 else:
     st.info("No audio files found.")
 
 
+# --- Audio Series Section ---
+if audio_catalog.series:
+    st.subheader("📚 Listen to a Series")
+
+    series_numbers = sorted(audio_catalog.series)
+    playlist_state = st.session_state.setdefault("audio_playlist", {"series": series_numbers[0], "position": 0})
+    if playlist_state["series"] not in audio_catalog.series:
+        playlist_state.update(series=series_numbers[0], position=0)
+
+    def series_label(number):
+        playlist = audio_catalog.playlist(number)
+        return (f"{number}. {audio_catalog.series_names[number]} "
+                f"({len(playlist)} clips, {format_duration(audio_catalog.series_duration(number))})")
+
+    series = st.selectbox("Series", series_numbers, index=series_numbers.index(playlist_state["series"]),
+                          format_func=series_label)
+    if series != playlist_state["series"]:
+        playlist_state.update(series=series, position=0)
 
+    playlist = audio_catalog.playlist(series)
+    position = min(playlist_state["position"], len(playlist) - 1)
+    position = st.selectbox("Clip", range(len(playlist)), index=position,
+                            format_func=lambda i: clip_label(playlist[i]))
+    playlist_state["position"] = position
+    series_clip = playlist[position]
+
+    play_clip(series_clip)
+    if series_clip["source_seconds"] is not None:
+        st.caption(f"From {format_duration(series_clip['source_seconds'])} into the original talk")
+
+    col1, col2 = st.columns(2)
+    if col1.button("⏮ Previous Clip", disabled=position == 0):
+        playlist_state["position"] = position - 1
+        st.rerun()
+    if col2.button("Next Clip ⏭", disabled=position == len(playlist) - 1):
+        playlist_state["position"] = position + 1
+        st.rerun()
 
+# Load what the other pages need in the background
+page_data.warm()
@@ -0,0 +1,170 @@
+import streamlit as st
+import pandas as pd
+from datetime import datetime
+from sheets import get_or_create_worksheet
+from page_data import PAGE_SHEETS, get_page_data, records
+from storage import LogWriteQueue
+from write_behind import get_write_queue, show_pending_writes
+from macro_engine import MacroEngine
+from schema import format_day
+from changesets import ChangesetConflict, check_revision, is_empty
+from recipes import (RECIPE_COLUMNS, Recipe, parse_recipes, missing_foods, get_recipe_cache, recipe_changeset,
+                     recipe_log_entries)
+
+# --- Sheets ---
+recipe_sheet = get_or_create_worksheet("Recipes", RECIPE_COLUMNS)
+# Both sheets are read together through the shared page cache (see page_data.py)
+page_data = get_page_data()
+page_data.load(PAGE_SHEETS["My Recipes"])
+
+# Saves are queued locally and sent to Sheets by a background thread
+write_queue = get_write_queue()
+show_pending_writes(write_queue)
+log_queue = LogWriteQueue(write_queue.worksheet("FoodLog"))
+
+# --- Load Data ---
+food_data = {row["Food"]: row for row in page_data.records("FoodDatabase")}
+macro_engine = MacroEngine(food_data)
+recipe_values = page_data.values("Recipes")
+
+# Until the queue has written a save, show the recipes as saved
+saving = st.session_state.get("recipes_saving")
+if saving is not None:
+    op_id, saved_values = saving
+    message = write_queue.conflict(op_id)
+    if message:
+        write_queue.dismiss_conflict(op_id)
+        st.error(f"Your last recipe change was not saved: {message}. The recipes below are the current ones.")
+    if write_queue.is_pending(op_id):
+        recipe_values = saved_values
+    else:
+        del st.session_state["recipes_saving"]
+recipes = parse_recipes(records(recipe_values))
+
+# Per-serving macros are cached across reruns and recomputed only when an ingredient changes
+recipe_cache = get_recipe_cache()
+
+
+def save_recipes(recipes):
+    """Queues the changes from the sheet as loaded to `recipes`. Returns False if the sheet changed elsewhere first."""
+    changes, saved_values = recipe_changeset(recipe_values, recipes)
+    if is_empty(changes):
+        return True
+    try:
+        # With nothing of ours still on its way to the sheet, it must look as the changeset expects right now
+        if not any(op["sheet"] == recipe_sheet.title for op in write_queue.pending()):
+            check_revision(recipe_sheet, changes)
+    except ChangesetConflict as e:
+        st.error(f"Recipes not saved: {e}. Reload the page and try again.")
+        page_data.invalidate("Recipes")
+        return False
+    op_id = write_queue.worksheet(recipe_sheet.title).apply_changes(changes)
+    st.session_state["recipes_saving"] = (op_id, saved_values)
+    return True
+
+
+st.title("📖 My Recipes")
+
+# ============================
+# 🍲 Log a Recipe
+# ============================
+st.subheader("🍲 Log a Recipe")
+
+if not recipes:
+    st.info("No recipes yet. Create one below.")
+else:
+    recipe_name = st.selectbox("Recipe", options=list(recipes.keys()))
+    recipe = recipes[recipe_name]
+    missing = missing_foods(recipe, macro_engine)
+
+    if missing:
+        st.warning(f"These ingredients are no longer in the Food Database: {', '.join(missing)}")
+    else:
+        per_serving = recipe_cache.per_serving(recipe, macro_engine)
+        cols = st.columns(len(macro_engine.nutrients))
+        for col, name, value in zip(cols, macro_engine.nutrients, per_serving):
+            col.metric(f"{name} / serving", f"{value:.1f}")
+
+        ingredient_macros = pd.DataFrame(
+            macro_engine.compute(recipe.foods, recipe.quantities), columns=macro_engine.nutrients
+        ).round(1)
+        ingredient_macros.insert(0, "Food", recipe.foods)
+        ingredient_macros.insert(1, "Quantity", recipe.quantities)
+        ingredient_macros.insert(2, "Unit", [macro_engine.unit(food) for food in recipe.foods])
+        st.caption(f"Whole recipe, {recipe.servings:g} servings")
+        st.dataframe(ingredient_macros, use_container_width=True, hide_index=True)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            log_date = st.date_input("Date", value=datetime.today().date())
+        with col2:
+            servings = st.number_input("Servings", min_value=0.1, value=1.0, step=0.5)
+        log_as = st.radio("Log as", ["One row for the recipe", "One row per ingredient"], horizontal=True)
+
+        if st.button("Add Recipe to Log"):
+            entries = recipe_log_entries(
+                recipe, servings, format_day(log_date), macro_engine, recipe_cache,
+                per_ingredient=log_as == "One row per ingredient",
+            )
+            for entry in entries:
+                log_queue.add(entry)
+            # All rows of the recipe go out in one append
+            log_queue.flush()
+            st.success(f"{servings:g} serving(s) of {recipe_name} added to log!")
+
+# ============================
+# ✏️ Create / Edit Recipe
+# ============================
+st.markdown("---")
+st.subheader("✏️ Create or Edit a Recipe")
+
+editing = st.selectbox("Recipe to edit", options=["New Recipe..."] + list(recipes.keys()))
+current = recipes.get(editing, Recipe(""))
+
+new_name = st.text_input("Recipe Name", value=current.name)
+new_servings = st.number_input("Servings the recipe makes", min_value=1.0, value=float(current.servings), step=1.0)
+ingredients = st.data_editor(
+    pd.DataFrame({
+        "Food": pd.Series(current.foods, dtype="object"),
+        "Quantity": pd.Series(current.quantities, dtype="float"),
+    }),
+    num_rows="dynamic",
+    use_container_width=True,
+    hide_index=True,
+    key=f"recipe_editor_{editing}",
+    column_config={
+        "Food": st.column_config.SelectboxColumn("Food", options=list(food_data.keys()), required=True),
+        "Quantity": st.column_config.NumberColumn("Quantity", min_value=0.0, step=1.0, required=True),
+    },
+)
+ingredients = ingredients.dropna()
+ingredients = ingredients[ingredients["Food"].isin(food_data.keys()) & (ingredients["Quantity"] > 0)]
+
+col_save, col_delete = st.columns(2)
+with col_save:
+    if st.button("💾 Save Recipe"):
+        new_name = new_name.strip()
+        if not new_name:
+            st.error("Please enter a recipe name.")
+        elif ingredients.empty:
+            st.error("Add at least one ingredient with a quantity.")
+        elif new_name != editing and new_name in recipes:
+            st.error(f"A recipe called {new_name} already exists.")
+        else:
+            recipes.pop(editing, None)
+            recipe_cache.discard(editing)
+            recipes[new_name] = Recipe(new_name, new_servings, zip(ingredients["Food"], ingredients["Quantity"]))
+            if save_recipes(recipes):
+                st.success(f"{new_name} saved!")
+                st.rerun()
+
+with col_delete:
+    if editing in recipes and st.button("🗑️ Delete Recipe"):
+        del recipes[editing]
+        recipe_cache.discard(editing)
+        if save_recipes(recipes):
+            st.success(f"{editing} deleted.")
+            st.rerun()
+
+# Load what the other pages need in the background
+page_data.warm()
@@ -0,0 +1,284 @@
+"""Request scheduler that keeps the app inside the Sheets API quotas.
+
+Every worksheet call from the pool goes through one SheetsScheduler:
+
+- reads repeated within FRESH_SECONDS (the same rerun asking twice) are served
+  from the last result, and identical reads already in flight are shared
+- reads and writes each draw from a token bucket sized to the per-minute quota;
+  writes wait for a token, reads with a cached result serve it stale and refresh
+  it in the background once the budget allows (stale-while-revalidate)
+- writes to a worksheet drop its cached reads
+
+Counters of calls made, calls saved and throttles hit are kept for the UI.
+"""
+import copy
+import threading
+import time
+from collections import Counter, deque
+
+import streamlit as st
+
+# Google's default per-user limits are 60 read and 60 write requests per minute
+READS_PER_MINUTE = 60
+WRITES_PER_MINUTE = 60
+
+# Identical reads this close together are answered from the first one
+FRESH_SECONDS = 2
+
+# Cached read results kept for stale-while-revalidate
+MAX_CACHED_READS = 256
+
+READ_METHODS = {"get_all_values", "get_all_records", "get", "get_values", "row_values", "col_values", "batch_get"}
+WRITE_METHODS = {"append_rows", "append_row", "delete_rows", "update", "clear", "batch_update", "batch_clear"}
+
+
+def api_status(error):
+    """HTTP status of a gspread APIError (or anything carrying a response), else None."""
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if status is not None else getattr(error, "code", None)
+
+
+class TokenBucket:
+    """Allows `per_minute` calls a minute, refilled continuously. per_minute=None means unlimited."""
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.tokens = float(per_minute or 0)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    def try_take(self):
+        if self.capacity is None:
+            return True
+        with self._lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def wait_time(self):
+        if self.capacity is None:
+            return 0.0
+        with self._lock:
+            self._refill()
+            return max(0.0, (1 - self.tokens) * 60 / self.capacity)
+
+    def take(self):
+        """Blocks until a token is available. Returns True if it had to wait."""
+        waited = False
+        while not self.try_take():
+            waited = True
+            time.sleep(max(self.wait_time(), 0.05))
+        return waited
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SheetsScheduler:
+    def __init__(self, reads_per_minute=READS_PER_MINUTE, writes_per_minute=WRITES_PER_MINUTE, fresh_seconds=FRESH_SECONDS):
+        self.reads = TokenBucket(reads_per_minute)
+        self.writes = TokenBucket(writes_per_minute)
+        self.fresh_seconds = fresh_seconds
+        self.counters = Counter()
+        self._cache = {}  # key -> (result, fetched at)
+        self._inflight = {}  # key -> _Call
+        self._revalidating = set()
+        self._writes_seen = Counter()  # scope -> writes so far, so a read that overlapped a write isn't cached
+        self._recent = deque()  # (time, "read" | "write") of calls made in the last minute
+        self._write_listeners = []  # callback(scope) after each write
+        self._lock = threading.RLock()
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _record(self, kind):
+        now = time.time()
+        with self._lock:
+            self.counters[f"{kind}s"] += 1
+            self._recent.append((now, kind))
+            while self._recent and self._recent[0][0] < now - 60:
+                self._recent.popleft()
+
+    def _store(self, key, result, writes_seen):
+        with self._lock:
+            if self._writes_seen[key[0]] != writes_seen:
+                return
+            self._cache[key] = (result, time.monotonic())
+            if len(self._cache) > MAX_CACHED_READS:
+                oldest = min(self._cache, key=lambda k: self._cache[k][1])
+                del self._cache[oldest]
+
+    # --- Reads ---
+    def read(self, key, fetch):
+        """Runs `fetch` under the read budget. Reads with the same `key` are coalesced and cached; key=None opts out."""
+        if key is None:
+            if self.reads.take():
+                self._count("throttled")
+            self._record("read")
+            return fetch()
+
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and time.monotonic() - cached[1] < self.fresh_seconds:
+                self._count("cache_hits")
+                return copy.deepcopy(cached[0])
+            writes_seen = self._writes_seen[key[0]]
+            call = self._inflight.get(key)
+            owner = call is None
+            if owner:
+                call = self._inflight[key] = _Call()
+            else:
+                self._count("coalesced")
+
+        if not owner:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            if not self.reads.try_take():
+                self._count("throttled")
+                if cached is not None:
+                    return self._serve_stale(key, fetch, cached)
+                self.reads.take()
+            self._record("read")
+            try:
+                call.result = fetch()
+            except Exception as e:
+                if api_status(e) == 429 and cached is not None:
+                    self._count("throttled")
+                    return self._serve_stale(key, fetch, cached)
+                call.error = e
+                raise
+            self._store(key, call.result, writes_seen)
+            return copy.deepcopy(call.result)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            if call.result is None and call.error is None and cached is not None:
+                call.result = cached[0]
+            call.done.set()
+
+    def _serve_stale(self, key, fetch, cached):
+        self._count("stale_served")
+        with self._lock:
+            start = key not in self._revalidating
+            self._revalidating.add(key)
+        if start:
+            threading.Thread(target=self._revalidate, args=(key, fetch), daemon=True).start()
+        return copy.deepcopy(cached[0])
+
+    def _revalidate(self, key, fetch):
+        try:
+            self.reads.take()
+            writes_seen = self._writes_seen[key[0]]
+            self._record("read")
+            self._store(key, fetch(), writes_seen)
+        except Exception:
+            pass  # keep serving the stale value; the next read tries again
+        finally:
+            with self._lock:
+                self._revalidating.discard(key)
+
+    # --- Writes ---
+    def write(self, scope, apply):
+        """Runs `apply` under the write budget, waiting for a token if needed, and drops cached reads for `scope`."""
+        if self.writes.take():
+            self._count("throttled")
+        self._record("write")
+        try:
+            return apply()
+        finally:
+            self.invalidate(scope)
+
+    def invalidate(self, scope):
+        with self._lock:
+            self._writes_seen[scope] += 1
+            for key in [k for k in self._cache if k[0] == scope]:
+                del self._cache[key]
+            listeners = list(self._write_listeners)
+        for callback in listeners:
+            callback(scope)
+
+    def subscribe(self, callback):
+        """Calls callback(scope) whenever a write to `scope` drops its cached reads."""
+        with self._lock:
+            self._write_listeners.append(callback)
+
+    # --- Accounting ---
+    def usage(self):
+        """Reads and writes made in the last minute."""
+        now = time.time()
+        with self._lock:
+            recent = [kind for t, kind in self._recent if t >= now - 60]
+        return {"read": recent.count("read"), "write": recent.count("write")}
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+        made = counters.get("reads", 0) + counters.get("writes", 0)
+        saved = counters.get("cache_hits", 0) + counters.get("coalesced", 0) + counters.get("stale_served", 0)
+        return {"calls made": made, "calls saved": saved, "throttles hit": counters.get("throttled", 0), **counters}
+
+
+class ScheduledWorksheet:
+    """Wraps a worksheet so its reads and writes go through the scheduler; everything else passes through."""
+
+    def __init__(self, worksheet, scheduler, scope):
+        self._worksheet = worksheet
+        self._scheduler = scheduler
+        self._scope = scope
+
+    def __getattr__(self, name):
+        attr = getattr(self._worksheet, name)
+        if name in READ_METHODS:
+            def read(*args, **kwargs):
+                key = (self._scope, name, repr(args), repr(sorted(kwargs.items())))
+                return self._scheduler.read(key, lambda: attr(*args, **kwargs))
+            return read
+        if name in WRITE_METHODS:
+            def write(*args, **kwargs):
+                return self._scheduler.write(self._scope, lambda: attr(*args, **kwargs))
+            return write
+        return attr
+
+    def fresh(self, name, *args, **kwargs):
+        """Calls read method `name` past the cache, for checks made right before a write."""
+        attr = getattr(self._worksheet, name)
+        return self._scheduler.read(None, lambda: attr(*args, **kwargs))
+
+    def spreadsheet_batch_update(self, body):
+        """Sends a spreadsheets.batchUpdate (structural edits to this worksheet) under the write budget."""
+        return self._scheduler.write(self._scope, lambda: self._worksheet.spreadsheet.batch_update(body))
+
+
+def read_fresh(ws, name, *args, **kwargs):
+    """ws.<name>(...) straight from Sheets, whether or not `ws` goes through a scheduler."""
+    if isinstance(ws, ScheduledWorksheet):
+        return ws.fresh(name, *args, **kwargs)
+    return getattr(ws, name)(*args, **kwargs)
+
+
+def show_api_usage(scheduler):
+    """Sidebar panel with the scheduler's counters."""
+    stats = scheduler.stats()
+    usage = scheduler.usage()
+    with st.sidebar.expander("📶 Sheets API usage"):
+        st.caption(f"Last minute: {usage['read']} reads, {usage['write']} writes")
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Calls made", stats["calls made"])
+        col2.metric("Calls saved", stats["calls saved"])
+        col3.metric("Throttled", stats["throttles hit"])
@@ -0,0 +1,137 @@
+"""Recipes: named, weighted lists of FoodDatabase items.
+
+Recipes live in a "Recipes" worksheet with one row per ingredient. Per-serving
+macros are computed through the MacroEngine and cached together with a
+fingerprint of the ingredient rows they were computed from, so a recipe is only
+recomputed when one of its ingredients (or the recipe itself) changes.
+
+Saving goes through the write queue as a changeset (see changesets.py). Rows of
+unchanged recipes stay where they are. An edited recipe's rows are deleted and
+its new ones appended.
+"""
+import hashlib
+import threading
+
+import numpy as np
+import streamlit as st
+
+from changesets import changeset, row_checksum
+
+RECIPE_COLUMNS = ["Recipe", "Servings", "Food", "Quantity"]
+
+
+def _number(value, default=0.0):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class Recipe:
+    def __init__(self, name, servings=1.0, ingredients=None):
+        self.name = name
+        self.servings = servings if servings > 0 else 1.0
+        self.ingredients = list(ingredients or [])  # [(food, quantity for the whole recipe)]
+
+    @property
+    def foods(self):
+        return [food for food, _ in self.ingredients]
+
+    @property
+    def quantities(self):
+        return [quantity for _, quantity in self.ingredients]
+
+    def rows(self):
+        """Worksheet rows for this recipe, in RECIPE_COLUMNS order."""
+        return [[self.name, self.servings, food, quantity] for food, quantity in self.ingredients]
+
+
+def parse_recipes(records):
+    """Groups Recipes worksheet records into {name: Recipe}, keeping ingredient order."""
+    recipes = {}
+    for row in records:
+        name = str(row.get("Recipe", "")).strip()
+        food = str(row.get("Food", "")).strip()
+        if not name or not food:
+            continue
+        if name not in recipes:
+            recipes[name] = Recipe(name, _number(row.get("Servings"), 1.0))
+        recipes[name].ingredients.append((food, _number(row.get("Quantity"))))
+    return recipes
+
+
+def recipe_changeset(values, recipes):
+    """Changes turning the Recipes sheet (values, header first) into `recipes` ({name: Recipe}).
+
+    Returns the changeset and the sheet's values once it is applied.
+    """
+    original = dict(enumerate(values[1:], start=2))
+    numbers = {}
+    for number, row in original.items():
+        numbers.setdefault(str(row[0]).strip() if row else "", []).append(number)
+    rows = []
+    for recipe in recipes.values():
+        old, new = numbers.get(recipe.name, []), recipe.rows()
+        if [row_checksum(original[n]) for n in old] == [row_checksum(row) for row in new]:
+            rows += [(n, original[n]) for n in old]
+        else:
+            rows += [(None, row) for row in new]
+    kept = sorted(number for number, _ in rows if number is not None)
+    after = values[:1] + [original[number] for number in kept] + [row for number, row in rows if number is None]
+    return changeset(original, rows), after
+
+
+def missing_foods(recipe, engine):
+    return [food for food in recipe.foods if food not in engine]
+
+
+class RecipeMacroCache:
+    """Per-serving macros per recipe, recomputed only when the fingerprint changes."""
+
+    def __init__(self):
+        self._entries = {}  # recipe name -> (fingerprint, per-serving macro array)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(recipe, engine):
+        # Covers the recipe definition and the database rows of every ingredient
+        parts = [repr((recipe.servings, recipe.ingredients)), repr(engine.nutrients)]
+        for food in recipe.foods:
+            i = engine.positions[food]
+            parts.append(repr((food, engine.units[i], engine.matrix[i].tolist())))
+        return hashlib.md5("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    def per_serving(self, recipe, engine):
+        """Macros of one serving as an array in engine.nutrients order."""
+        key = self.fingerprint(recipe, engine)
+        with self._lock:
+            entry = self._entries.get(recipe.name)
+            if entry is None or entry[0] != key:
+                totals = engine.compute(recipe.foods, recipe.quantities).sum(axis=0)
+                entry = (key, totals / recipe.servings)
+                self._entries[recipe.name] = entry
+            return entry[1]
+
+    def discard(self, name):
+        with self._lock:
+            self._entries.pop(name, None)
+
+
+@st.cache_resource(show_spinner=False)
+def get_recipe_cache():
+    return RecipeMacroCache()
+
+
+def recipe_log_entries(recipe, servings, date, engine, cache, per_ingredient=False):
+    """FoodLog entries for `servings` of a recipe.
+
+    One aggregated row named after the recipe, or one row per ingredient with the
+    quantities scaled to the number of servings.
+    """
+    if per_ingredient:
+        factor = servings / recipe.servings
+        quantities = (np.asarray(recipe.quantities, dtype=float) * factor).tolist()
+        return engine.log_entries(date, recipe.foods, quantities)
+    entry = {"Date": date, "Food": recipe.name, "Quantity": servings, "Unit": "serving"}
+    entry.update(zip(engine.nutrients, (cache.per_serving(recipe, engine) * servings).tolist()))
+    return [entry]
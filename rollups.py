@@ -0,0 +1,133 @@
+"""Materialized macro totals per day, week, month, quarter and year.
+
+The rollup follows the FoodLog mirror's change journal. Added rows are added to
+their periods and removed rows (deletes, and the old side of edits) are
+subtracted, so the Dashboard and Analytics pages never regroup the whole log.
+"""
+import threading
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from daily_log import MACROS, parse_log_dates
+
+LEVELS = ["Day", "Week", "Month", "Quarter", "Year"]
+
+
+def period_start(day, level):
+    if level == "Week":
+        return day - timedelta(days=day.weekday())
+    if level == "Month":
+        return day.replace(day=1)
+    if level == "Quarter":
+        return day.replace(month=((day.month - 1) // 3) * 3 + 1, day=1)
+    if level == "Year":
+        return day.replace(month=1, day=1)
+    return day
+
+
+def macro_values(rows):
+    """The macro columns of `rows` as floats, deriving Calories when the log has none."""
+    values = rows.reindex(columns=MACROS).apply(pd.to_numeric, errors="coerce").fillna(0.0)
+    if "Calories" not in rows.columns:
+        values["Calories"] = values["Protein"] * 4 + values["Carbs"] * 4 + values["Fats"] * 9
+    return values
+
+
+class MacroRollup:
+    def __init__(self):
+        self.version = None
+        self._sums = {}  # level -> {period start: macro array}
+        self._rows = {}  # level -> {period start: number of log rows}
+        self._days = {}  # level -> {period start: number of days with entries}
+        self._tables = {}
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._sums = {level: {} for level in LEVELS}
+        self._rows = {level: {} for level in LEVELS}
+        self._days = {level: {} for level in LEVELS}
+        self._tables = {}
+
+    def update(self, mirror):
+        """Applies the mirror's journal, or rebuilds if the rollup is too far behind."""
+        with self._lock:
+            frame, version, changes = mirror.catch_up(self.version)
+            if changes is None:
+                self._reset()
+                self._apply(frame, 1)
+            else:
+                for kind, rows in changes:
+                    self._apply(rows, 1 if kind == "add" else -1)
+            self.version = version
+
+    def _apply(self, rows, sign):
+        if rows.empty:
+            return
+        days = parse_log_dates(rows["Date"])
+        values = macro_values(rows)
+        daily = values.groupby(days).sum()
+        counts = days.groupby(days).size()
+        for day, sums in zip(daily.index, daily.to_numpy()):
+            count = sign * int(counts[day])
+            # Periods also track how many distinct days they have entries on
+            before = self._rows["Day"].get(day, 0)
+            day_delta = int(before + count > 0) - int(before > 0)
+            for level in LEVELS:
+                key = period_start(day, level)
+                if key not in self._rows[level]:
+                    self._sums[level][key] = np.zeros(len(MACROS))
+                    self._rows[level][key] = 0
+                    self._days[level][key] = 0
+                self._sums[level][key] += sign * sums
+                self._rows[level][key] += count
+                self._days[level][key] += day_delta
+                if self._rows[level][key] <= 0:
+                    self._drop(level, key)
+        self._tables = {}
+
+    def _drop(self, level, key):
+        self._sums[level].pop(key, None)
+        self._rows[level].pop(key, None)
+        self._days[level].pop(key, None)
+
+    # --- Queries ---
+    def table(self, level="Day", start=None, end=None):
+        """Macro totals per period, oldest first, as a frame with Date (period start), the
+        macros and Days (days with entries). Periods overlapping start..end are included.
+        Do not modify the result; unfiltered tables are shared."""
+        with self._lock:
+            if level not in self._tables:
+                keys = sorted(self._sums[level])
+                table = pd.DataFrame(
+                    [self._sums[level][k] for k in keys] or np.zeros((0, len(MACROS))),
+                    columns=MACROS,
+                )
+                table.insert(0, "Date", pd.to_datetime(pd.Series(keys, dtype=object)))
+                table["Days"] = [self._days[level][k] for k in keys]
+                self._tables[level] = table
+            table = self._tables[level]
+        if start is not None:
+            table = table[table["Date"] >= pd.Timestamp(period_start(start, level))]
+        if end is not None:
+            table = table[table["Date"] <= pd.Timestamp(end)]
+        return table
+
+    def first_day(self):
+        with self._lock:
+            return min(self._sums["Day"]) if self._sums["Day"] else None
+
+
+@st.cache_resource(show_spinner=False)
+def _macro_rollup():
+    return MacroRollup()
+
+
+def get_macro_rollup(mirror):
+    """Returns the shared rollup, caught up with the FoodLog mirror."""
+    rollup = _macro_rollup()
+    rollup.update(mirror)
+    return rollup
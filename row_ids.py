@@ -0,0 +1,235 @@
+"""Stable row IDs for the FoodLog and FoodDatabase worksheets.
+
+Every row carries a short random ID in an ID column. Deletes name rows by ID and
+the write queue turns the IDs into sheet rows when it gets to them, so a table
+that went stale on the page can't make it delete the wrong row.
+
+RowIndex maps IDs to sheet rows without reading the sheet. It numbers rows in the
+order they were added, deleted ones included, and keeps the numbers of deleted
+rows sorted. A row's position is its number minus the deleted rows before it.
+Appends and deletes are then O(log n) bookkeeping, and deleting any set of rows
+is one API call. The index is built from the ID column the first time it is
+needed, and again whenever someone else may have changed the sheet.
+
+Rows someone adds or removes directly in Sheets don't always trigger a rebuild
+(an append leaves the log mirror's tail check passing). So before deleting, the
+queue reads the ID cells of the resolved rows, in one batch_get, and checks that
+each row really holds its ID; see resolve(). If one doesn't, the index is
+rebuilt from the ID column first.
+
+Rows written before IDs existed get one from assign_row_ids(), which queues a
+changeset filling in the ID column.
+"""
+import bisect
+import threading
+import uuid
+
+from changesets import row_checksum
+from quota import read_fresh
+from sheets import column_letter
+
+ID_COLUMN = "ID"
+
+
+def new_row_id():
+    return uuid.uuid4().hex[:12]
+
+
+def id_position(columns):
+    """0-based position of the ID column in `columns`, or None."""
+    columns = list(columns)
+    return columns.index(ID_COLUMN) if ID_COLUMN in columns else None
+
+
+def with_new_ids(rows, position):
+    """Editor rows ([(sheet row or None, values)]) with an ID given to new rows that have none."""
+    if position is None:
+        return rows
+    result = []
+    for number, values in rows:
+        if number is None and not str(values[position]).strip():
+            values = list(values)
+            values[position] = new_row_id()
+        result.append((number, values))
+    return result
+
+
+def new_row(entry, header):
+    """Values of the `entry` dict in `header` order with a new ID, after the header if it has no ID column yet."""
+    values = [entry.get(col, "") for col in header if col != ID_COLUMN]
+    position = id_position(header)
+    values.insert(len(header) if position is None else position, new_row_id())
+    return values
+
+
+def sheet_values(records):
+    """get_all_records() output turned back into values (header first), for id_changeset()."""
+    if not records:
+        return []
+    header = list(records[0])
+    return [header] + [[record.get(col, "") for col in header] for record in records]
+
+
+def _has_values(row):
+    return any(str(value).strip() for value in row)
+
+
+def id_changeset(values):
+    """Changes giving a sheet (values, header first) an ID column and each non-blank row without an ID a new one."""
+    if not values:
+        return {"rows": 0, "expect": {}, "updates": [], "deletes": [], "appends": []}
+    header = values[0]
+    col = id_position(header)
+    updates = []
+    if col is None:
+        col = len(header)
+        updates.append([1, col + 1, ID_COLUMN])
+    for number, row in enumerate(values[1:], start=2):
+        if (col >= len(row) or not str(row[col]).strip()) and _has_values(row):
+            updates.append([number, col + 1, new_row_id()])
+    return {
+        "rows": len(values),
+        "expect": {str(number): row_checksum(values[number - 1]) for number, _, _ in updates},
+        "updates": updates,
+        "deletes": [],
+        "appends": [],
+        "assigns_ids": True,
+    }
+
+
+def assign_row_ids(queue, name, values):
+    """Queues IDs for the rows of worksheet `name` that lack one, unless that's already on its way."""
+    changes = id_changeset(values)
+    if not changes["updates"]:
+        return False
+    if any(op["sheet"] == name and op["op"] == "apply_changes" and op["args"][0].get("assigns_ids")
+           for op in queue.pending()):
+        return False
+    queue.worksheet(name).apply_changes(changes)
+    return True
+
+
+class RowIndex:
+    def __init__(self):
+        self.ids = None  # ID of every row ever added, by sequence number ("" for rows without one)
+        self.column = None  # 1-based column holding the IDs
+        self._seq = {}  # ID -> sequence number
+        self._deleted = []  # sorted sequence numbers of deleted rows
+        self._lock = threading.RLock()
+
+    def build(self, ids, column):
+        with self._lock:
+            self.ids = []
+            self.column = column
+            self._seq = {}
+            self._deleted = []
+            self._add(ids)
+
+    def ensure(self, ws):
+        """Builds the index from the sheet's header and ID column if it isn't current."""
+        with self._lock:
+            if self.ids is not None:
+                return
+            column = id_position(read_fresh(ws, "row_values", 1))
+            if column is None:
+                # No IDs yet; rows still count, for deleting the last one
+                self.build([""] * max(len(read_fresh(ws, "col_values", 1)) - 1, 0), None)
+                return
+            ids = read_fresh(ws, "col_values", column + 1)[1:]
+            # Trailing rows without an ID aren't in the column read
+            count = max(len(read_fresh(ws, "col_values", 1)) - 1, len(ids))
+            self.build(ids + [""] * (count - len(ids)), column + 1)
+
+    def invalidate(self):
+        with self._lock:
+            self.ids = None
+
+    def _add(self, ids):
+        for row_id in ids:
+            if row_id:
+                self._seq[row_id] = len(self.ids)
+            self.ids.append(row_id)
+
+    # --- Updates, as the write queue applies them ---
+    def appended(self, rows):
+        with self._lock:
+            if self.ids is None:
+                return
+            col = self.column
+            self._add([str(row[col - 1]) if col and len(row) >= col else "" for row in rows])
+
+    def _delete_seq(self, seq):
+        bisect.insort(self._deleted, seq)
+        self._seq.pop(self.ids[seq], None)
+        if len(self._deleted) > len(self.ids) // 2:
+            self._compact()
+
+    def removed(self, ids):
+        with self._lock:
+            for row_id in ids:
+                seq = self._seq.get(row_id)
+                if seq is not None:
+                    self._delete_seq(seq)
+
+    def removed_last(self):
+        with self._lock:
+            seq = self._last_seq()
+            if seq is not None:
+                self._delete_seq(seq)
+
+    def _compact(self):
+        deleted = set(self._deleted)
+        ids = [row_id for seq, row_id in enumerate(self.ids) if seq not in deleted]
+        self.build(ids, self.column)
+
+    # --- Lookups ---
+    def _last_seq(self):
+        seq, i = len(self.ids) - 1, len(self._deleted) - 1
+        while i >= 0 and self._deleted[i] == seq:
+            seq, i = seq - 1, i - 1
+        return seq if seq >= 0 else None
+
+    def row(self, row_id):
+        """1-based sheet row of `row_id` (row 1 is the header), or None."""
+        with self._lock:
+            seq = self._seq.get(row_id) if self.ids is not None else None
+            if seq is None:
+                return None
+            return seq - bisect.bisect_left(self._deleted, seq) + 2
+
+    def __len__(self):
+        with self._lock:
+            return len(self.ids) - len(self._deleted) if self.ids is not None else 0
+
+    # --- Checked against the sheet, right before a delete ---
+    def _rows(self, ids):
+        return {row_id: row for row_id, row in ((i, self.row(i)) for i in ids) if row is not None}
+
+    def _holds(self, ws, rows):
+        """Whether each sheet row in `rows` ({ID: row}) still has its ID, from one read of just those cells."""
+        letter = column_letter(self.column)
+        cells = read_fresh(ws, "batch_get", [f"{letter}{row}" for row in rows.values()])
+        return all(str(cell[0][0] if cell and cell[0] else "") == row_id for row_id, cell in zip(rows, cells))
+
+    def resolve(self, ws, ids):
+        """Sheet rows holding `ids` now, checked against the sheet (rebuilding the index if it has drifted)."""
+        with self._lock:
+            self.ensure(ws)
+            if self.column is None or not ids:
+                return []
+            rows = self._rows(ids)
+            if len(rows) < len(set(ids)) or not self._holds(ws, rows):
+                # Rows were added or removed in Sheets; this rebuild reads the column again, so rows match it
+                self.invalidate()
+                self.ensure(ws)
+                rows = self._rows(ids)
+            return sorted(rows.values())
+
+    def last_row(self, ws):
+        """Sheet row of the last data row now, or None; the index is rebuilt if the sheet's row count differs."""
+        with self._lock:
+            self.ensure(ws)
+            if len(self) != max(len(read_fresh(ws, "col_values", 1)) - 1, 0):
+                self.invalidate()
+                self.ensure(ws)
+            return len(self) + 1 if len(self) else None
@@ -0,0 +1,147 @@
+"""Column types for the log and food frames, enforced once when rows come in.
+
+get_all_records() and get_all_values() hand back object columns. Food, Unit and
+Date repeat on almost every row, so they are stored as categoricals. Each
+distinct value is then held once and each row keeps a small integer code.
+Quantities and macros are float32.
+Anything that isn't a number becomes NaN at ingest, so no page has to coerce
+again.
+
+Dates have one canonical text form, DATE_FORMAT, and are normalized to it at
+ingest whatever format the sheet holds. For filtering they are ordinal day
+numbers: day_numbers() maps each row's category to its ordinal, parsed once per
+distinct string. Date ranges are then integer comparisons. Older rows are
+rewritten to the canonical form in the sheet by changesets.date_changeset().
+"""
+import functools
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+CATEGORY_COLUMNS = ["Date", "Food", "Unit"]
+NUMERIC_COLUMNS = ["Quantity", "Protein", "Carbs", "Fats", "Calories"]
+FOOD_CATEGORY_COLUMNS = ["Unit"]
+
+
+# The format the app writes; the others have turned up in older rows and imports
+DATE_FORMAT = "%d/%m/%Y"
+DATE_FORMATS = [DATE_FORMAT, "%Y-%m-%d", "%d/%m/%y"]
+
+# Day number of a blank or unreadable date (real ordinals start at 1)
+NO_DAY = 0
+
+
+def _strict_day(text):
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            pass
+    return None
+
+
+@functools.lru_cache(maxsize=65536)
+def day_ordinal(text):
+    """Ordinal day number of a date string, or NO_DAY. Each distinct string is parsed once per process."""
+    text = str(text).strip()
+    if not text:
+        return NO_DAY
+    day = _strict_day(text)
+    if day is None:
+        parsed = pd.to_datetime(text, dayfirst=True, errors="coerce")
+        day = None if pd.isna(parsed) else parsed.date()
+    return day.toordinal() if day is not None else NO_DAY
+
+
+def parse_day(text):
+    """datetime.date of a date string, or None."""
+    ordinal = day_ordinal(text)
+    return date.fromordinal(ordinal) if ordinal != NO_DAY else None
+
+
+def format_day(day):
+    return day.strftime(DATE_FORMAT)
+
+
+def canonical_date(text):
+    """`text` in DATE_FORMAT, or unchanged if it isn't a date."""
+    day = parse_day(text)
+    return format_day(day) if day is not None else text
+
+
+def canonical_date_strict(text):
+    """Like canonical_date() but only for the known formats, for cells that may not be dates at all."""
+    day = _strict_day(text)
+    return format_day(day) if day is not None else text
+
+
+def day_numbers(dates):
+    """Ordinal day numbers (int32, NO_DAY where missing) of a Date column."""
+    if isinstance(dates.dtype, pd.CategoricalDtype):
+        ordinals = np.array([day_ordinal(value) for value in dates.cat.categories] + [NO_DAY], dtype=np.int32)
+        return ordinals[dates.cat.codes.to_numpy()]
+    return np.fromiter((day_ordinal(value) if isinstance(value, str) else NO_DAY for value in dates),
+                       dtype=np.int32, count=len(dates))
+
+
+def _canonical_dates(dates):
+    """A categorical Date column with its categories rewritten to DATE_FORMAT (merging spellings of one day)."""
+    canonical = [canonical_date(value) for value in dates.cat.categories]
+    categories = pd.Index(canonical).unique()
+    remap = np.append(categories.get_indexer(canonical), -1)
+    return pd.Series(pd.Categorical.from_codes(remap[dates.cat.codes.to_numpy()], categories), index=dates.index)
+
+
+def _categorical(values):
+    values = values.astype(object).where(values.notna(), "")
+    return values.map(str).astype("category")
+
+
+def coerce_frame(frame, categories=CATEGORY_COLUMNS, numeric=NUMERIC_COLUMNS):
+    """`frame` with the schema's types; columns it doesn't know are left alone."""
+    frame = frame.copy(deep=False)
+    for col in categories:
+        if col in frame.columns and not isinstance(frame[col].dtype, pd.CategoricalDtype):
+            frame[col] = _categorical(frame[col])
+            if col == "Date":
+                frame[col] = _canonical_dates(frame[col])
+    for col in numeric:
+        if col in frame.columns and frame[col].dtype != np.float32:
+            frame[col] = pd.to_numeric(frame[col], errors="coerce").astype(np.float32)
+    return frame
+
+
+def coerce_log(frame):
+    return coerce_frame(frame)
+
+
+def coerce_food(frame):
+    """Food database frame for display and lookups. Food names stay text so editors can type new ones."""
+    return coerce_frame(frame, FOOD_CATEGORY_COLUMNS)
+
+
+def concat_log(old, new):
+    """Appends typed `new` rows to typed `old` ones, keeping the categoricals (plain concat turns them to object)."""
+    old, new = old.copy(deep=False), new.copy(deep=False)
+    for col in CATEGORY_COLUMNS:
+        if col in old.columns and col in new.columns:
+            categories = old[col].cat.categories.union(new[col].cat.categories, sort=False)
+            old[col] = old[col].cat.set_categories(categories)
+            new[col] = new[col].cat.set_categories(categories)
+    return pd.concat([old, new], ignore_index=True)
+
+
+def sheet_value(value):
+    """A cell as it should be written back: NaN -> "", float32 -> its shortest decimal, NumPy scalars -> Python."""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return ""
+    if isinstance(value, np.floating):
+        return "" if np.isnan(value) else float(str(value))
+    return value.item() if hasattr(value, "item") else value
+
+
+def sheet_records(frame):
+    """Rows of a typed frame as dicts of values ready to write (to_dict() would widen float32 to noisy floats)."""
+    columns = [[sheet_value(v) for v in frame[col].to_numpy()] for col in frame.columns]
+    return [dict(zip(frame.columns, row)) for row in zip(*columns)]
@@ -0,0 +1,193 @@
+"""Shared Google Sheets connection for every page.
+
+The client, spreadsheet and worksheet handles are created once per process and
+reused across reruns and sessions, so a widget click no longer pays for OAuth
+and metadata round trips. Set SHEETS_BACKEND=fake to run against the in-memory
+backend in fake_sheets.py instead of Google, or SHEETS_BACKEND=csv / sqlite to
+keep the data in local files (see local_sheets.py).
+"""
+import os
+import re
+import threading
+from datetime import datetime, timedelta
+
+import streamlit as st
+
+from quota import ScheduledWorksheet, SheetsScheduler
+
+SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+SHEET_URL = "https://docs.google.com/spreadsheets/d/1mVbGbsThxK9L1mC2-2n_qlC2S0IoPM7zxQYT8DVBiAA/edit#gid=1560030794"
+
+# Refresh the access token this long before it actually expires
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+
+
+def column_letter(number):
+    """1 -> 'A', 27 -> 'AA', for building A1 ranges."""
+    letters = ""
+    while number > 0:
+        number, rem = divmod(number - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def numericise(value):
+    """Same conversion gspread applies in get_all_records."""
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            try:
+                return float(value)
+            except ValueError:
+                return value
+    return value
+
+
+def _col_number(letters):
+    number = 0
+    for ch in letters.upper():
+        number = number * 26 + ord(ch) - 64
+    return number
+
+
+def parse_a1_range(range_name):
+    """Parses 'A2:H', 'A2:H10', 'A:A' or '2:5' into 1-based (row0, col0, row1, col1); None means open-ended."""
+    range_name = range_name.split("!")[-1]
+    parts = range_name.split(":")
+    bounds = []
+    for part in parts:
+        match = re.fullmatch(r"([A-Za-z]*)(\d*)", part)
+        letters, digits = match.groups()
+        bounds.append((int(digits) if digits else None, _col_number(letters) if letters else None))
+    if len(bounds) == 1:
+        bounds.append(bounds[0])
+    (row0, col0), (row1, col1) = bounds
+    return row0 or 1, col0 or 1, row1, col1
+
+
+def update_args(args, kwargs):
+    """(values, range_name) of a worksheet update() call, in either gspread argument order."""
+    values = kwargs.get("values")
+    range_name = kwargs.get("range_name")
+    for arg in args:
+        if isinstance(arg, str):
+            range_name = arg
+        else:
+            values = arg
+    return values, range_name or "A1"
+
+
+def spreadsheet_key(url):
+    """Extracts the spreadsheet key, so URLs that differ only in gid share one handle."""
+    match = re.search(r"/d/([\w-]+)", url)
+    return match.group(1) if match else url
+
+
+class SheetsPool:
+    """Memoizes spreadsheet and worksheet handles on top of one authorized client.
+
+    Worksheet calls go through the pool's SheetsScheduler (see quota.py).
+    """
+
+    def __init__(self, client, creds=None, scheduler=None):
+        self.client = client
+        self.creds = creds
+        self.scheduler = scheduler or SheetsScheduler()
+        self._spreadsheets = {}
+        self._worksheets = {}
+        self._lock = threading.RLock()
+
+    def refresh_token(self):
+        if self.creds is None:
+            return
+        expiry = getattr(self.creds, "expiry", None)
+        expiring = expiry is not None and expiry - TOKEN_REFRESH_MARGIN <= datetime.utcnow()
+        if self.creds.valid and not expiring:
+            return
+        from google.auth.transport.requests import Request
+
+        with self._lock:
+            self.creds.refresh(Request())
+
+    def spreadsheet(self, url=SHEET_URL):
+        self.refresh_token()
+        key = spreadsheet_key(url)
+        with self._lock:
+            if key not in self._spreadsheets:
+                self._spreadsheets[key] = self.scheduler.read(None, lambda: self.client.open_by_key(key))
+            return self._spreadsheets[key]
+
+    def worksheet(self, name, url=SHEET_URL):
+        spreadsheet = self.spreadsheet(url)
+        key = (spreadsheet_key(url), name)
+        with self._lock:
+            if key not in self._worksheets:
+                worksheet = self.scheduler.read(None, lambda: spreadsheet.worksheet(name))
+                self._worksheets[key] = ScheduledWorksheet(worksheet, self.scheduler, key)
+            return self._worksheets[key]
+
+    def ensure_worksheet(self, name, header, url=SHEET_URL):
+        """Like worksheet(), but adds the tab with `header` as its first row if it doesn't exist yet."""
+        spreadsheet = self.spreadsheet(url)
+        key = (spreadsheet_key(url), name)
+        with self._lock:
+            if key not in self._worksheets:
+                existing = {ws.title: ws for ws in self.scheduler.read(None, spreadsheet.worksheets)}
+                if name not in existing:
+                    existing[name] = self.scheduler.write(
+                        key, lambda: spreadsheet.add_worksheet(title=name, rows=1000, cols=len(header))
+                    )
+                    self.scheduler.write(key, lambda: existing[name].append_row(header))
+                self._worksheets[key] = ScheduledWorksheet(existing[name], self.scheduler, key)
+            return self._worksheets[key]
+
+    def reset(self):
+        with self._lock:
+            self._spreadsheets.clear()
+            self._worksheets.clear()
+
+
+def sheets_backend():
+    """'google' (default), 'fake', 'csv' or 'sqlite', from the SHEETS_BACKEND environment variable."""
+    return os.environ.get("SHEETS_BACKEND", "").lower() or "google"
+
+
+def using_fake_backend():
+    return sheets_backend() == "fake"
+
+
+@st.cache_resource(show_spinner=False)
+def get_pool():
+    backend = sheets_backend()
+    if backend == "fake":
+        from fake_sheets import FakeClient
+
+        return SheetsPool(FakeClient())
+    if backend == "csv":
+        from local_sheets import CsvClient
+
+        # Local files have no API quota
+        return SheetsPool(CsvClient(), scheduler=SheetsScheduler(None, None))
+    if backend == "sqlite":
+        from local_sheets import SqliteClient
+
+        return SheetsPool(SqliteClient(), scheduler=SheetsScheduler(None, None))
+
+    import gspread
+    from google.oauth2.service_account import Credentials
+
+    creds = Credentials.from_service_account_info(st.secrets["service_account"], scopes=SCOPE)
+    return SheetsPool(gspread.authorize(creds), creds)
+
+
+def get_spreadsheet(url=SHEET_URL):
+    return get_pool().spreadsheet(url)
+
+
+def get_worksheet(name, url=SHEET_URL):
+    return get_pool().worksheet(name, url)
+
+
+def get_or_create_worksheet(name, header, url=SHEET_URL):
+    return get_pool().ensure_worksheet(name, header, url)
@@ -0,0 +1,159 @@
+"""One shared, read-only copy of the FoodLog per data version, plus memory accounting.
+
+Pages used to park their own copies of the log in session state, so memory grew
+with the size of the history times the number of copies times the number of
+users. Now every page and session reads the same snapshot. Callers get shallow
+copies (copy(deep=False)): adding, replacing or dropping columns only touches
+the caller's copy, so the shared frame stays intact as long as nobody writes
+into its cells in place. With pandas 3 (or copy-on-write switched on) even that
+is safe. Frames derived from the snapshot
+(parsed dates, the latest entries, ...) are built once per version. They are
+shared too and evicted least-recently-used once they pass MAX_VIEW_BYTES.
+
+show_memory_usage() puts a sidebar panel up with the bytes each of these holds,
+counted only while the panel is open.
+"""
+import sys
+import threading
+import weakref
+from collections import Counter, OrderedDict
+
+import pandas as pd
+import streamlit as st
+
+# Derived frames kept per snapshot before the least recently used are dropped
+MAX_VIEW_BYTES = 64 * 1024 * 1024
+
+
+def value_bytes(value, shared=(), _seen=None):
+    """Approximate bytes held by `value`, not counting the objects whose ids are in `shared`."""
+    seen = _seen if _seen is not None else set()
+    if id(value) in seen or id(value) in shared:
+        return 0
+    seen.add(id(value))
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(value_bytes(k, shared, seen) + value_bytes(v, shared, seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(value_bytes(item, shared, seen) for item in value)
+    elif hasattr(value, "__dict__"):
+        size += value_bytes(vars(value), shared, seen)
+    return size
+
+
+class LogSnapshot:
+    def __init__(self, max_view_bytes=MAX_VIEW_BYTES):
+        self.frame = None
+        self.version = None
+        self.nbytes = 0
+        self.max_view_bytes = max_view_bytes
+        self.counters = Counter()
+        self._views = OrderedDict()  # name -> (frame, bytes), least recently used first
+        self._handed_out = weakref.WeakValueDictionary()  # id -> views given to pages, for accounting
+        self._lock = threading.RLock()
+
+    def update(self, mirror):
+        with self._lock:
+            frame, version = mirror.snapshot()
+            if version != self.version or frame is not self.frame:
+                self.frame = frame
+                self.version = version
+                self.nbytes = value_bytes(frame)
+                self._views.clear()
+
+    def read(self):
+        """The log as a shallow copy of the shared frame."""
+        with self._lock:
+            return self._share(self.frame)
+
+    def view(self, name, build):
+        """Derived frame `name`, made by build(log) once per version and shared by every page and session."""
+        with self._lock:
+            if name in self._views:
+                self._views.move_to_end(name)
+                self.counters["hits"] += 1
+                result = self._views[name][0]
+            else:
+                self.counters["builds"] += 1
+                result = build(self.frame.copy(deep=False))
+                self._views[name] = (result, value_bytes(result))
+                self._evict()
+            return self._share(result) if isinstance(result, (pd.DataFrame, pd.Series)) else result
+
+    def _share(self, frame):
+        view = frame.copy(deep=False)
+        self._handed_out[id(view)] = view
+        return view
+
+    def shared_ids(self):
+        """Ids of the snapshot and of the views handed out from it, which sessions don't own."""
+        with self._lock:
+            return {id(self.frame), *(id(f) for f, _ in self._views.values()), *self._handed_out.keys()}
+
+    def _evict(self):
+        # The newest view always stays, even if it alone is over budget
+        while len(self._views) > 1 and sum(size for _, size in self._views.values()) > self.max_view_bytes:
+            self._views.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def usage(self):
+        """{"snapshot": bytes, "views": {name: bytes}}."""
+        with self._lock:
+            return {
+                "snapshot": self.nbytes,
+                "views": {name: size for name, (_, size) in self._views.items()},
+            }
+
+
+@st.cache_resource(show_spinner=False)
+def _log_snapshot():
+    return LogSnapshot()
+
+
+def get_log_snapshot(mirror):
+    """Returns the shared snapshot, caught up with the FoodLog mirror."""
+    snapshot = _log_snapshot()
+    snapshot.update(mirror)
+    return snapshot
+
+
+def _format_bytes(size):
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def show_memory_usage(snapshot):
+    """Sidebar panel with the shared snapshot, its derived views and this session's state keys.
+
+    Sizing session state walks every value, so it only happens while the panel is open.
+    """
+    expander = st.sidebar.expander("🧠 Memory", key="memory_usage_open", on_change="rerun")
+    if not expander.open:
+        return
+    usage = snapshot.usage()
+    # Frames that are (views of) the shared snapshot aren't this session's to count
+    shared = snapshot.shared_ids()
+    session = {key: value_bytes(value, shared) for key, value in st.session_state.items() if key != "memory_usage_open"}
+    with expander:
+        col1, col2 = st.columns(2)
+        col1.metric("Shared log", _format_bytes(usage["snapshot"]))
+        col2.metric("This session", _format_bytes(sum(session.values())))
+        if usage["views"]:
+            st.caption(f"Shared views ({snapshot.counters['hits']} reuses, {snapshot.counters['evictions']} evicted)")
+            st.dataframe(
+                [{"View": name, "Size": _format_bytes(size)} for name, size in reversed(usage["views"].items())],
+                hide_index=True,
+            )
+        st.caption("Session state")
+        st.dataframe(
+            [{"Key": str(key), "Size": _format_bytes(size)} for key, size in sorted(session.items(), key=lambda item: -item[1])],
+            hide_index=True,
+        )
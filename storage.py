@@ -0,0 +1,70 @@
+import csv
+import math
+import os
+
+from row_ids import ID_COLUMN, new_row_id
+
+# Column order of the FoodLog worksheet
+LOG_COLUMNS = ["Date", "Food", "Quantity", "Unit", "Protein", "Carbs", "Fats", "Calories", ID_COLUMN]
+
+
+def _cell(value):
+    # NaN (e.g. a blank cell read back from the mirror) can't be sent to the Sheets API
+    return "" if isinstance(value, float) and math.isnan(value) else value
+
+
+def log_row(entry):
+    """Turns a log entry dict into a FoodLog row in sheet column order, with a new ID."""
+    return [_cell(entry.get(col, "")) for col in LOG_COLUMNS[:-1]] + [new_row_id()]
+
+
+def latest_log_id(log, pending):
+    """ID of the newest FoodLog row: the last queued one, else the last row of the `log` frame. None if it has none."""
+    if pending:
+        row = pending[-1]
+        return str(row[-1]) if len(row) == len(LOG_COLUMNS) and row[-1] else None
+    if ID_COLUMN in log.columns and len(log):
+        return str(log[ID_COLUMN].iloc[-1]).strip() or None
+    return None
+
+
+class LogWriteQueue:
+    """Collects log rows during a rerun and writes them with a single append_rows call."""
+
+    def __init__(self, sheet):
+        self.sheet = sheet
+        self.rows = []
+
+    def add(self, entry):
+        self.rows.append(log_row(entry))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def flush(self):
+        if not self.rows:
+            return 0
+        # Only touches the new rows; the rest of the FoodLog is never rewritten
+        self.sheet.append_rows(self.rows)
+        count = len(self.rows)
+        self.rows = []
+        return count
+
+
+def append_csv(path, entries):
+    """Appends entry dicts to a CSV file, writing the header only if the file is new.
+
+    Columns follow the existing header, so adding a row never rewrites the file.
+    """
+    if os.path.exists(path) and os.path.getsize(path) > 0:
+        with open(path, newline="") as f:
+            header = next(csv.reader(f))
+        new_file = False
+    else:
+        header = list(entries[0]) if entries else []
+        new_file = True
+    with open(path, "a", newline="") as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(header)
+        writer.writerows([[_cell(entry.get(col, "")) for col in header] for entry in entries])
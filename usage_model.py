@@ -0,0 +1,136 @@
+"""What gets logged, how much of it, and at which point of the day.
+
+The FoodLog has no time of day, so the model uses each row's position within its
+day as a stand-in: the first few entries of a day are its start, the next few
+its middle, and so on. Each logged row adds a recency weight (see
+food_search.usage_weight) to its food's score in its slot. It also bumps a count
+of the quantity it was logged with. The top foods of every slot are kept as a
+short sorted table. Logging a food only ever raises that food's score, so the
+table is patched in place and the model never rescans the log. Removed rows are
+rare and trigger a rebuild.
+"""
+import threading
+from collections import Counter
+
+import pandas as pd
+import streamlit as st
+
+from daily_log import parse_log_dates
+from food_search import usage_weight
+
+# Entries per day slot: the 1st-3rd of a day are "Start of day", 4th-6th "Midday", the rest "Later"
+SLOT_SIZE = 3
+SLOTS = ["Start of day", "Midday", "Later"]
+ANY = "Any time"
+
+# Foods kept in each slot's table
+TABLE_SIZE = 12
+
+
+def slot_for(position):
+    """Slot of the entry at 0-based `position` within its day."""
+    return SLOTS[min(position // SLOT_SIZE, len(SLOTS) - 1)]
+
+
+class UsageModel:
+    def __init__(self):
+        self.version = None
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._day_counts = Counter()  # day -> entries seen
+        self._scores = {slot: Counter() for slot in SLOTS + [ANY]}
+        self._tables = {slot: [] for slot in SLOTS + [ANY]}
+        self._quantities = {}  # food -> Counter of quantities
+        self._units = {}  # food -> last unit
+
+    def update(self, mirror):
+        """Catches up with the mirror: folds in new rows, or rebuilds when rows were removed."""
+        with self._lock:
+            frame, version, changes = mirror.catch_up(self.version)
+            if changes is None or any(kind == "remove" for kind, _ in changes):
+                self._reset()
+                changes = [("add", frame)]
+            for _, rows in changes:
+                self._add_rows(rows)
+            self.version = version
+
+    def _add_rows(self, rows):
+        if rows.empty:
+            return
+        days = parse_log_dates(rows["Date"])
+        # Rounded back from float32 so a typical 0.1 is offered as 0.1, not 0.10000000149
+        quantities = pd.to_numeric(rows["Quantity"], errors="coerce").astype("float64").round(6)
+        units = rows["Unit"] if "Unit" in rows else [""] * len(rows)
+        for day, food, quantity, unit in zip(days, rows["Food"], quantities, units):
+            if day is None or not food:
+                continue
+            self.add(day, food, quantity, unit)
+
+    def add(self, day, food, quantity, unit=""):
+        """Folds in one logged row; constant work per row."""
+        with self._lock:
+            slot = slot_for(self._day_counts[day])
+            self._day_counts[day] += 1
+            weight = usage_weight(day)
+            for key in (slot, ANY):
+                self._scores[key][food] += weight
+                self._promote(key, food)
+            if quantity == quantity:  # skip NaN
+                self._quantities.setdefault(food, Counter())[float(quantity)] += 1
+            self._units[food] = unit
+
+    def _promote(self, slot, food):
+        table = self._tables[slot]
+        scores = self._scores[slot]
+        if food not in table:
+            if len(table) >= TABLE_SIZE and scores[food] <= scores[table[-1]]:
+                return
+            table.append(food)
+        table.sort(key=lambda f: -scores[f])
+        del table[TABLE_SIZE:]
+
+    # --- Lookups ---
+    def top(self, slot=ANY, n=8):
+        with self._lock:
+            return list(self._tables[slot][:n])
+
+    def next_slot(self, day):
+        """Slot the next entry logged on `day` falls into."""
+        with self._lock:
+            return slot_for(self._day_counts[day])
+
+    def suggest(self, day, n=8, known=None):
+        """Foods to offer for the next entry on `day`: that slot's favourites, topped up from all-day ones.
+
+        `known` (e.g. the food database) filters out foods that no longer exist.
+        """
+        with self._lock:
+            picks = []
+            for food in self._tables[self.next_slot(day)] + self._tables[ANY]:
+                if food not in picks and (known is None or food in known):
+                    picks.append(food)
+            return picks[:n]
+
+    def typical_quantity(self, food):
+        """The quantity `food` is most often logged with, or None if it has never been logged."""
+        with self._lock:
+            quantities = self._quantities.get(food)
+            return quantities.most_common(1)[0][0] if quantities else None
+
+    def unit(self, food):
+        with self._lock:
+            return self._units.get(food, "")
+
+
+@st.cache_resource(show_spinner=False)
+def _usage_model():
+    return UsageModel()
+
+
+def get_usage_model(mirror):
+    """Returns the shared usage model, caught up with the FoodLog mirror."""
+    model = _usage_model()
+    model.update(mirror)
+    return model
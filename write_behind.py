@@ -0,0 +1,343 @@
+"""Write-behind queue for Sheets writes.
+
+Log inserts, deletes and food-database edits are appended to a local journal
+(.cache/pending_writes.jsonl) and the page carries on at once. A background
+thread replays the journal against Sheets in order. Consecutive appends to the
+same worksheet are merged into one append_rows call. Quota and network errors
+are retried with exponential backoff. Anything still pending when the app stops
+is picked up again on the next start.
+
+Appends aren't idempotent: a timeout can come after Sheets has already added the
+rows. So an append batch is marked as sent in the journal before the call. A
+batch found marked (a retry, or a restart mid-call) is first looked for in the
+sheet, by its rows' IDs or else by the sheet's last rows, and sent again only
+if it isn't there. Deleting the last row isn't idempotent either, so the row
+it resolves to (its ID, or its number and contents) is journaled before the
+delete, and a retry deletes that row only if it is still there.
+
+Rows are deleted by ID (see row_ids.py). The queue keeps a RowIndex per worksheet
+in step with the writes it makes and resolves the IDs to sheet rows only when it
+gets to the delete, after everything queued before it, and checks them against
+the sheet's ID column before deleting anything.
+"""
+import json
+import os
+import random
+import threading
+import time
+
+import streamlit as st
+
+from changesets import ChangesetConflict, apply_changeset, delete_sheet_rows, row_checksum
+from quota import api_status, read_fresh
+from row_ids import RowIndex, id_position
+from sheets import get_worksheet
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PENDING_PATH = os.path.join(HERE, ".cache", "pending_writes.jsonl")
+
+# HTTP statuses worth retrying: quota exceeded and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_BACKOFF_SECONDS = 64
+
+# Upper bound on rows merged into a single append_rows call
+MAX_BATCH_ROWS = 500
+
+
+def _json_value(value):
+    # NumPy scalars from the macro engine
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+def is_retryable(error):
+    status = api_status(error)
+    # Network failures (requests' ConnectionError and Timeout are OSErrors) are retried too
+    return status in RETRY_STATUSES or isinstance(error, OSError)
+
+
+class PendingWorksheet:
+    """Write side of a worksheet: the gspread write calls the app uses, recorded in the queue."""
+
+    def __init__(self, queue, name):
+        self.queue = queue
+        self.title = name
+
+    def append_rows(self, values, **kwargs):
+        return self.queue.submit(self.title, "append_rows", [list(row) for row in values])
+
+    def append_row(self, values, **kwargs):
+        self.append_rows([values])
+
+    def delete_rows(self, start_index, end_index=None):
+        return self.queue.submit(self.title, "delete_rows", start_index, end_index or start_index)
+
+    def delete_last_row(self):
+        """Deletes whatever is the last row when the queue gets to it, after earlier appends."""
+        return self.queue.submit(self.title, "delete_last_row")
+
+    def delete_ids(self, ids):
+        """Deletes the rows with these IDs, wherever they are when the queue gets to them."""
+        return self.queue.submit(self.title, "delete_ids", [str(row_id) for row_id in ids])
+
+    def replace(self, values):
+        """Overwrites the whole worksheet (header included) with `values`."""
+        return self.queue.submit(self.title, "replace", [list(row) for row in values])
+
+    def apply_changes(self, changes):
+        """Applies a changeset from changesets.changeset(), checked against the sheet first. Returns the op's id."""
+        return self.queue.submit(self.title, "apply_changes", changes)
+
+
+class WriteBehindQueue:
+    def __init__(self, path=PENDING_PATH, resolve=get_worksheet):
+        self.path = path
+        self.resolve = resolve
+        self.failed = []  # (op, error message) for writes Sheets rejected outright
+        self.conflicts = []  # (op, message) for changesets the sheet had moved on from; see conflict()
+        self.last_error = None
+        self.retry_at = 0.0
+        self._ops = []
+        self._next_id = 1
+        self._listeners = {}  # worksheet name -> [callback(op names)]
+        self._row_indexes = {}  # worksheet name -> RowIndex
+        self._cond = threading.Condition()
+        self._load()
+        self._thread = threading.Thread(target=self._run, name="sheets-write-behind", daemon=True)
+        self._thread.start()
+
+    # --- Journal ---
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    self._ops.append(json.loads(line))
+                except ValueError:
+                    continue  # a line cut short by a crash
+        if self._ops:
+            self._next_id = max(op["id"] for op in self._ops) + 1
+
+    def _write_line(self, op):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "a") as f:
+            f.write(json.dumps(op, default=_json_value) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _rewrite(self):
+        with open(self.path + ".tmp", "w") as f:
+            for op in self._ops:
+                f.write(json.dumps(op, default=_json_value) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self.path + ".tmp", self.path)
+
+    # --- Producer side ---
+    def worksheet(self, name):
+        return PendingWorksheet(self, name)
+
+    def submit(self, sheet, op, *args):
+        with self._cond:
+            entry = {"id": self._next_id, "sheet": sheet, "op": op, "args": list(args), "queued_at": time.time()}
+            self._next_id += 1
+            # Round-trip through JSON so the in-memory copy matches what a restart would load
+            entry = json.loads(json.dumps(entry, default=_json_value))
+            self._write_line(entry)
+            self._ops.append(entry)
+            self._cond.notify()
+            return entry["id"]
+
+    def row_index(self, sheet):
+        with self._cond:
+            return self._row_indexes.setdefault(sheet, RowIndex())
+
+    def is_pending(self, op_id):
+        with self._cond:
+            return any(op["id"] == op_id for op in self._ops)
+
+    def conflict(self, op_id):
+        """Message of the conflict that stopped op `op_id` (a changeset) from being applied, or None."""
+        with self._cond:
+            return next((message for op, message in self.conflicts if op["id"] == op_id), None)
+
+    def dismiss_conflict(self, op_id):
+        with self._cond:
+            self.conflicts = [(op, message) for op, message in self.conflicts if op["id"] != op_id]
+
+    def subscribe(self, sheet, callback):
+        """Calls callback(op names) after writes to `sheet` reach Sheets."""
+        with self._cond:
+            self._listeners.setdefault(sheet, []).append(callback)
+
+    def __len__(self):
+        with self._cond:
+            return len(self._ops)
+
+    def pending(self):
+        with self._cond:
+            return list(self._ops)
+
+    def pending_rows(self, sheet):
+        """Rows appended to `sheet` that haven't reached Sheets yet."""
+        with self._cond:
+            return [row for op in self._ops if op["sheet"] == sheet and op["op"] == "append_rows" for row in op["args"][0]]
+
+    def wait(self, timeout=None):
+        """Blocks until everything queued so far has been written (or failed). Returns True if drained."""
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while self._ops:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    # --- Worker ---
+    def _next_batch(self):
+        first = self._ops[0]
+        batch = [first]
+        if first.get("sent") and first["op"] == "append_rows":
+            # The same batch again, so _landed() looks for exactly the rows that were sent
+            for op in self._ops[1:]:
+                if not op.get("sent") or op["sheet"] != first["sheet"] or op["op"] != "append_rows":
+                    break
+                batch.append(op)
+        elif first["op"] == "append_rows":
+            rows = len(first["args"][0])
+            for op in self._ops[1:]:
+                if op["sheet"] != first["sheet"] or op["op"] != "append_rows":
+                    break
+                rows += len(op["args"][0])
+                if rows > MAX_BATCH_ROWS:
+                    break
+                batch.append(op)
+        return batch
+
+    def _mark_sent(self, batch, **fields):
+        with self._cond:
+            for op in batch:
+                op["sent"] = True
+                op.update(fields)
+            self._rewrite()
+
+    def _landed(self, ws, rows):
+        """Whether an append of `rows` that may have failed reached the sheet after all."""
+        column = id_position(read_fresh(ws, "row_values", 1))
+        if column is not None and len(rows[-1]) > column and rows[-1][column]:
+            return str(rows[-1][column]) in read_fresh(ws, "col_values", column + 1)
+        # No IDs to go by: the sheet ends with these rows
+        values = read_fresh(ws, "get_all_values")
+        if len(values) <= len(rows):
+            return False
+        return all(row_checksum(a) == row_checksum(b) for a, b in zip(values[-len(rows):], rows))
+
+    def _apply(self, batch):
+        first = batch[0]
+        ws = self.resolve(first["sheet"])
+        index = self.row_index(first["sheet"])
+        if first["op"] == "append_rows":
+            rows = [row for op in batch for row in op["args"][0]]
+            if first.get("sent") and rows and self._landed(ws, rows):
+                index.invalidate()
+                return
+            self._mark_sent(batch)
+            ws.append_rows(rows)
+            index.appended(rows)
+        elif first["op"] == "delete_ids":
+            rows = index.resolve(ws, first["args"][0])
+            if rows:
+                delete_sheet_rows(ws, rows)
+            index.removed(first["args"][0])
+        elif first["op"] == "delete_last_row":
+            if "target" not in first:
+                row = index.last_row(ws)
+                if row is None:
+                    return
+                values = read_fresh(ws, "row_values", row)
+                row_id = values[index.column - 1] if index.column and len(values) >= index.column else ""
+                self._mark_sent(batch, target={"row": row, "id": row_id, "checksum": row_checksum(values)})
+            target = first["target"]
+            if target["id"]:
+                rows = index.resolve(ws, [target["id"]])
+                if rows:
+                    delete_sheet_rows(ws, rows)
+                index.removed([target["id"]])
+            elif (index.last_row(ws) == target["row"]
+                  and row_checksum(read_fresh(ws, "row_values", target["row"])) == target["checksum"]):
+                # No ID to go by: a row that is still last and unchanged hasn't been deleted yet
+                ws.delete_rows(target["row"])
+                index.removed_last()
+        elif first["op"] == "delete_rows":
+            ws.delete_rows(*first["args"])
+            index.invalidate()
+        elif first["op"] == "replace":
+            ws.clear()
+            ws.update(first["args"][0])
+            index.invalidate()
+        elif first["op"] == "apply_changes":
+            apply_changeset(ws, first["args"][0])
+            index.invalidate()
+        else:
+            raise ValueError(f"Unknown write {first['op']!r}")
+
+    def _run(self):
+        attempt = 0
+        while True:
+            with self._cond:
+                while not self._ops:
+                    self._cond.wait()
+                batch = self._next_batch()
+            try:
+                self._apply(batch)
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                if is_retryable(e):
+                    attempt += 1
+                    delay = min(2 ** attempt, MAX_BACKOFF_SECONDS) + random.random()
+                    self.retry_at = time.time() + delay
+                    time.sleep(delay)
+                    continue
+                # Retrying won't help; set it aside so later writes can go
+                with self._cond:
+                    if isinstance(e, ChangesetConflict):
+                        # Kept whole, so the page that made it can give the edits back
+                        self.conflicts.extend((op, str(e)) for op in batch)
+                    else:
+                        # Bad request, missing worksheet
+                        self.failed.extend((op, self.last_error) for op in batch)
+            attempt = 0
+            self.retry_at = 0.0
+            with self._cond:
+                del self._ops[:len(batch)]
+                self._rewrite()
+                listeners = list(self._listeners.get(batch[0]["sheet"], []))
+                self._cond.notify_all()
+            for callback in listeners:
+                callback([op["op"] for op in batch])
+
+
+@st.cache_resource(show_spinner=False)
+def get_write_queue():
+    return WriteBehindQueue()
+
+
+def show_pending_writes(queue):
+    """Sidebar status of writes still on their way to Sheets."""
+    pending = queue.pending()
+    if pending:
+        st.sidebar.info(f"⏳ {len(pending)} change(s) waiting to sync to Google Sheets")
+        if queue.retry_at:
+            st.sidebar.caption(f"Retrying in {max(queue.retry_at - time.time(), 0):.0f}s ({queue.last_error})")
+        with st.sidebar.expander("Pending changes"):
+            st.dataframe(
+                [{"Sheet": op["sheet"], "Change": op["op"], "Rows": len(op["args"][0]) if op["op"] in ("append_rows", "replace", "delete_ids") else 1}
+                 for op in pending],
+                hide_index=True,
+            )
+    if queue.conflicts:
+        st.sidebar.warning(f"{len(queue.conflicts)} save(s) were not applied because the sheet changed elsewhere: "
+                           f"{queue.conflicts[-1][1]}")
+    if queue.failed:
+        st.sidebar.error(f"{len(queue.failed)} change(s) were rejected by Google Sheets: {queue.failed[-1][1]}")